@@ -1,9 +1,15 @@
-from flask import Flask, render_template, request, session, redirect, url_for, jsonify, make_response, send_from_directory, flash
-from urllib.parse import quote
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, render_template, request, session, redirect, url_for, jsonify, make_response, send_from_directory, flash, Response
+from urllib.parse import quote, urlsplit
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
 import sqlite3
 from datetime import datetime, timedelta
 from functools import wraps
+import base64
+import hashlib
+import hmac
+import json
 import os
 import re
 import uuid
@@ -14,7 +20,7 @@ from database import (
     update_balance, add_transaction, get_transactions,
     get_user_by_phone, reset_pin_attempts_by_phone, add_pin_attempt_by_phone,
     get_pin_attempts_by_phone, get_user_balance_by_phone, get_transaction_stats,
-    get_filtered_transactions, get_transaction_by_id,
+    get_filtered_transactions, get_transactions_page, get_transaction_by_id,
     get_transaction_count, get_recent_transactions,
     send_payment as db_send_payment,
     get_contacts as db_get_contacts,
@@ -29,11 +35,16 @@ from database import (
     add_to_contacts_from_transaction,
     get_received_from_contacts,
     get_all_received_transactions,
-    get_received_transactions_count,
-    get_all_people_history
+    get_received_transactions_count, get_counterparty_count,
+    get_all_people_history,
+    search_users_index,
+    get_recipient_suggestions,
+    sync_contacts_from_history,
+    get_user_version,
+    get_transactions_since
 )
 
-from database import fix_transactions_table_constraint
+from database import fix_transactions_table_constraint, db_scope
 
 # Import QR service
 from qr_service import qr_bp
@@ -51,10 +62,52 @@ from reportlab.graphics.charts.piecharts import Pie
 import io
 
 # Import Notification Service
-from notification_service import notification_service
+from notification_service import notification_service, MAX_BULK_IDS
+
+# Import Recipient Directory
+from recipient_directory import recipient_directory
+from upi_parser import PHONE_RE, parse_upi_payload
+
+# Import Event Bus
+from event_bus import event_bus, EventBusFull
+# Import Response Compression
+from compression import CompressionMiddleware
+# Import App Shell Assets
+from shell_assets import shell_assets
+# Import In-process Cache
+from ttl_cache import TTLCache
+from singleflight import singleflight
 
 DATABASE_PATH = 'easycash.db'
 
+# Transactions per delta sync response
+SYNC_PAGE_SIZE = 500
+
+# The manifest changes rarely; its icons are fingerprinted and immutable
+MANIFEST_MAX_AGE = 7 * 24 * 3600
+# Public routes cacheable by browsers and CDNs; they never touch the session,
+# which would add Vary: Cookie
+SESSIONLESS_ENDPOINTS = ('sw', 'service_worker', 'serve_manifest', 'view_shared_receipt')
+
+# Rendered shared receipts kept in memory; completed transactions never change
+SHARED_RECEIPT_CACHE_SIZE = 2000
+SHARED_RECEIPT_TTL = 24 * 3600
+SHARED_RECEIPT_MAX_AGE = 3600
+
+# Rows per chunk for the virtualized history lists
+LIST_PAGE_SIZE = 50
+MAX_LIST_PAGE_SIZE = 100
+# Contacts APIs keep their original default; the list pages ask for LIST_PAGE_SIZE
+CONTACTS_PAGE_SIZE = 10
+
+# Read-only JSON views /api/batch may run, by endpoint (filled by @batch_view),
+# and how many run per batch
+BATCH_VIEWS = {}
+BATCH_MAX_REQUESTS = 10
+
+# Operations token for the broadcast API; broadcasting is disabled when unset
+BROADCAST_TOKEN = os.environ.get('EASYCASH_BROADCAST_TOKEN')
+
 # Add this after imports in app.py
 def get_base_url():
     """Get the base URL based on the environment"""
@@ -71,28 +124,6 @@ def get_db():
     return db
 
 # Add this helper function
-def get_last_sent_identifier(phone):
-    """Get the last identifier (phone/UPI) user sent money to"""
-    try:
-        db = get_db()
-        result = db.execute('''
-            SELECT receiver_identifier, payment_method 
-            FROM transactions 
-            WHERE phone = ? AND type = 'send'
-            ORDER BY date_time DESC 
-            LIMIT 1
-        ''', (phone,)).fetchone()
-        db.close()
-        
-        if result:
-            return {
-                'identifier': result['receiver_identifier'],
-                'method': result['payment_method']
-            }
-    except Exception as e:
-        print(f"Error getting last sent identifier: {e}")
-    return None
-
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=15)
@@ -100,11 +131,15 @@ app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HT
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 
+# Fingerprinted static files are cached for a year
+STATIC_MAX_AGE = 31536000
+_static_hashes = {}
+
 # Add this after app = Flask(__name__)
 @app.before_request
 def before_request():
     # Log session info for debugging
-    if request.endpoint and 'static' not in request.endpoint:
+    if request.endpoint and 'static' not in request.endpoint and request.endpoint not in SESSIONLESS_ENDPOINTS:
         print(f"\n=== {request.method} {request.path} ===")
         print(f"Session authenticated: {session.get('authenticated')}")
         print(f"Session phone: {session.get('phone')}")
@@ -119,16 +154,146 @@ def before_request():
 
 @app.after_request
 def after_request(response):
-    # Add headers to prevent caching
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
+    if request.endpoint == 'static':
+        # Fingerprinted URLs never change content; others revalidate
+        filename = (request.view_args or {}).get('filename', '')
+        if response.status_code == 200 and request.args.get('v') == static_file_hash(filename):
+            response.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+    elif response.cache_control.private or (request.endpoint in SESSIONLESS_ENDPOINTS
+                                            and 'Cache-Control' in response.headers):
+        # Revalidated private responses (see conditional_json) and public cached routes
+        pass
+    elif session.get('authenticated') or response.mimetype == 'application/json':
+        # Prevent caching of account pages and API data
+        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+        response.headers['Pragma'] = 'no-cache'
+        response.headers['Expires'] = '0'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
     response.headers['X-Frame-Options'] = 'DENY'
     return response
 
+def file_hash(folder, filename):
+    """Short content hash of a file under folder (cached until its mtime changes), or None"""
+    path = safe_join(folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except (OSError, TypeError):
+        return None
+    
+    cached = _static_hashes.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    _static_hashes[path] = (mtime, digest)
+    return digest
+
+def static_file_hash(filename):
+    return file_hash(app.static_folder, filename)
+
+def template_version(name):
+    """Content hash of a template, so cached renders change when it is edited"""
+    return file_hash(os.path.join(app.root_path, app.template_folder), name)
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    """url_for('static', ...) adds ?v=<content hash>, so edited files get new URLs"""
+    if endpoint == 'static' and 'v' not in values:
+        digest = static_file_hash(values.get('filename', ''))
+        if digest:
+            values['v'] = digest
+
+def conditional_json(scope, build_payload):
+    """
+    JSON response tagged with the user's data version for scope
+    A matching If-None-Match gets a 304 before build_payload runs its queries
+    """
+    phone = session['phone']
+    version = get_user_version(phone, scope)
+    if version is None:
+        return jsonify(build_payload())
+    
+    etag = hashlib.sha1(f"{phone}|{scope}|{version}|{request.full_path}".encode()).hexdigest()[:24]
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        response = jsonify(build_payload())
+    
+    response.set_etag(etag, weak=True)
+    # Browser may keep it, but must revalidate before every use
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def encode_page_cursor(key):
+    """Opaque cursor for the sort key of the last row on a page"""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+def decode_page_cursor(cursor, size=2):
+    """Sort key from a page cursor, or None if missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(key, list) or len(key) != size:
+        return None
+    return key
+
+def page_limit(default=LIST_PAGE_SIZE):
+    return max(1, min(request.args.get('limit', default, type=int), MAX_LIST_PAGE_SIZE))
+
+def contacts_page(fetch, phone):
+    """One keyset page of a contacts history, newest first"""
+    before = decode_page_cursor(request.args.get('cursor'))
+    limit = page_limit(CONTACTS_PAGE_SIZE)
+    contacts = fetch(phone, limit, before)
+    next_cursor = None
+    if len(contacts) == limit:
+        last = contacts[-1]
+        next_cursor = encode_page_cursor([last['last_transaction'], last['identifier']])
+    return {
+        'success': True,
+        'contacts': contacts,
+        'count': len(contacts),
+        'next_cursor': next_cursor
+    }
+
+def coalesced(name, fn, *params):
+    """
+    fn() run once for concurrent identical requests of the current user
+    Keyed by ledger version too, so a request after a payment never gets the old result
+    """
+    phone = session['phone']
+    return singleflight.do((name, phone, params, get_user_version(phone, 'ledger')), fn)
+
 # Register QR blueprint
 app.register_blueprint(qr_bp)
 
+# Compress responses; static files are compressed once up front
+app.wsgi_app = CompressionMiddleware(app.wsgi_app, static_folder=app.static_folder,
+                                     static_url_path=app.static_url_path)
+print(f"✓ Precompressed {app.wsgi_app.static.precompress_all()} static files")
+
+def fingerprint_manifest_icons(data):
+    """Point manifest icons at fingerprinted static URLs, which are cached as immutable"""
+    manifest = json.loads(data)
+    for icon in manifest.get('icons', []):
+        src = icon.get('src', '')
+        if src.startswith(app.static_url_path + '/'):
+            digest = static_file_hash(src[len(app.static_url_path) + 1:])
+            if digest:
+                icon['src'] = f"{src}?v={digest}"
+    return json.dumps(manifest, indent=2).encode()
+
+# Service worker and manifest are served from memory (see shell_assets.py)
+shell_assets.add('service-worker', os.path.join(app.root_path, 'service-worker.js'), 'application/javascript', 'no-cache',
+                 headers={'Service-Worker-Allowed': '/'})
+shell_assets.add('manifest', os.path.join(app.root_path, 'manifest.json'), 'application/manifest+json',
+                 f'public, max-age={MANIFEST_MAX_AGE}', transform=fingerprint_manifest_icons)
+
 @app.context_processor
 def inject_now():
     def get_current_time():
@@ -144,6 +309,9 @@ def inject_datetime():
 
 # Initialize database
 init_db()
+notification_service.init_schema()
+notification_service.start_worker()
+notification_service.start_retention_job()
 fix_transactions_table_constraint()
 
 # Decorator to require authentication - IMPROVED VERSION
@@ -167,6 +335,11 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def batch_view(f):
+    """Allow a read-only view in /api/batch; goes below @login_required so the plain view is kept"""
+    BATCH_VIEWS[f.__name__] = f
+    return f
+
 # Helper function for PDF generation
 def generate_transaction_pdf(phone, transactions, filter_type='all', date_range='all'):
     """Generate PDF for transactions"""
@@ -495,20 +668,7 @@ def api_phone_lookup():
         })
     
     try:
-        db = get_db()
-        
-        # Get user by mobile
-        user = db.execute('''
-            SELECT 
-                username,
-                upi_id,
-                phone,
-                created_at
-            FROM users 
-            WHERE phone = ?
-        ''', (phone,)).fetchone()
-        
-        db.close()
+        user = recipient_directory.by_phone(phone)
         
         if user:
             return jsonify({
@@ -582,7 +742,7 @@ def pin_setup():
             session.modified = True
             
             # Send welcome notification
-            notification_service.add_notification(
+            notification_service.enqueue(
                 phone,
                 "Welcome to EasyCash!",
                 "Your account has been created successfully. You can now send, receive, and manage money.",
@@ -689,19 +849,22 @@ def dashboard():
         session.clear()
         return redirect(url_for('phone_screen'))
     
-    recent_transactions = get_recent_transactions(phone, limit=5)
-    
-    # Get transaction statistics
-    stats = get_transaction_stats(phone)
-    
-    # Get sent to contacts for dashboard
-    sent_to_contacts = get_sent_to_contacts(phone, limit=3)
-    
-    # Get received from contacts
-    received_from_contacts = get_received_from_contacts(phone, limit=3)
+    def load_dashboard():
+        return (
+            get_recent_transactions(phone, limit=5),
+            # Get transaction statistics
+            get_transaction_stats(phone),
+            # Get sent to contacts for dashboard
+            get_sent_to_contacts(phone, limit=3),
+            # Get received from contacts
+            get_received_from_contacts(phone, limit=3),
+            # Get all people history (combined sent and received)
+            get_all_people_history(phone, limit=6)
+        )
     
-    # Get all people history (combined sent and received)
-    all_people = get_all_people_history(phone, limit=6)
+    # Tabs refreshing together share one run of these queries
+    (recent_transactions, stats, sent_to_contacts,
+     received_from_contacts, all_people) = coalesced('dashboard', load_dashboard)
     
     # Get unread notification count
     unread_count = notification_service.get_unread_count(phone)
@@ -733,8 +896,8 @@ def received_history():
         session.clear()
         return redirect(url_for('phone_screen'))
     
-    # Get all received from contacts
-    received_from_contacts = get_received_from_contacts(phone, limit=50)
+    # Contacts load in pages from /api/received-contacts as the list scrolls
+    total_people = get_counterparty_count(phone, 'receive')
     
     # Get total received count
     total_received = get_received_transactions_count(phone)
@@ -744,7 +907,7 @@ def received_history():
     
     return render_template('received_history.html',
                          user=user,
-                         contacts=received_from_contacts,
+                         total_people=total_people,
                          total_received=total_received,
                          unread_count=unread_count)
 
@@ -760,7 +923,7 @@ def all_people_history():
         return redirect(url_for('phone_screen'))
     
     # Get all people history
-    all_people = get_all_people_history(phone, limit=50)
+    all_people = coalesced('all_people', lambda: get_all_people_history(phone, limit=50), 50)
     
     # Get unread notification count
     unread_count = notification_service.get_unread_count(phone)
@@ -773,33 +936,31 @@ def all_people_history():
 
 @app.route('/api/received-contacts')
 @login_required
+@batch_view
 def api_received_contacts():
     """API to get received from contacts"""
     phone = session['phone']
     
-    limit = request.args.get('limit', 10, type=int)
-    contacts = get_received_from_contacts(phone, limit)
-    
-    return jsonify({
-        'success': True,
-        'contacts': contacts,
-        'count': len(contacts)
-    })
+    return conditional_json('ledger', lambda: contacts_page(get_received_from_contacts, phone))
 
 @app.route('/api/all-people')
 @login_required
+@batch_view
 def api_all_people():
     """API to get all people user has interacted with"""
     phone = session['phone']
     
     limit = request.args.get('limit', 10, type=int)
-    people = get_all_people_history(phone, limit)
     
-    return jsonify({
-        'success': True,
-        'people': people,
-        'count': len(people)
-    })
+    def payload():
+        people = coalesced('all_people', lambda: get_all_people_history(phone, limit), limit)
+        return {
+            'success': True,
+            'people': people,
+            'count': len(people)
+        }
+    
+    return conditional_json('ledger', payload)
 
 @app.route('/sent-history')
 @login_required
@@ -812,8 +973,8 @@ def sent_history():
         session.clear()
         return redirect(url_for('phone_screen'))
     
-    # Get all sent to contacts
-    sent_to_contacts = get_sent_to_contacts(phone, limit=50)
+    # Contacts load in pages from /api/sent-to-contacts as the list scrolls
+    total_people = get_counterparty_count(phone, 'send')
     
     # Get total sent count
     total_sent = get_sent_transactions_count(phone)
@@ -823,7 +984,7 @@ def sent_history():
     
     return render_template('sent_to.html',
                          user=user,
-                         contacts=sent_to_contacts,
+                         total_people=total_people,
                          total_sent=total_sent,
                          unread_count=unread_count)
 
@@ -839,7 +1000,9 @@ def person_history(contact_identifier):
         return redirect(url_for('phone_screen'))
     
     # Get transaction history with this person
-    history_data = get_person_transaction_history(phone, contact_identifier)
+    history_data = coalesced('person_history',
+                             lambda: get_person_transaction_history(phone, contact_identifier),
+                             contact_identifier)
     
     # Get unread notification count
     unread_count = notification_service.get_unread_count(phone)
@@ -891,18 +1054,12 @@ def api_sent_transactions():
 
 @app.route('/api/sent-to-contacts')
 @login_required
+@batch_view
 def api_sent_to_contacts():
     """API to get sent to contacts"""
     phone = session['phone']
     
-    limit = request.args.get('limit', 10, type=int)
-    contacts = get_sent_to_contacts(phone, limit)
-    
-    return jsonify({
-        'success': True,
-        'contacts': contacts,
-        'count': len(contacts)
-    })
+    return conditional_json('ledger', lambda: contacts_page(get_sent_to_contacts, phone))
 
 @app.route('/api/search-users')
 @login_required
@@ -914,10 +1071,36 @@ def api_search_users():
         return jsonify({'success': False, 'error': 'Search term too short'})
     
     try:
-        db = get_db()
+        # Full-text index first; short terms fall back to prefix LIKE
+        users = search_users_index(search_term, exclude_phone=current_phone, limit=10)
+        if users is None:
+            users = _search_users_by_prefix(search_term, current_phone)
+        
+        result = []
+        for user in users:
+            result.append({
+                'username': user['username'],
+                'phone': user['phone'],
+                'upi_id': user['upi_id'],
+                'created_at': user['created_at']
+            })
         
+        return jsonify({
+            'success': True,
+            'users': result,
+            'count': len(result)
+        })
+        
+    except Exception as e:
+        print(f"Error searching users: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
+def _search_users_by_prefix(search_term, current_phone):
+    """Prefix LIKE search used when the full-text index cannot serve the term"""
+    db = get_db()
+    try:
         # Search users (excluding current user)
-        users = db.execute('''
+        return db.execute('''
             SELECT 
                 username,
                 phone,
@@ -945,27 +1128,8 @@ def api_search_users():
             f'{search_term}%',
             f'{search_term}%'
         )).fetchall()
-        
+    finally:
         db.close()
-        
-        result = []
-        for user in users:
-            result.append({
-                'username': user['username'],
-                'phone': user['phone'],
-                'upi_id': user['upi_id'],
-                'created_at': user['created_at']
-            })
-        
-        return jsonify({
-            'success': True,
-            'users': result,
-            'count': len(result)
-        })
-        
-    except Exception as e:
-        print(f"Error searching users: {e}")
-        return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/upi-lookup')
 @login_required
@@ -979,20 +1143,7 @@ def api_upi_lookup():
         return jsonify({'exists': False, 'error': 'Invalid UPI ID format'})
 
     try:
-        db = get_db()
-        
-        # Get user by UPI ID
-        user = db.execute('''
-            SELECT 
-                username,
-                upi_id,
-                phone,
-                created_at
-            FROM users 
-            WHERE upi_id = ?
-        ''', (upi_id,)).fetchone()
-        
-        db.close()
+        user = recipient_directory.by_upi(upi_id)
         
         if user:
             return jsonify({
@@ -1026,20 +1177,7 @@ def api_mobile_lookup():
         return jsonify({'exists': False, 'error': 'Cannot send to yourself'})
     
     try:
-        db = get_db()
-        
-        # Get user by mobile
-        user = db.execute('''
-            SELECT 
-                username,
-                upi_id,
-                phone,
-                created_at
-            FROM users 
-            WHERE phone = ?
-        ''', (phone,)).fetchone()
-        
-        db.close()
+        user = recipient_directory.by_phone(phone)
         
         if user:
             return jsonify({
@@ -1055,6 +1193,76 @@ def api_mobile_lookup():
         print(f"Error looking up mobile: {e}")
         return jsonify({'exists': False, 'error': str(e)})
 
+# API: Resolve many recipients in one request
+MAX_RESOLVE_IDENTIFIERS = 500
+
+@app.route('/api/recipients/resolve', methods=['POST'])
+@login_required
+def api_resolve_recipients():
+    """Resolve a list of phones, UPI IDs or QR payloads with one directory pass"""
+    data = request.get_json(silent=True) or {}
+    identifiers = data.get('identifiers')
+    current_phone = session['phone']
+
+    if not isinstance(identifiers, list) or not identifiers:
+        return jsonify({'success': False, 'error': 'identifiers must be a non-empty list'}), 400
+
+    if len(identifiers) > MAX_RESOLVE_IDENTIFIERS:
+        return jsonify({
+            'success': False,
+            'error': f'At most {MAX_RESOLVE_IDENTIFIERS} identifiers per request'
+        }), 400
+
+    try:
+        # Classify every identifier first so the directory sees one batch
+        parsed = {}
+        for identifier in identifiers:
+            if not isinstance(identifier, str) or identifier in parsed:
+                continue
+            payload = parse_upi_payload(identifier)
+            if payload is None or not (payload.phone or payload.pa):
+                parsed[identifier] = None
+                continue
+            phone = payload.phone if payload.phone and PHONE_RE.match(payload.phone) else None
+            upi_id = payload.pa.lower() if payload.pa else None
+            parsed[identifier] = (phone, upi_id)
+
+        by_phone, by_upi = recipient_directory.resolve_many(
+            phones=[p[0] for p in parsed.values() if p and p[0]],
+            upi_ids=[p[1] for p in parsed.values() if p and p[1]]
+        )
+
+        results = {}
+        for identifier, keys in parsed.items():
+            if keys is None:
+                results[identifier] = {'exists': False, 'error': 'Unrecognised identifier'}
+                continue
+
+            phone, upi_id = keys
+            user = (by_phone.get(phone) if phone else None) or (by_upi.get(upi_id) if upi_id else None)
+            if user is None:
+                results[identifier] = {'exists': False}
+            elif user['phone'] == current_phone:
+                results[identifier] = {
+                    'exists': False,
+                    'error': 'Cannot send to yourself',
+                    'self_transfer': True
+                }
+            else:
+                results[identifier] = {
+                    'exists': True,
+                    'username': user['username'],
+                    'upi_id': user['upi_id'],
+                    'phone': user['phone'],
+                    'name': user['username'] or f"User {user['phone'][-4:]}"
+                }
+
+        return jsonify({'success': True, 'results': results})
+
+    except Exception as e:
+        print(f"Error resolving recipients: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # API: Validate Payment Method (enhanced)
 @app.route('/api/validate-payment', methods=['POST'])
 @login_required
@@ -1068,35 +1276,24 @@ def api_validate_payment():
         return jsonify({'valid': False, 'message': 'Identifier required'})
     
     try:
-        db = get_db()
         user_info = None
         
         if payment_method == 'mobile':
             # Validate mobile format
             if re.match(r'^[6-9]\d{9}$', identifier):
-                user_info = db.execute('''
-                    SELECT username, upi_id, phone 
-                    FROM users 
-                    WHERE phone = ? AND phone != ?
-                ''', (identifier, current_phone)).fetchone()
+                user_info = recipient_directory.by_phone(identifier)
         
         elif payment_method == 'upi':
             # Validate UPI format
             if re.match(r'^[\w\.-]+@[\w\.-]+$', identifier):
-                user_info = db.execute('''
-                    SELECT username, upi_id, phone 
-                    FROM users 
-                    WHERE upi_id = ? AND phone != ?
-                ''', (identifier, current_phone)).fetchone()
+                user_info = recipient_directory.by_upi(identifier)
         
         elif payment_method == 'contact':
-            user_info = db.execute('''
-                SELECT username, upi_id, phone 
-                FROM users 
-                WHERE username = ? AND phone != ?
-            ''', (identifier, current_phone)).fetchone()
+            user_info = recipient_directory.by_username(identifier)
         
-        db.close()
+        # Never resolve the sender as their own recipient
+        if user_info and user_info['phone'] == current_phone:
+            user_info = None
         
         if user_info:
             return jsonify({
@@ -1175,14 +1372,6 @@ def deposit():
             new_balance = update_balance(phone, amount)
             transaction_id = add_transaction(phone, 'deposit', amount, new_balance)
             
-            # Send deposit notification
-            notification_service.send_transaction_notification(
-                phone,
-                'deposit',
-                amount,
-                transaction_id
-            )
-            
             # Update user data
             user = get_user_by_phone(phone)
             
@@ -1545,13 +1734,16 @@ def setup_upi():
             db.commit()
             db.close()
             
+            # Old and new UPI IDs now resolve differently
+            recipient_directory.invalidate(phone, upi_ids=(user.get('upi_id'), upi_id))
+            
             # Update user data
             user = get_user_by_phone(phone)
             session.pop('needs_upi_setup', None)  # Remove the setup flag
             session['upi_setup_success'] = True
             
             # Send notification
-            notification_service.add_notification(
+            notification_service.enqueue(
                 phone,
                 "UPI ID Set Successfully",
                 f"Your UPI ID {upi_id} is now active. You can receive payments using this ID.",
@@ -1609,14 +1801,6 @@ def withdraw():
             new_balance = update_balance(phone, -amount)
             transaction_id = add_transaction(phone, 'withdraw', amount, new_balance)
             
-            # Send withdrawal notification
-            notification_service.send_transaction_notification(
-                phone,
-                'withdraw',
-                amount,
-                transaction_id
-            )
-            
             # Update user data
             user = get_user_by_phone(phone)
             
@@ -1740,7 +1924,6 @@ def receipt_success():
 @login_required
 def transactions():
     phone = session['phone']
-    user_transactions = get_transactions(phone, limit=50)
     user = get_user_by_phone(phone)
     
     if not user:
@@ -1751,13 +1934,20 @@ def transactions():
     # Ensure balance is a float with proper fallback
     current_balance = user.get('balance', 0.0) if user else 0.0
     
+    # Totals come from SQL; the rows themselves load in pages as the list scrolls
+    stats = coalesced('transaction_stats', lambda: get_transaction_stats(phone))
+    
     # Get unread notification count
     unread_count = notification_service.get_unread_count(phone)
     
-    return render_template('transactions.html', 
-                         transactions=user_transactions,
+    response = make_response(render_template('transactions.html', 
+                         stats=stats,
                          current_balance=current_balance,
-                         unread_count=unread_count)
+                         unread_count=unread_count,
+                         ledger_owner=_sync_owner(phone)))
+    # The service worker keys its offline copy of this page by account
+    response.headers['X-Ledger-Owner'] = _sync_owner(phone)
+    return response
 
 # Route: Filtered Transactions (AJAX endpoint)
 @app.route('/api/transactions/filter', methods=['GET'])
@@ -1795,6 +1985,101 @@ def filtered_transactions():
         'date_range': date_range
     })
 
+def date_range_start(date_range):
+    """Start of a today/week/month filter, or None for all time"""
+    if date_range == 'today':
+        return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    elif date_range == 'week':
+        return datetime.now() - timedelta(days=7)
+    elif date_range == 'month':
+        return datetime.now() - timedelta(days=30)
+    return None
+
+# API: One page of the transaction history for the virtualized list
+@app.route('/api/transactions/page')
+@login_required
+@batch_view
+def api_transactions_page():
+    """
+    Transactions newest first, limit at a time
+    next_cursor continues after the last row and is null on the final page
+    """
+    phone = session['phone']
+    before = decode_page_cursor(request.args.get('cursor'))
+    limit = page_limit()
+    start_date = date_range_start(request.args.get('date_range', 'all'))
+    
+    def payload():
+        transactions = get_transactions_page(
+            phone,
+            limit=limit,
+            before=before,
+            transaction_type=request.args.get('type'),
+            payment_method=request.args.get('method'),
+            start_date=start_date.strftime('%Y-%m-%d %H:%M:%S') if start_date else None
+        )
+        if transactions is None:
+            return {'success': False, 'error': 'Could not load transactions'}
+        
+        next_cursor = None
+        if len(transactions) == limit:
+            last = transactions[-1]
+            next_cursor = encode_page_cursor([last['date_time'], last['id']])
+        return {
+            'success': True,
+            'transactions': transactions,
+            'count': len(transactions),
+            'next_cursor': next_cursor
+        }
+    
+    return conditional_json('ledger', payload)
+
+def _sync_owner(phone):
+    """Short tag of the user a sync cursor belongs to"""
+    return hashlib.sha1(phone.encode()).hexdigest()[:12]
+
+# API: Delta sync of the transaction history for the offline store
+@app.route('/api/sync/transactions')
+@login_required
+def api_sync_transactions():
+    """
+    Transactions added since an opaque cursor, plus the current balance
+    A missing or foreign cursor starts over with reset=true
+    """
+    phone = session['phone']
+    owner = _sync_owner(phone)
+    
+    after_id = 0
+    reset = True
+    cursor = request.args.get('cursor', '')
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_owner, last_id = base64.urlsafe_b64decode(padded).decode().split('|')
+        if cursor_owner == owner:
+            after_id = int(last_id)
+            reset = False
+    except (ValueError, UnicodeDecodeError):
+        pass
+    
+    def payload():
+        transactions = get_transactions_since(phone, after_id, SYNC_PAGE_SIZE)
+        if transactions is None:
+            return {'success': False, 'error': 'Could not load transactions'}
+        
+        last_id = transactions[-1]['id'] if transactions else after_id
+        next_cursor = base64.urlsafe_b64encode(f"{owner}|{last_id}".encode()).decode().rstrip('=')
+        return {
+            'success': True,
+            'owner': owner,
+            'reset': reset,
+            'transactions': transactions,
+            'balance': get_user_balance_by_phone(phone),
+            'cursor': next_cursor,
+            'has_more': len(transactions) == SYNC_PAGE_SIZE
+        }
+    
+    return conditional_json('ledger', payload)
+
 # Route: Profile
 @app.route('/profile')
 @login_required
@@ -1807,7 +2092,7 @@ def profile():
         return redirect(url_for('phone_screen'))
     
     # Get transaction statistics
-    stats = get_transaction_stats(phone)
+    stats = coalesced('transaction_stats', lambda: get_transaction_stats(phone))
     
     # Get unread notification count
     unread_count = notification_service.get_unread_count(phone)
@@ -1838,22 +2123,26 @@ def download_receipt():
     elif date_range == 'month':
         start_date = datetime.now() - timedelta(days=30)
     
-    # Get filtered transactions
-    transactions = get_filtered_transactions(
-        phone=phone,  # Fixed: Changed from 'username' to 'phone'
-        transaction_type=filter_type if filter_type != 'all' else None,
-        start_date=start_date.strftime('%Y-%m-%d') if start_date else None,
-        end_date=end_date.strftime('%Y-%m-%d'),
-        limit=1000
-    )
+    def build_statement():
+        # Get filtered transactions
+        transactions = get_filtered_transactions(
+            phone=phone,  # Fixed: Changed from 'username' to 'phone'
+            transaction_type=filter_type if filter_type != 'all' else None,
+            start_date=start_date.strftime('%Y-%m-%d') if start_date else None,
+            end_date=end_date.strftime('%Y-%m-%d'),
+            limit=1000
+        )
+        
+        # Generate PDF
+        return generate_transaction_pdf(
+            phone,
+            transactions,
+            filter_type,
+            date_range
+        )
     
-    # Generate PDF
-    pdf_content = generate_transaction_pdf(
-        phone,
-        transactions,
-        filter_type,
-        date_range
-    )
+    # A double-tapped download builds the PDF once
+    pdf_content = coalesced('download_receipt', build_statement, filter_type, date_range)
     
     # Create response
     response = make_response(pdf_content)
@@ -1884,40 +2173,44 @@ def receipt_preview():
     elif date_range == 'month':
         start_date = datetime.now() - timedelta(days=30)
     
-    # Get filtered transactions
-    transactions = get_filtered_transactions(
-        phone=phone,  # Fixed: Changed from 'username' to 'phone'
-        transaction_type=filter_type if filter_type != 'all' else None,
-        start_date=start_date.strftime('%Y-%m-%d') if start_date else None,
-        end_date=end_date.strftime('%Y-%m-%d'),
-        limit=1000
-    )
-    
-    # Calculate summary
-    total_deposits = sum(t['amount'] for t in transactions if t['type'] == 'deposit')
-    total_withdrawals = sum(t['amount'] for t in transactions if t['type'] == 'withdraw')
-    total_sent = sum(t['amount'] for t in transactions if t['type'] == 'send')
-    total_received = sum(t['amount'] for t in transactions if t['type'] == 'receive')
-    net_flow = (total_deposits + total_received) - (total_withdrawals + total_sent)
-    
-    # Get user info
-    user = get_user_by_phone(phone)
+    def render_preview():
+        # Get filtered transactions
+        transactions = get_filtered_transactions(
+            phone=phone,  # Fixed: Changed from 'username' to 'phone'
+            transaction_type=filter_type if filter_type != 'all' else None,
+            start_date=start_date.strftime('%Y-%m-%d') if start_date else None,
+            end_date=end_date.strftime('%Y-%m-%d'),
+            limit=1000
+        )
+        
+        # Calculate summary
+        total_deposits = sum(t['amount'] for t in transactions if t['type'] == 'deposit')
+        total_withdrawals = sum(t['amount'] for t in transactions if t['type'] == 'withdraw')
+        total_sent = sum(t['amount'] for t in transactions if t['type'] == 'send')
+        total_received = sum(t['amount'] for t in transactions if t['type'] == 'receive')
+        net_flow = (total_deposits + total_received) - (total_withdrawals + total_sent)
+        
+        # Get user info
+        user = get_user_by_phone(phone)
+        
+        return render_template(
+            'receipt_download.html',
+            phone=phone,
+            transactions=transactions,
+            filter_type=filter_type,
+            date_range=date_range,
+            total_transactions=len(transactions),
+            total_deposits=total_deposits,
+            total_withdrawals=total_withdrawals,
+            total_sent=total_sent,
+            total_received=total_received,
+            net_flow=net_flow,
+            current_balance=user['balance'] if user else 0.0,
+            generated_date=datetime.now().strftime('%d %B, %Y at %I:%M %p')
+        )
     
-    return render_template(
-        'receipt_download.html',
-        phone=phone,
-        transactions=transactions,
-        filter_type=filter_type,
-        date_range=date_range,
-        total_transactions=len(transactions),
-        total_deposits=total_deposits,
-        total_withdrawals=total_withdrawals,
-        total_sent=total_sent,
-        total_received=total_received,
-        net_flow=net_flow,
-        current_balance=user['balance'] if user else 0.0,
-        generated_date=datetime.now().strftime('%d %B, %Y at %I:%M %p')
-    )
+    # Identical previews opened together render once
+    return coalesced('receipt_preview', render_preview, filter_type, date_range)
 
 @app.route('/logout')
 def logout():
@@ -1951,23 +2244,23 @@ def logout():
 # API: Get balance
 @app.route('/api/balance')
 @login_required
+@batch_view
 def api_balance():
     phone = session['phone']
-    balance = get_user_balance_by_phone(phone)
-    return jsonify({
+    return conditional_json('ledger', lambda: {
         'success': True,
-        'balance': balance
+        'balance': get_user_balance_by_phone(phone)
     })
 
 # API: Get transaction statistics
 @app.route('/api/stats')
 @login_required
+@batch_view
 def api_stats():
     phone = session['phone']
-    stats = get_transaction_stats(phone)
-    return jsonify({
+    return conditional_json('ledger', lambda: {
         'success': True,
-        'stats': stats
+        'stats': coalesced('transaction_stats', lambda: get_transaction_stats(phone))
     })
 
 # API: Quick deposit
@@ -1988,14 +2281,6 @@ def api_quick_deposit():
         new_balance = update_balance(phone, amount)
         transaction_id = add_transaction(phone, 'deposit', amount, new_balance)
         
-        # Send deposit notification
-        notification_service.send_transaction_notification(
-            phone,
-            'deposit',
-            amount,
-            transaction_id
-        )
-        
         return jsonify({
             'success': True,
             'transaction_id': transaction_id,
@@ -2027,14 +2312,6 @@ def api_quick_withdraw():
         new_balance = update_balance(phone, -amount)
         transaction_id = add_transaction(phone, 'withdraw', amount, new_balance)
         
-        # Send withdrawal notification
-        notification_service.send_transaction_notification(
-            phone,
-            'withdraw',
-            amount,
-            transaction_id
-        )
-        
         return jsonify({
             'success': True,
             'transaction_id': transaction_id,
@@ -2044,6 +2321,24 @@ def api_quick_withdraw():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+RECIPIENT_SUGGESTION_LIMIT = 20
+FREQUENT_RECIPIENT_LIMIT = 5
+
+# API: Recipient suggestions ranked by frequency and recency
+@app.route('/api/recipient-suggestions')
+@login_required
+def api_recipient_suggestions():
+    limit = request.args.get('limit', RECIPIENT_SUGGESTION_LIMIT, type=int)
+    limit = max(1, min(limit, 50))
+    
+    suggestions = get_recipient_suggestions(session['phone'], limit=limit)
+    
+    return jsonify({
+        'success': True,
+        'suggestions': suggestions,
+        'count': len(suggestions)
+    })
+
 @app.route('/send-money', methods=['GET', 'POST'])
 @login_required
 def send_money():
@@ -2054,14 +2349,17 @@ def send_money():
         session.clear()
         return redirect(url_for('phone_screen'))
     
-    # Get last sent identifier for suggestion
-    last_sent = get_last_sent_identifier(phone)
+    # Saved contacts stay a full list; the suggestion index drives the
+    # quick suggestion and a separate row of frequent recipients
+    contacts = db_get_contacts(phone)
+    suggestions = get_recipient_suggestions(phone, limit=RECIPIENT_SUGGESTION_LIMIT)
+    frequent = [s for s in suggestions if s['phone'] and s['use_count'] > 0][:FREQUENT_RECIPIENT_LIMIT]
     last_sent_identifier = None
     last_sent_method = None
     
-    if last_sent:
-        last_sent_identifier = last_sent['identifier']
-        last_sent_method = last_sent['method']
+    if suggestions:
+        last_sent_identifier = suggestions[0]['identifier']
+        last_sent_method = suggestions[0]['payment_method']
     
     # Handle QR method separately - check for hidden fields
     if request.method == 'POST':
@@ -2103,7 +2401,8 @@ def send_money():
                 return render_template('send_money.html',
                                      user=user,
                                      error='Amount must be positive',
-                                     contacts=db_get_contacts(phone),
+                                     contacts=contacts,
+                                     frequent=frequent,
                                      last_sent_identifier=last_sent_identifier,
                                      last_sent_method=last_sent_method)
             
@@ -2112,7 +2411,8 @@ def send_money():
                 return render_template('send_money.html',
                                      user=user,
                                      error='Insufficient balance',
-                                     contacts=db_get_contacts(phone),
+                                     contacts=contacts,
+                                     frequent=frequent,
                                      last_sent_identifier=last_sent_identifier,
                                      last_sent_method=last_sent_method)
             
@@ -2122,7 +2422,8 @@ def send_money():
                 return render_template('send_money.html',
                                      user=user,
                                      error='Maximum transaction limit is ₹50,000',
-                                     contacts=db_get_contacts(phone),
+                                     contacts=contacts,
+                                     frequent=frequent,
                                      last_sent_identifier=last_sent_identifier,
                                      last_sent_method=last_sent_method)
             
@@ -2132,7 +2433,8 @@ def send_money():
                 return render_template('send_money.html',
                                      user=user,
                                      error='Invalid PIN format. Please enter 6 digits.',
-                                     contacts=db_get_contacts(phone),
+                                     contacts=contacts,
+                                     frequent=frequent,
                                      last_sent_identifier=last_sent_identifier,
                                      last_sent_method=last_sent_method)
             
@@ -2142,7 +2444,8 @@ def send_money():
                 return render_template('send_money.html',
                                      user=user,
                                      error='Incorrect PIN',
-                                     contacts=db_get_contacts(phone),
+                                     contacts=contacts,
+                                     frequent=frequent,
                                      last_sent_identifier=last_sent_identifier,
                                      last_sent_method=last_sent_method)
             
@@ -2153,7 +2456,8 @@ def send_money():
                     return render_template('send_money.html',
                                          user=user,
                                          error='Invalid mobile number',
-                                         contacts=db_get_contacts(phone),
+                                         contacts=contacts,
+                                         frequent=frequent,
                                          last_sent_identifier=last_sent_identifier,
                                          last_sent_method=last_sent_method)
             
@@ -2163,7 +2467,8 @@ def send_money():
                     return render_template('send_money.html',
                                          user=user,
                                          error='Invalid UPI ID format',
-                                         contacts=db_get_contacts(phone),
+                                         contacts=contacts,
+                                         frequent=frequent,
                                          last_sent_identifier=last_sent_identifier,
                                          last_sent_method=last_sent_method)
             
@@ -2173,7 +2478,8 @@ def send_money():
                     return render_template('send_money.html',
                                          user=user,
                                          error='Invalid contact identifier',
-                                         contacts=db_get_contacts(phone),
+                                         contacts=contacts,
+                                         frequent=frequent,
                                          last_sent_identifier=last_sent_identifier,
                                          last_sent_method=last_sent_method)
             
@@ -2187,26 +2493,18 @@ def send_money():
                 return render_template('send_money.html',
                                      user=user,
                                      error='You cannot send money to yourself',
-                                     contacts=db_get_contacts(phone),
+                                     contacts=contacts,
+                                     frequent=frequent,
                                      last_sent_identifier=last_sent_identifier,
                                      last_sent_method=last_sent_method)
             
             print(f"DEBUG: All validations passed. Processing payment...")
             
-            # Send payment using database function
+            # Send payment using database function (stages both notifications)
             result = db_send_payment(phone, identifier, amount, payment_method)
             
             print(f"DEBUG: Payment result: {result}")
             
-            # Send notification for sent payment
-            notification_service.send_transaction_notification(
-                phone,
-                'send',
-                amount,
-                result['transaction_id'],
-                receiver_name=identifier
-            )
-            
             # Update user data
             user = get_user_by_phone(phone)
             
@@ -2228,7 +2526,8 @@ def send_money():
             return render_template('send_money.html',
                                  user=user,
                                  error='Invalid amount format',
-                                 contacts=db_get_contacts(phone),
+                                 contacts=contacts,
+                                 frequent=frequent,
                                  last_sent_identifier=last_sent_identifier,
                                  last_sent_method=last_sent_method)
         except Exception as e:
@@ -2238,17 +2537,18 @@ def send_money():
             return render_template('send_money.html',
                                  user=user,
                                  error=f'Transaction failed: {str(e)}',
-                                 contacts=db_get_contacts(phone),
+                                 contacts=contacts,
+                                 frequent=frequent,
                                  last_sent_identifier=last_sent_identifier,
                                  last_sent_method=last_sent_method)
     
     # GET request - show send money page
-    contacts = db_get_contacts(phone)
     unread_count = notification_service.get_unread_count(phone)
     
     return render_template('send_money.html',
                          user=user,
                          contacts=contacts,
+                         frequent=frequent,
                          last_sent_identifier=last_sent_identifier,
                          last_sent_method=last_sent_method,
                          unread_count=unread_count)
@@ -2315,17 +2615,8 @@ def send_money_qr():
         if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+$', upi_id):
             return jsonify({'success': False, 'error': 'Invalid UPI ID format'}), 400
         
-        # Send payment using database function
-        result = db_send_payment(phone, upi_id, amount, 'upi')
-        
-        # Send notification for sent payment
-        notification_service.send_transaction_notification(
-            phone,
-            'send',
-            amount,
-            result['transaction_id'],
-            receiver_name=receiver_name or upi_id
-        )
+        # Send payment using database function (stages both notifications)
+        result = db_send_payment(phone, upi_id, amount, 'upi', receiver_name=receiver_name or upi_id)
         
         # Update user data
         user = get_user_by_phone(phone)
@@ -2354,22 +2645,48 @@ def send_money_qr():
         print(f"Error processing QR payment: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Rendered shared receipts: (transaction_id, template version, base URL) -> (html, etag)
+shared_receipt_cache = TTLCache(maxsize=SHARED_RECEIPT_CACHE_SIZE, ttl=SHARED_RECEIPT_TTL)
+
 # Route: Shared Receipt (Public View)
 @app.route('/shared/receipt/<transaction_id>')
 def view_shared_receipt(transaction_id):
     """Public view of a receipt (no authentication required)"""
+    base_url = get_base_url()
+    key = (transaction_id, template_version('shared_receipt.html'), base_url)
+    
+    cached = shared_receipt_cache.get(key)
+    if cached is None:
+        html = render_shared_receipt(transaction_id, base_url)
+        if html is None:
+            return render_template('404.html'), 404
+        cached = (html, hashlib.sha1(html.encode()).hexdigest()[:24])
+        shared_receipt_cache.set(key, cached)
+    
+    html, etag = cached
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(html)
+    response.set_etag(etag)
+    # Browsers and CDNs can absorb repeat views of a viral link
+    response.headers['Cache-Control'] = f'public, max-age={SHARED_RECEIPT_MAX_AGE}'
+    return response
+
+def render_shared_receipt(transaction_id, base_url):
+    """HTML of the public receipt page, or None if the transaction is unknown"""
     
     # Get transaction details
     transaction = get_transaction_by_id(transaction_id)
     
     if not transaction:
-        return render_template('404.html'), 404
+        return None
     
     # Get sender user info
     sender = get_user_by_phone(transaction['phone'])
     
     if not sender:
-        return render_template('404.html'), 404
+        return None
     
     # Format transaction date
     try:
@@ -2391,7 +2708,7 @@ def view_shared_receipt(transaction_id):
                          sender=sender,
                          transaction_date=transaction_date,
                          success_data=success_data,
-                         base_url=get_base_url())  # Add this
+                         base_url=base_url)
 
 @app.route('/contacts', methods=['GET', 'POST'])
 @login_required
@@ -2424,7 +2741,7 @@ def contacts():
                 flash('Contact added successfully!', 'success')
                 
                 # Send notification
-                notification_service.add_notification(
+                notification_service.enqueue(
                     phone,
                     "Contact Added",
                     f"{nickname or contact_phone} added to your contacts",
@@ -2525,94 +2842,11 @@ def api_sync_contacts_from_history():
     phone = session['phone']
     
     try:
-        db = get_db()
-        
-        # Get unique people from sent transactions
-        sent_contacts = db.execute('''
-            SELECT DISTINCT receiver_identifier 
-            FROM transactions 
-            WHERE phone = ? 
-            AND type = 'send' 
-            AND receiver_identifier IS NOT NULL
-        ''', (phone,)).fetchall()
-        
-        # Get unique people from received transactions
-        received_contacts = db.execute('''
-            SELECT DISTINCT sender_identifier 
-            FROM transactions 
-            WHERE phone = ? 
-            AND type = 'receive' 
-            AND sender_identifier IS NOT NULL
-        ''', (phone,)).fetchall()
-        
-        added_count = 0
-        
-        # Process sent contacts
-        for contact in sent_contacts:
-            contact_identifier = contact['receiver_identifier']
-            
-            # Try to find user by phone or UPI
-            contact_user = None
-            if '@' in contact_identifier:
-                contact_user = db.execute('SELECT phone FROM users WHERE upi_id = ?', 
-                                         (contact_identifier,)).fetchone()
-            else:
-                contact_user = db.execute('SELECT phone FROM users WHERE phone = ?', 
-                                         (contact_identifier,)).fetchone()
-            
-            if contact_user:
-                contact_phone = contact_user['phone']
-                
-                # Check if already in contacts
-                existing = db.execute('''
-                    SELECT id FROM contacts 
-                    WHERE user_phone = ? AND contact_phone = ?
-                ''', (phone, contact_phone)).fetchone()
-                
-                if not existing:
-                    # Add to contacts
-                    db.execute('''
-                        INSERT INTO contacts (user_phone, contact_phone)
-                        VALUES (?, ?)
-                    ''', (phone, contact_phone))
-                    added_count += 1
-        
-        # Process received contacts
-        for contact in received_contacts:
-            contact_identifier = contact['sender_identifier']
-            
-            # Try to find user by phone or UPI
-            contact_user = None
-            if '@' in contact_identifier:
-                contact_user = db.execute('SELECT phone FROM users WHERE upi_id = ?', 
-                                         (contact_identifier,)).fetchone()
-            else:
-                contact_user = db.execute('SELECT phone FROM users WHERE phone = ?', 
-                                         (contact_identifier,)).fetchone()
-            
-            if contact_user:
-                contact_phone = contact_user['phone']
-                
-                # Check if already in contacts
-                existing = db.execute('''
-                    SELECT id FROM contacts 
-                    WHERE user_phone = ? AND contact_phone = ?
-                ''', (phone, contact_phone)).fetchone()
-                
-                if not existing:
-                    # Add to contacts
-                    db.execute('''
-                        INSERT INTO contacts (user_phone, contact_phone)
-                        VALUES (?, ?)
-                    ''', (phone, contact_phone))
-                    added_count += 1
-        
-        db.commit()
-        db.close()
+        added_count = sync_contacts_from_history(phone)
         
         # Send notification if contacts were added
         if added_count > 0:
-            notification_service.add_notification(
+            notification_service.enqueue(
                 phone,
                 "Contacts Synced",
                 f"Added {added_count} new contacts from your transaction history",
@@ -2653,25 +2887,28 @@ def notifications_page():
 
 @app.route('/api/notifications')
 @login_required
+@batch_view
 def api_notifications():
     """API to get notifications"""
     phone = session['phone']
     
     unread_only = request.args.get('unread_only', 'false').lower() == 'true'
-    limit = request.args.get('limit', 10, type=int)
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+    cursor = request.args.get('cursor')
     
-    if unread_only:
-        notifications = notification_service.get_unread_notifications(phone, limit)
-    else:
-        notifications = notification_service.get_all_notifications(phone, limit)
-    
-    unread_count = notification_service.get_unread_count(phone)
+    def payload():
+        # Only the raw created_at: a 304 would keep stale "5 minutes ago" text
+        notifications, next_cursor = notification_service.get_notifications_page(
+            phone, limit, cursor=cursor, unread_only=unread_only, relative_times=False
+        )
+        return {
+            'success': True,
+            'notifications': notifications,
+            'unread_count': notification_service.get_unread_count(phone),
+            'next_cursor': next_cursor
+        }
     
-    return jsonify({
-        'success': True,
-        'notifications': notifications,
-        'unread_count': unread_count
-    })
+    return conditional_json('notifications', payload)
 
 @app.route('/api/notifications/<int:notification_id>/read', methods=['POST'])
 @login_required
@@ -2725,39 +2962,214 @@ def api_delete_read_notifications():
         'unread_count': notification_service.get_unread_count(phone)
     })
 
+def _notification_ids_from_request():
+    """Integer notification IDs from a JSON body {"ids": [...]}, or None if malformed"""
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids or len(ids) > MAX_BULK_IDS:
+        return None
+    try:
+        return [int(notification_id) for notification_id in ids]
+    except (TypeError, ValueError):
+        return None
+
+@app.route('/api/notifications/read-selected', methods=['POST'])
+@login_required
+def api_mark_selected_notifications_read():
+    """API to mark a list of notifications as read"""
+    phone = session['phone']
+    ids = _notification_ids_from_request()
+    
+    if ids is None:
+        return jsonify({'success': False, 'error': f'ids must be a list of 1-{MAX_BULK_IDS} notification IDs'}), 400
+    
+    updated = notification_service.mark_many_as_read(ids, phone)
+    
+    return jsonify({
+        'success': updated is not None,
+        'updated': updated or 0,
+        'unread_count': notification_service.get_unread_count(phone)
+    })
+
+@app.route('/api/notifications/delete-selected', methods=['POST'])
+@login_required
+def api_delete_selected_notifications():
+    """API to delete a list of notifications"""
+    phone = session['phone']
+    ids = _notification_ids_from_request()
+    
+    if ids is None:
+        return jsonify({'success': False, 'error': f'ids must be a list of 1-{MAX_BULK_IDS} notification IDs'}), 400
+    
+    deleted = notification_service.delete_many(ids, phone)
+    
+    return jsonify({
+        'success': deleted is not None,
+        'deleted': deleted or 0,
+        'unread_count': notification_service.get_unread_count(phone)
+    })
+
+@app.route('/api/notifications/settings', methods=['GET', 'POST'])
+@login_required
+def api_notification_settings():
+    """API to read or change notification preferences (payment digests)"""
+    phone = session['phone']
+    
+    if request.method == 'GET':
+        settings = notification_service.get_settings(phone)
+    else:
+        data = request.get_json(silent=True) or {}
+        try:
+            window = data.get('digest_window_seconds')
+            settings = notification_service.update_settings(
+                phone,
+                digest_enabled=data.get('digest_enabled'),
+                digest_window_seconds=int(window) if window is not None else None
+            )
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'digest_window_seconds must be a number'}), 400
+    
+    if settings is None:
+        return jsonify({'success': False, 'error': 'Could not load notification settings'}), 500
+    
+    return jsonify({'success': True, 'settings': settings})
+
 @app.route('/api/notifications/count')
 @login_required
+@batch_view
 def api_notification_count():
     """API to get unread notification count"""
     phone = session['phone']
-    count = notification_service.get_unread_count(phone)
-    
-    return jsonify({
+    return conditional_json('notifications', lambda: {
         'success': True,
-        'count': count
+        'count': notification_service.get_unread_count(phone)
     })
 
+# API: System announcement to every user (operations only)
+@app.route('/api/admin/broadcast', methods=['GET', 'POST'])
+def api_broadcast():
+    """Start a broadcast (POST) or report the latest one (GET)"""
+    token = request.headers.get('X-Broadcast-Token', '')
+    if not BROADCAST_TOKEN or not hmac.compare_digest(token, BROADCAST_TOKEN):
+        return jsonify({'success': False, 'error': 'Not authorized'}), 403
+    
+    if request.method == 'GET':
+        return jsonify({'success': True, 'broadcast': notification_service.last_broadcast})
+    
+    data = request.get_json(silent=True) or {}
+    title = (data.get('title') or '').strip()
+    message = (data.get('message') or '').strip()
+    notification_type = data.get('type', 'info')
+    
+    if not title or not message:
+        return jsonify({'success': False, 'error': 'title and message are required'}), 400
+    if notification_type not in ('info', 'success', 'warning', 'error'):
+        return jsonify({'success': False, 'error': 'Invalid notification type'}), 400
+    
+    if not notification_service.start_broadcast(title, message, notification_type, {'type': 'broadcast'}):
+        return jsonify({'success': False, 'error': 'A broadcast is already running'}), 409
+    
+    return jsonify({'success': True, 'status': 'started'}), 202
+
+# API: Server-Sent Events stream of notifications and balance changes
+@app.route('/api/events')
+@login_required
+def api_events():
+    """Push notification, unread count and balance events to the logged-in user"""
+    phone = session['phone']
+    
+    try:
+        subscription = event_bus.subscribe(phone)
+    except EventBusFull:
+        response = jsonify({'success': False, 'error': 'Too many open event streams'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    
+    response = Response(event_bus.stream(subscription, last_event_id), mimetype='text/event-stream')
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Frees the slot even if the client goes away before the stream starts
+    response.call_on_close(lambda: event_bus.unsubscribe(subscription))
+    return response
+
+def run_batch_request(adapter, item, current_session):
+    """Status, JSON body and ETag of one /api/batch sub-request"""
+    path = item.get('path') if isinstance(item, dict) else None
+    if not isinstance(path, str) or not path.startswith('/'):
+        return 400, {'success': False, 'error': 'A path is required'}, None
+    
+    url = urlsplit(path)
+    try:
+        endpoint, view_args = adapter.match(url.path, method='GET')
+    except HTTPException:
+        return 404, {'success': False, 'error': 'Not found'}, None
+    view = BATCH_VIEWS.get(endpoint)
+    if view is None:
+        return 403, {'success': False, 'error': 'Not allowed in a batch'}, None
+    
+    headers = {}
+    if item.get('etag'):
+        headers['If-None-Match'] = item['etag']
+    environ = EnvironBuilder(path=url.path, query_string=url.query, headers=headers,
+                             base_url=request.host_url).get_environ()
+    
+    # Own request for args and ETags, but the session is the batch's, already loaded
+    ctx = app.request_context(environ)
+    ctx.session = current_session
+    with ctx:
+        # The batch itself is login_required, so the check is not repeated
+        response = app.make_response(view(**view_args))
+    
+    body = response.get_json(silent=True) if response.status_code != 304 else None
+    return response.status_code, body, response.headers.get('ETag')
+
+# API: Several read requests in one round trip
+@app.route('/api/batch', methods=['POST'])
+@login_required
+def api_batch():
+    """
+    Run whitelisted GET endpoints on one DB connection
+    Body: {"requests": [{"id": "balance", "path": "/api/balance", "etag": "..."}]}
+    Responses are keyed by id: {"status", "body", "etag"}; a 304 has no body
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('requests')
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'error': 'requests must be a non-empty list'}), 400
+    if len(items) > BATCH_MAX_REQUESTS:
+        return jsonify({'success': False, 'error': f'At most {BATCH_MAX_REQUESTS} requests per batch'}), 400
+    
+    adapter = app.create_url_adapter(request)
+    current_session = session._get_current_object()
+    responses = {}
+    
+    with db_scope():
+        for index, item in enumerate(items):
+            key = str(item.get('id') or item.get('path') or index) if isinstance(item, dict) else str(index)
+            try:
+                status, body, etag = run_batch_request(adapter, item, current_session)
+            except Exception as e:
+                print(f"Error in batch request {key}: {e}")
+                status, body, etag = 500, {'success': False, 'error': 'Request failed'}, None
+            responses[key] = {'status': status, 'body': body, 'etag': etag}
+    
+    return jsonify({'success': True, 'responses': responses})
+
 # Route: Service Worker
 @app.route('/sw.js')
 def sw():
-    response = make_response(open('service-worker.js').read())
-    response.headers['Content-Type'] = 'application/javascript'
-    response.headers['Service-Worker-Allowed'] = '/'
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    return response
+    return shell_assets.response('service-worker')
 
 @app.route('/service-worker.js')
 def service_worker():
-    response = make_response(open('service-worker.js').read())
-    response.headers['Content-Type'] = 'application/javascript'
-    response.headers['Service-Worker-Allowed'] = '/'
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    return response
+    return shell_assets.response('service-worker')
 
 # Route: Manifest
 @app.route('/manifest.json')
 def serve_manifest():
-    return send_from_directory('.', 'manifest.json')
+    return shell_assets.response('manifest')
 
 # Route: Offline page
 @app.route('/offline')
@@ -2770,7 +3182,9 @@ def health():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'service': 'EasyCash API'
+        'service': 'EasyCash API',
+        'event_streams': event_bus.stats(),
+        'singleflight': singleflight.stats()
     })
 
 # Error handlers
@@ -0,0 +1,144 @@
+"""
+Contact Sync Benchmark for EasyCash
+Compares the per-identifier contact sync from transaction history with the
+set-based sync_contacts_from_history on a user with thousands of counterparties.
+
+Usage: python benchmarks/contact_sync_bench.py [counterparties]
+"""
+import contextlib
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+USER_PHONE = '9000000000'
+
+
+def legacy_sync(db_path, phone):
+    """api_sync_contacts_from_history as it was before sync_contacts_from_history"""
+    db = sqlite3.connect(db_path)
+    db.row_factory = sqlite3.Row
+
+    sent_contacts = db.execute('''
+        SELECT DISTINCT receiver_identifier FROM transactions
+        WHERE phone = ? AND type = 'send' AND receiver_identifier IS NOT NULL
+    ''', (phone,)).fetchall()
+    received_contacts = db.execute('''
+        SELECT DISTINCT sender_identifier FROM transactions
+        WHERE phone = ? AND type = 'receive' AND sender_identifier IS NOT NULL
+    ''', (phone,)).fetchall()
+
+    added_count = 0
+    identifiers = [row[0] for row in sent_contacts] + [row[0] for row in received_contacts]
+    for contact_identifier in identifiers:
+        if '@' in contact_identifier:
+            contact_user = db.execute('SELECT phone FROM users WHERE upi_id = ?',
+                                      (contact_identifier,)).fetchone()
+        else:
+            contact_user = db.execute('SELECT phone FROM users WHERE phone = ?',
+                                      (contact_identifier,)).fetchone()
+        if contact_user:
+            existing = db.execute('''
+                SELECT id FROM contacts WHERE user_phone = ? AND contact_phone = ?
+            ''', (phone, contact_user['phone'])).fetchone()
+            if not existing:
+                db.execute('INSERT INTO contacts (user_phone, contact_phone) VALUES (?, ?)',
+                           (phone, contact_user['phone']))
+                added_count += 1
+
+    db.commit()
+    db.close()
+    return added_count
+
+
+def build_database(db_path, counterparties, rng):
+    """Create a user whose history touches the given number of people"""
+    database.DATABASE_PATH = db_path
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        database.init_db()
+
+    db = sqlite3.connect(db_path)
+    phones = [str(6000000000 + i) for i in range(counterparties)]
+    db.executemany(
+        'INSERT INTO users (phone, username, pin_hash, balance, upi_id) VALUES (?, ?, ?, ?, ?)',
+        [(USER_PHONE, 'Bench', 'x', 0.0, f'{USER_PHONE}@easycash')] +
+        [(p, f'User_{p[-4:]}', 'x', 0.0, f'{p}@easycash') for p in phones]
+    )
+
+    rows = []
+    for p in phones:
+        # Mix of phone and UPI identifiers, repeat payments and unregistered payees
+        for _ in range(rng.randint(1, 3)):
+            if rng.random() < 0.5:
+                rows.append((USER_PHONE, str(uuid.uuid4()), 'send', 1.0, 0.0, 'mobile', p, None))
+            else:
+                rows.append((USER_PHONE, str(uuid.uuid4()), 'send', 1.0, 0.0, 'upi', f'{p}@easycash', None))
+        if rng.random() < 0.3:
+            rows.append((USER_PHONE, str(uuid.uuid4()), 'receive', 1.0, 0.0, 'mobile', None, p))
+        if rng.random() < 0.1:
+            rows.append((USER_PHONE, str(uuid.uuid4()), 'send', 1.0, 0.0, 'upi', f'shop{p}@okaxis', None))
+    db.executemany('''
+        INSERT INTO transactions
+        (phone, transaction_id, type, amount, balance_after, payment_method, receiver_identifier, sender_identifier)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    db.commit()
+    db.close()
+    return len(rows)
+
+
+def reset_contacts(db_path):
+    db = sqlite3.connect(db_path)
+    db.execute('DELETE FROM contacts')
+    db.commit()
+    db.close()
+
+
+def main():
+    counterparties = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = random.Random(1234)
+    workdir = tempfile.mkdtemp(prefix='easycash-bench-')
+    db_path = os.path.join(workdir, 'easycash.db')
+
+    try:
+        transaction_count = build_database(db_path, counterparties, rng)
+
+        print("=" * 60)
+        print("Contact Sync Benchmark")
+        print("=" * 60)
+        print(f"Counterparties: {counterparties}, transactions: {transaction_count}")
+
+        started = time.perf_counter()
+        legacy_added = legacy_sync(db_path, USER_PHONE)
+        legacy_time = time.perf_counter() - started
+
+        reset_contacts(db_path)
+        started = time.perf_counter()
+        new_added = database.sync_contacts_from_history(USER_PHONE)
+        new_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        rerun_added = database.sync_contacts_from_history(USER_PHONE)
+        rerun_time = time.perf_counter() - started
+
+        print(f"Legacy N+1 sync:  {legacy_time * 1000:10.1f} ms, added {legacy_added}")
+        print(f"Set-based sync:   {new_time * 1000:10.1f} ms, added {new_added}")
+        print(f"Set-based re-run: {rerun_time * 1000:10.1f} ms, added {rerun_added}")
+        print(f"Speedup:          {legacy_time / new_time:10.2f}x")
+        print("=" * 60)
+
+        return 0 if legacy_added == new_added and rerun_added == 0 else 1
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+UPI payload corpus for EasyCash
+Real-world QR text formats seen by the scanner, used to check and benchmark upi_parser
+"""
+
+# upi://pay URLs as produced by EasyCash, bank apps and merchant stickers
+UPI_URLS = [
+    "upi://pay?pa=9876543210@easycash&pn=9876543210&cu=INR",
+    "upi://pay?pa=9876543210@easycash&pn=9876543210&cu=INR&am=250.00",
+    "upi://pay?pa=%2B919876543210%40easycash&pn=Ravi%20Kumar&cu=INR",
+    "upi://pay?pa=merchant.store@okaxis&pn=Sharma%20General%20Store&mc=5411&tid=AXIS0001&tr=ORD12345&tn=Groceries&am=1499.50&cu=INR",
+    "upi://pay?pa=shop@ybl&pn=Shop&mode=02&purpose=00&orgid=159761",
+    "upi://pay?pa=paytmqr28100505010112xyz@paytm&pn=Paytm%20Merchant&paytmqr=28100505010112XYZ",
+    "upi://pay?pa=someone@oksbi&pn=A+B&am=10&cu=INR",
+    "upi://pay?pa=someone@oksbi&&pn=Double%20Amp&flag&cu=INR",
+    "upi://pay?pn=No%20Payee&am=5",
+    "upi://pay?pa=&pn=Empty",
+    "upi://pay?pa=8123456789@EasyCash&phone=1111111111",
+    "upi://pay?phone=7012345678&pn=Phone%20Only",
+    "upi://pay",
+    "upi://pay?",
+    "upi://payment?pa=odd@bank",
+]
+
+# UPI: prefixed payloads from older EasyCash builds
+UPI_PREFIXED = [
+    "UPI:9876543210@easycash",
+    "UPI:9876543210@easycash?pn=Ravi&am=100",
+    "UPI:+919876543210@easycash?pn=Ravi%20Kumar",
+    "UPI:friend@okicici?pn=Friend&am=42.5&cu=INR",
+    "UPI:9876543210@easycash?pa=other@ybl",
+    "UPI:%39876543210@easycash",
+    "UPI:",
+    "UPI:?pn=Nobody",
+]
+
+# Bare UPI IDs (VPAs)
+BARE_VPAS = [
+    "9876543210@easycash",
+    "+919876543210@easycash",
+    "9876543210@EASYCASH",
+    "ravi.kumar@okhdfcbank",
+    "shop_42@ybl",
+    "first-last@axl",
+    "a@b",
+    "  7012345678@easycash  ",
+    "5876543210@easycash",
+]
+
+# Free text that contains an EasyCash UPI ID or just a phone number
+PHONE_TEXT = [
+    "Pay me at 9876543210@easycash thanks!",
+    "Name: Ravi\nUPI: +919876543210@easycash\nBank: SBI",
+    "contact@easycash support line",
+    "9876543210",
+    "+919876543210",
+    "Call +91 9876543210 for payment",
+    "Mobile:9876543210, Alt:8765432109",
+    "tel:+919876543210",
+    "Order #12345678901 for 1234567890",
+    "hello world",
+    "",
+    "   ",
+]
+
+UPI_CORPUS = UPI_URLS + UPI_PREFIXED + BARE_VPAS + PHONE_TEXT
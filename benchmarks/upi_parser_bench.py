@@ -0,0 +1,165 @@
+"""
+UPI Parser Benchmark for EasyCash
+Checks upi_parser against the previous parse_upi_qr on the corpus plus
+random mutations of it, then compares throughput.
+
+Usage: python benchmarks/upi_parser_bench.py [iterations]
+"""
+import contextlib
+import os
+import random
+import re
+import sys
+import time
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upi_parser import parse_upi_payload
+from benchmarks.upi_corpus import UPI_CORPUS
+
+
+def legacy_parse_upi_qr(qr_data):
+    """parse_upi_qr as it was before upi_parser (debug prints included)"""
+    if not qr_data:
+        return None
+    qr_data = qr_data.strip()
+    print(f"DEBUG parse_upi_qr: Raw QR data: {qr_data}")
+    params = {}
+    phone_upi_pattern = r'^(\+91)?[6-9]\d{9}@easycash$'
+    if re.match(phone_upi_pattern, qr_data, re.IGNORECASE):
+        print(f"DEBUG: Phone-based UPI ID detected: {qr_data}")
+        params['pa'] = qr_data
+        phone_match = re.match(r'^(\+91)?([6-9]\d{9})@easycash$', qr_data, re.IGNORECASE)
+        if phone_match:
+            params['phone'] = phone_match.group(2)
+        return params
+    if re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+$', qr_data):
+        print(f"DEBUG: Direct UPI ID detected: {qr_data}")
+        params['pa'] = qr_data
+        phone_match = re.match(r'^(\+91)?([6-9]\d{9})@easycash$', qr_data, re.IGNORECASE)
+        if phone_match:
+            params['phone'] = phone_match.group(2)
+        return params
+    if qr_data.startswith('upi://pay'):
+        print(f"DEBUG: UPI URL detected: {qr_data}")
+        if '?' in qr_data:
+            query_string = qr_data.split('?', 1)[1]
+            for param in query_string.split('&'):
+                if '=' in param:
+                    key, value = param.split('=', 1)
+                    params[key] = unquote(value)
+        if 'pa' in params:
+            phone_match = re.match(r'^(\+91)?([6-9]\d{9})@easycash$', params['pa'], re.IGNORECASE)
+            if phone_match:
+                params['phone'] = phone_match.group(2)
+    elif qr_data.startswith('UPI:'):
+        print(f"DEBUG: Alternative UPI format detected: {qr_data}")
+        qr_data = qr_data[4:]
+        if '?' in qr_data:
+            upi_part, query_part = qr_data.split('?', 1)
+            params['pa'] = unquote(upi_part)
+            phone_match = re.match(r'^(\+91)?([6-9]\d{9})@easycash$', params['pa'], re.IGNORECASE)
+            if phone_match:
+                params['phone'] = phone_match.group(2)
+            for param in query_part.split('&'):
+                if '=' in param:
+                    key, value = param.split('=', 1)
+                    params[key] = unquote(value)
+        else:
+            params['pa'] = unquote(qr_data)
+            phone_match = re.match(r'^(\+91)?([6-9]\d{9})@easycash$', params['pa'], re.IGNORECASE)
+            if phone_match:
+                params['phone'] = phone_match.group(2)
+    elif '@easycash' in qr_data.lower():
+        print(f"DEBUG: Checking for phone-based UPI ID in text: {qr_data}")
+        phone_upi_match = re.search(r'((\+91)?[6-9]\d{9}@easycash)', qr_data, re.IGNORECASE)
+        if phone_upi_match:
+            params['pa'] = phone_upi_match.group(1)
+            phone_match = re.match(r'^(\+91)?([6-9]\d{9})@easycash$', params['pa'], re.IGNORECASE)
+            if phone_match:
+                params['phone'] = phone_match.group(2)
+    elif re.search(r'(\+91)?[6-9]\d{9}', qr_data):
+        print(f"DEBUG: Checking for phone number in text: {qr_data}")
+        phone_match = re.search(r'(\+91)?([6-9]\d{9})', qr_data)
+        if phone_match:
+            params['phone'] = phone_match.group(2)
+            params['pa'] = f"{params['phone']}@easycash"
+    print(f"DEBUG: Final parsed params: {params}")
+    return params if params else None
+
+
+def new_parse(qr_data):
+    payload = parse_upi_payload(qr_data)
+    return payload.as_params() if payload else None
+
+
+# Characters that tend to break hand-written UPI parsers
+FUZZ_ALPHABET = '?&=%@+:/ .9876543210abcUPIupi\n\t#'
+
+
+def mutate(text, rng):
+    """Insert, delete or replace a few characters"""
+    chars = list(text)
+    for _ in range(rng.randint(1, 4)):
+        op = rng.random()
+        pos = rng.randint(0, len(chars))
+        if op < 0.4 or not chars:
+            chars.insert(pos, rng.choice(FUZZ_ALPHABET))
+        elif op < 0.7:
+            del chars[min(pos, len(chars) - 1)]
+        else:
+            chars[min(pos, len(chars) - 1)] = rng.choice(FUZZ_ALPHABET)
+    return ''.join(chars)
+
+
+def check_parity(samples):
+    """Return inputs where the new parser disagrees with the old one"""
+    mismatches = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for text in samples:
+            if legacy_parse_upi_qr(text) != new_parse(text):
+                mismatches.append(text)
+    return mismatches
+
+
+def time_parser(func, samples, iterations):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for text in samples:
+                func(text)
+        return time.perf_counter() - started
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rng = random.Random(1234)
+    fuzzed = [mutate(rng.choice(UPI_CORPUS), rng) for _ in range(5000)]
+
+    print("=" * 60)
+    print("UPI Parser Benchmark")
+    print("=" * 60)
+
+    corpus_mismatches = check_parity(UPI_CORPUS)
+    fuzz_mismatches = check_parity(fuzzed)
+    print(f"Corpus entries: {len(UPI_CORPUS)}, mismatches: {len(corpus_mismatches)}")
+    print(f"Fuzzed inputs: {len(fuzzed)}, mismatches: {len(fuzz_mismatches)}")
+    for text in (corpus_mismatches + fuzz_mismatches)[:10]:
+        print(f"  MISMATCH {text!r}")
+
+    calls = iterations * len(UPI_CORPUS)
+    legacy_time = time_parser(legacy_parse_upi_qr, UPI_CORPUS, iterations)
+    new_time = time_parser(new_parse, UPI_CORPUS, iterations)
+
+    print(f"\nParsed {calls} payloads per parser")
+    print(f"Legacy parse_upi_qr: {calls / legacy_time:12.0f} payloads/s")
+    print(f"upi_parser:          {calls / new_time:12.0f} payloads/s")
+    print(f"Speedup:             {legacy_time / new_time:12.2f}x")
+    print("=" * 60)
+
+    return 1 if corpus_mismatches or fuzz_mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
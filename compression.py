@@ -0,0 +1,183 @@
+"""
+Response Compression for EasyCash
+WSGI middleware that gzip (or brotli, when installed) compresses text
+responses, serving static files from copies compressed once at startup
+"""
+import gzip
+import os
+import re
+
+from werkzeug.datastructures import Headers
+from werkzeug.security import safe_join
+
+# Brotli is optional; gzip is always available
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_MAX_SIZE = 10 * 1024 * 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Static files are compressed once, so they get the slowest, smallest settings
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+
+# Event streams, images, PDFs and fonts are left alone
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript',
+    'application/javascript', 'application/json', 'application/manifest+json',
+    'image/svg+xml'
+}
+STATIC_EXTENSIONS = ('.js', '.css', '.svg', '.json', '.html', '.txt')
+
+ETAG_SUFFIX_RE = re.compile(r'-(?:gzip|br)"')
+
+
+def choose_encoding(accept_encoding):
+    """Best encoding the client accepts ('br', 'gzip') or None"""
+    accepted = set()
+    for part in (accept_encoding or '').lower().split(','):
+        name, _, params = part.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q=') and q[2:].strip() in ('0', '0.0', '0.00', '0.000'):
+            continue
+        accepted.add(name.strip())
+
+    if BROTLI_AVAILABLE and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, static=False):
+    if encoding == 'br':
+        return brotli.compress(data, quality=STATIC_BROTLI_QUALITY if static else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=STATIC_GZIP_LEVEL if static else GZIP_LEVEL, mtime=0)
+
+
+class StaticPrecompressor:
+    """Compressed copies of static files, rebuilt when a file's mtime changes"""
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self._files = {}
+
+    def encodings(self):
+        return ('br', 'gzip') if BROTLI_AVAILABLE else ('gzip',)
+
+    def precompress_all(self):
+        """Compress every text static file up front; returns the number of files"""
+        count = 0
+        for root, _, files in os.walk(self.static_folder):
+            for name in files:
+                if name.endswith(STATIC_EXTENSIONS):
+                    rel_path = os.path.relpath(os.path.join(root, name), self.static_folder)
+                    if self.get(rel_path.replace(os.sep, '/'), 'gzip') is not None:
+                        count += 1
+        return count
+
+    def get(self, filename, encoding):
+        """Compressed bytes of a static file, or None if not worth compressing"""
+        path = safe_join(self.static_folder, filename)
+        if path is None or not filename.endswith(STATIC_EXTENSIONS):
+            return None
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        entry = self._files.get(filename)
+        if entry is None or entry[0] != mtime:
+            with open(path, 'rb') as f:
+                data = f.read()
+            variants = {}
+            if len(data) >= COMPRESS_MIN_SIZE:
+                for name in self.encodings():
+                    compressed = compress(data, name, static=True)
+                    if len(compressed) < len(data):
+                        variants[name] = compressed
+            entry = (mtime, variants)
+            self._files[filename] = entry
+
+        return entry[1].get(encoding)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses above COMPRESS_MIN_SIZE when the client accepts it
+    Only complete responses with a Content-Length are touched, so streamed
+    responses such as the event stream pass straight through
+    """
+
+    def __init__(self, app, static_folder=None, static_url_path='/static', min_size=COMPRESS_MIN_SIZE):
+        self.app = app
+        self.static_prefix = static_url_path.rstrip('/') + '/'
+        self.static = StaticPrecompressor(static_folder) if static_folder else None
+        self.min_size = min_size
+
+    def __call__(self, environ, start_response):
+        encoding = choose_encoding(environ.get('HTTP_ACCEPT_ENCODING'))
+
+        # The app compares If-None-Match against its own, unsuffixed ETags
+        if environ.get('HTTP_IF_NONE_MATCH'):
+            environ['HTTP_IF_NONE_MATCH'] = ETAG_SUFFIX_RE.sub('"', environ['HTTP_IF_NONE_MATCH'])
+
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return lambda data: None
+
+        body = self.app(environ, capture)
+        status, headers, exc_info = captured
+        headers = Headers(headers)
+
+        mimetype = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if mimetype not in COMPRESSIBLE_TYPES or 'Content-Encoding' in headers:
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return body
+
+        vary = headers.get('Vary')
+        if not vary:
+            headers['Vary'] = 'Accept-Encoding'
+        elif 'accept-encoding' not in vary.lower():
+            headers['Vary'] = f"{vary}, Accept-Encoding"
+
+        length = headers.get('Content-Length', type=int)
+        if (encoding is None or not status.startswith('200') or environ.get('REQUEST_METHOD') == 'HEAD'
+                or length is None or not self.min_size <= length <= COMPRESS_MAX_SIZE):
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return body
+
+        compressed = None
+        path = environ.get('PATH_INFO', '')
+        if self.static and path.startswith(self.static_prefix):
+            compressed = self.static.get(path[len(self.static_prefix):], encoding)
+
+        if compressed is None:
+            try:
+                data = b''.join(body)
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+            compressed = compress(data, encoding)
+            if len(compressed) >= len(data):
+                start_response(status, headers.to_wsgi_list(), exc_info)
+                return [data]
+        elif hasattr(body, 'close'):
+            body.close()
+
+        headers['Content-Encoding'] = encoding
+        headers['Content-Length'] = str(len(compressed))
+        etag = headers.get('ETag')
+        if etag and etag.endswith('"'):
+            # Each encoding is a different representation
+            headers['ETag'] = f'{etag[:-1]}-{encoding}"'
+
+        start_response(status, headers.to_wsgi_list(), exc_info)
+        return [compressed]
@@ -1,13 +1,34 @@
 import sqlite3
 import os
+import math
+import threading
 import uuid
+from contextlib import contextmanager
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
+from event_bus import event_bus
+from notification_service import notification_service, stage_transaction_notification
+from recipient_directory import recipient_directory
+
 DATABASE_PATH = 'easycash.db'
 
+_scope = threading.local()
+
+class ScopedConnection(sqlite3.Connection):
+    """Connection shared by a db_scope(); close() leaves it open until the scope ends"""
+
+    scoped = False
+
+    def close(self):
+        if not self.scoped:
+            super().close()
+
 def get_db():
-    """Create database connection"""
+    """Create database connection, or return the current thread's scoped one"""
+    db = getattr(_scope, 'db', None)
+    if db is not None:
+        return db
     try:
         db = sqlite3.connect(DATABASE_PATH)
         db.row_factory = sqlite3.Row
@@ -16,6 +37,30 @@ def get_db():
         print(f"Database connection error: {e}")
         raise
 
+def scoped_db():
+    """The current thread's db_scope() connection, or None outside a scope"""
+    return getattr(_scope, 'db', None)
+
+@contextmanager
+def db_scope():
+    """Run several reads on one connection: get_db() in this thread returns it until exit"""
+    if getattr(_scope, 'db', None) is not None:
+        yield _scope.db
+        return
+    
+    db = sqlite3.connect(DATABASE_PATH, factory=ScopedConnection)
+    db.row_factory = sqlite3.Row
+    db.scoped = True
+    _scope.db = db
+    try:
+        yield db
+    finally:
+        _scope.db = None
+        if db.in_transaction:
+            db.rollback()
+        db.scoped = False
+        db.close()
+
 def table_exists(db, table_name):
     """Check if a table exists in the database"""
     try:
@@ -85,6 +130,8 @@ def fix_transactions_table_constraint():
                 
                 db.execute('CREATE INDEX IF NOT EXISTS idx_transactions_phone ON transactions(phone)')
                 db.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date_time)')
+                # Triggers went with the old table
+                init_user_versions(db)
         
         db.commit()
         db.close()
@@ -215,6 +262,13 @@ def init_db():
         except:
             pass
         
+        try:
+            # Newest-first keyset paging of one user's history
+            db.execute('CREATE INDEX IF NOT EXISTS idx_transactions_phone_date ON transactions(phone, date_time, id)')
+            print("✓ Created transactions paging index")
+        except:
+            pass
+        
         try:
             db.execute('CREATE INDEX IF NOT EXISTS idx_users_phone ON users(phone)')
             print("✓ Created users phone index")
@@ -227,6 +281,12 @@ def init_db():
         except:
             pass
         
+        try:
+            db.execute('CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)')
+            print("✓ Created users username index")
+        except:
+            pass
+        
         if table_exists(db, 'contacts'):
             try:
                 db.execute('CREATE INDEX IF NOT EXISTS idx_contacts_user ON contacts(user_phone)')
@@ -234,6 +294,10 @@ def init_db():
             except:
                 pass
         
+        init_user_search_index(db)
+        init_recipient_suggestions(db)
+        init_user_versions(db)
+        
         db.commit()
         db.close()
         
@@ -249,6 +313,309 @@ def init_db():
             db.close()
         raise
 
+def init_user_search_index(db):
+    """Create the trigram full-text index over users, kept in sync by triggers"""
+    try:
+        exists = table_exists(db, 'users_fts')
+        
+        db.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+                username, phone, upi_id,
+                content='users', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+        
+        db.execute('''
+            CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN
+                INSERT INTO users_fts(rowid, username, phone, upi_id)
+                VALUES (new.id, new.username, new.phone, new.upi_id);
+            END
+        ''')
+        db.execute('''
+            CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN
+                INSERT INTO users_fts(users_fts, rowid, username, phone, upi_id)
+                VALUES ('delete', old.id, old.username, old.phone, old.upi_id);
+            END
+        ''')
+        db.execute('''
+            CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF username, phone, upi_id ON users BEGIN
+                INSERT INTO users_fts(users_fts, rowid, username, phone, upi_id)
+                VALUES ('delete', old.id, old.username, old.phone, old.upi_id);
+                INSERT INTO users_fts(rowid, username, phone, upi_id)
+                VALUES (new.id, new.username, new.phone, new.upi_id);
+            END
+        ''')
+        
+        if not exists:
+            # Phone matches rank above UPI ID matches, which rank above usernames
+            db.execute("INSERT INTO users_fts(users_fts, rank) VALUES ('rank', 'bm25(1.0, 10.0, 5.0)')")
+            db.execute("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+        
+        print("✓ Created users full-text search index")
+        return True
+        
+    except sqlite3.OperationalError as e:
+        # SQLite builds without FTS5/trigram fall back to LIKE searches
+        print(f"Users search index unavailable: {e}")
+        return False
+
+def init_user_versions(db):
+    """
+    Per-user data versions behind the API ETags, bumped by triggers
+    The 'ledger' scope covers the user's balance, transactions and contacts
+    """
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS user_versions (
+            phone TEXT NOT NULL,
+            scope TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (phone, scope)
+        ) WITHOUT ROWID
+    ''')
+    
+    triggers = [
+        ('transactions_version_ai', 'AFTER INSERT ON transactions', 'new.phone'),
+        ('transactions_version_au', 'AFTER UPDATE ON transactions', 'new.phone'),
+        ('transactions_version_ad', 'AFTER DELETE ON transactions', 'old.phone'),
+        ('users_version_au', 'AFTER UPDATE OF balance, username, upi_id ON users', 'new.phone'),
+        ('contacts_version_ai', 'AFTER INSERT ON contacts', 'new.user_phone'),
+        ('contacts_version_au', 'AFTER UPDATE ON contacts', 'new.user_phone'),
+        ('contacts_version_ad', 'AFTER DELETE ON contacts', 'old.user_phone')
+    ]
+    for name, event, phone in triggers:
+        db.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN
+                INSERT INTO user_versions (phone, scope, version) VALUES ({phone}, 'ledger', 1)
+                ON CONFLICT(phone, scope) DO UPDATE SET version = version + 1;
+            END
+        ''')
+
+def get_user_version(phone, scope):
+    """Current data version of a user for a scope ('ledger' or 'notifications'), or None on error"""
+    try:
+        db = get_db()
+        row = db.execute('SELECT version FROM user_versions WHERE phone = ? AND scope = ?',
+                         (phone, scope)).fetchone()
+        db.close()
+        return row['version'] if row else 0
+    except Exception as e:
+        print(f"Error getting user version: {e}")
+        return None
+
+def search_users_index(search_term, exclude_phone=None, limit=20):
+    """
+    Search users through the trigram index, best matches first
+    Returns None when the index cannot serve the term (too short or unavailable)
+    """
+    if len(search_term) < 3:
+        return None
+    
+    db = get_db()
+    try:
+        # Quote as an FTS5 string so the term is matched as a plain substring
+        query = '"' + search_term.replace('"', '""') + '"'
+        users = db.execute('''
+            SELECT u.phone, u.username, u.upi_id, u.created_at
+            FROM (
+                SELECT rowid, rank FROM users_fts
+                WHERE users_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            ) AS hits
+            JOIN users u ON u.id = hits.rowid
+            ORDER BY hits.rank
+        ''', (query, limit + 1)).fetchall()
+        
+        return [dict(user) for user in users if user['phone'] != exclude_phone][:limit]
+        
+    except sqlite3.OperationalError as e:
+        print(f"Users search index unavailable: {e}")
+        return None
+    finally:
+        db.close()
+
+# Recipient suggestions are ranked by frecency. Scores live in log2 space
+# relative to a fixed epoch: one use at time t adds 2 ** (t / half-life),
+# so older scores never need to be decayed to compare with newer ones.
+SUGGESTION_HALF_LIFE_DAYS = 14
+SUGGESTION_EPOCH = datetime(2024, 1, 1)
+RECEIVED_SUGGESTION_WEIGHT = 0.5
+
+def _frecency_point(when=None, weight=1.0):
+    """Log2 score contributed by one use at the given UTC time"""
+    when = when or datetime.utcnow()
+    age = (when - SUGGESTION_EPOCH).total_seconds() / (SUGGESTION_HALF_LIFE_DAYS * 86400)
+    return age + math.log2(weight)
+
+def _add_frecency(score, point):
+    """log2(2 ** score + 2 ** point) without overflowing"""
+    if score is None:
+        return point
+    high, low = max(score, point), min(score, point)
+    return high + math.log2(1 + 2 ** (low - high))
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+
+def init_recipient_suggestions(db):
+    """Create the per-user recipient suggestion index and backfill it once"""
+    exists = table_exists(db, 'recipient_suggestions')
+    
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS recipient_suggestions (
+            user_phone TEXT NOT NULL,
+            suggestion_key TEXT NOT NULL,
+            identifier TEXT NOT NULL,
+            payment_method TEXT,
+            contact_phone TEXT,
+            score REAL NOT NULL,
+            use_count INTEGER DEFAULT 0,
+            last_used TIMESTAMP,
+            PRIMARY KEY (user_phone, suggestion_key)
+        )
+    ''')
+    db.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recipient_suggestions_rank
+        ON recipient_suggestions(user_phone, score DESC)
+    ''')
+    print("✓ Created recipient suggestions table")
+    
+    if exists:
+        return
+    
+    # Replay sends, receives and saved contacts in one pass each
+    entries = {}
+    
+    def replay(user_phone, identifier, payment_method, contact_phone, when, weight, counted=True):
+        key = contact_phone or identifier.lower()
+        entry = entries.setdefault((user_phone, key), {
+            'identifier': identifier, 'payment_method': payment_method,
+            'contact_phone': contact_phone, 'score': None, 'use_count': 0, 'last_used': None
+        })
+        entry['score'] = _add_frecency(entry['score'], _frecency_point(when, weight))
+        if counted:
+            entry['use_count'] += 1
+        if when and (entry['last_used'] is None or when >= entry['last_used']):
+            entry['last_used'] = when
+            entry['identifier'] = identifier
+            entry['payment_method'] = payment_method
+    
+    sends = db.execute('''
+        SELECT t.phone, t.receiver_identifier, t.payment_method, t.date_time,
+               COALESCE(by_phone.phone, by_upi.phone) AS contact_phone
+        FROM transactions t
+        LEFT JOIN users by_phone ON by_phone.phone = t.receiver_identifier
+        LEFT JOIN users by_upi ON by_upi.upi_id = lower(t.receiver_identifier)
+        WHERE t.type = 'send' AND t.receiver_identifier IS NOT NULL
+    ''').fetchall()
+    for row in sends:
+        replay(row['phone'], row['receiver_identifier'], row['payment_method'],
+               row['contact_phone'], _parse_timestamp(row['date_time']), 1.0)
+    
+    receives = db.execute('''
+        SELECT t.phone, t.sender_identifier, t.date_time, u.phone AS contact_phone
+        FROM transactions t
+        JOIN users u ON u.phone = t.sender_identifier
+        WHERE t.type = 'receive'
+    ''').fetchall()
+    for row in receives:
+        replay(row['phone'], row['contact_phone'], 'mobile', row['contact_phone'],
+               _parse_timestamp(row['date_time']), RECEIVED_SUGGESTION_WEIGHT)
+    
+    contacts = db.execute('''
+        SELECT user_phone, contact_phone, created_at FROM contacts
+    ''').fetchall()
+    for row in contacts:
+        replay(row['user_phone'], row['contact_phone'], 'contact', row['contact_phone'],
+               _parse_timestamp(row['created_at']), 1.0, counted=False)
+    
+    db.executemany('''
+        INSERT INTO recipient_suggestions
+        (user_phone, suggestion_key, identifier, payment_method, contact_phone, score, use_count, last_used)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (user_phone, key, e['identifier'], e['payment_method'], e['contact_phone'],
+         e['score'], e['use_count'], e['last_used'].strftime('%Y-%m-%d %H:%M:%S') if e['last_used'] else None)
+        for (user_phone, key), e in entries.items()
+    ])
+    print(f"✓ Backfilled {len(entries)} recipient suggestions")
+
+def record_recipient_use(db, user_phone, identifier, payment_method, contact_phone=None,
+                         weight=1.0, counted=True):
+    """Bump a recipient's suggestion score inside the caller's transaction"""
+    key = contact_phone or identifier.lower()
+    row = db.execute('''
+        SELECT score FROM recipient_suggestions
+        WHERE user_phone = ? AND suggestion_key = ?
+    ''', (user_phone, key)).fetchone()
+    
+    now = datetime.utcnow()
+    score = _add_frecency(row['score'] if row else None, _frecency_point(now, weight))
+    
+    db.execute('''
+        INSERT INTO recipient_suggestions
+        (user_phone, suggestion_key, identifier, payment_method, contact_phone, score, use_count, last_used)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_phone, suggestion_key) DO UPDATE SET
+            identifier = excluded.identifier,
+            payment_method = excluded.payment_method,
+            contact_phone = COALESCE(excluded.contact_phone, contact_phone),
+            score = excluded.score,
+            use_count = use_count + excluded.use_count,
+            last_used = excluded.last_used
+    ''', (user_phone, key, identifier, payment_method, contact_phone, score,
+          1 if counted else 0, now.strftime('%Y-%m-%d %H:%M:%S')))
+
+def get_recipient_suggestions(phone, limit=10):
+    """Top recipients for a user by frequency and recency"""
+    try:
+        db = get_db()
+        
+        suggestions = db.execute('''
+            SELECT 
+                s.identifier,
+                s.payment_method,
+                s.contact_phone,
+                s.use_count,
+                s.last_used,
+                u.username,
+                u.upi_id,
+                c.nickname
+            FROM (
+                SELECT * FROM recipient_suggestions
+                WHERE user_phone = ?
+                ORDER BY score DESC
+                LIMIT ?
+            ) s
+            LEFT JOIN users u ON u.phone = s.contact_phone
+            LEFT JOIN contacts c ON c.user_phone = ? AND c.contact_phone = s.contact_phone
+            ORDER BY s.score DESC
+        ''', (phone, limit, phone)).fetchall()
+        
+        db.close()
+        
+        result = []
+        for suggestion in suggestions:
+            result.append({
+                'identifier': suggestion['identifier'],
+                'payment_method': suggestion['payment_method'],
+                'phone': suggestion['contact_phone'],
+                'username': suggestion['username'],
+                'upi_id': suggestion['upi_id'],
+                'nickname': suggestion['nickname'],
+                'use_count': suggestion['use_count'],
+                'last_used': suggestion['last_used']
+            })
+        
+        return result
+        
+    except Exception as e:
+        print(f"Error getting recipient suggestions: {e}")
+        return []
+
 def create_user_with_phone(username, phone, pin):
     """Create a new user with phone number"""
     try:
@@ -269,6 +636,9 @@ def create_user_with_phone(username, phone, pin):
                    (phone, username, hashed_pin, 0.0, upi_id))
         db.commit()
         db.close()
+        
+        # Forget any cached "not found" results for the new identifiers
+        recipient_directory.invalidate(phone, upi_ids=(upi_id,), usernames=(username,))
         return True
         
     except sqlite3.IntegrityError as e:
@@ -415,8 +785,8 @@ def update_balance(phone, amount):
         print(f"Error updating balance: {e}")
         raise
 
-def add_transaction(phone, transaction_type, amount, balance_after, payment_method=None, receiver_identifier=None, sender_identifier=None):
-    """Add transaction record"""
+def add_transaction(phone, transaction_type, amount, balance_after, payment_method=None, receiver_identifier=None, sender_identifier=None, notify=True):
+    """Add transaction record (and stage its notification in the same commit)"""
     try:
         db = get_db()
         
@@ -434,8 +804,19 @@ def add_transaction(phone, transaction_type, amount, balance_after, payment_meth
         ''', (phone, transaction_id, transaction_type, float(amount), float(balance_after), 
               payment_method, receiver_identifier, sender_identifier))
         
+        if notify:
+            stage_transaction_notification(db, phone, transaction_type, float(amount), transaction_id)
+        
         db.commit()
         db.close()
+        
+        if notify:
+            notification_service.wake()
+        event_bus.publish(phone, 'balance', {
+            'balance': float(balance_after),
+            'transaction_id': transaction_id,
+            'type': transaction_type
+        })
         return transaction_id
         
     except sqlite3.IntegrityError as e:
@@ -443,7 +824,7 @@ def add_transaction(phone, transaction_type, amount, balance_after, payment_meth
             print("Constraint error, attempting to fix...")
             fix_transactions_table_constraint()
             return add_transaction(phone, transaction_type, amount, balance_after, 
-                                 payment_method, receiver_identifier, sender_identifier)
+                                 payment_method, receiver_identifier, sender_identifier, notify)
         else:
             raise
     except Exception as e:
@@ -495,6 +876,45 @@ def get_transactions(phone, limit=10, offset=0):
         print(f"Error getting transactions: {e}")
         return []
 
+def get_transactions_since(phone, after_id=0, limit=500):
+    """
+    Get a user's transactions with id above after_id, oldest first
+    Used for delta sync: ids only grow, so the last id seen is the position
+    """
+    try:
+        db = get_db()
+        
+        rows = db.execute('''
+            SELECT 
+                id,
+                transaction_id,
+                type,
+                amount,
+                balance_after,
+                datetime(date_time) as date_time,
+                payment_method,
+                receiver_identifier,
+                sender_identifier
+            FROM transactions 
+            WHERE phone = ? AND id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (phone, after_id, limit)).fetchall()
+        db.close()
+        
+        result = []
+        for row in rows:
+            transaction = dict(row)
+            transaction['amount'] = float(transaction['amount'])
+            transaction['balance_after'] = float(transaction['balance_after'])
+            result.append(transaction)
+        
+        return result
+        
+    except Exception as e:
+        print(f"Error getting transactions since {after_id}: {e}")
+        return None
+
 def get_user_balance_by_phone(phone):
     """Get only user balance"""
     try:
@@ -579,6 +999,66 @@ def get_recent_transactions(phone, limit=5):
     """Get recent transactions for dashboard"""
     return get_transactions(phone, limit=limit)
 
+def get_transactions_page(phone, limit=50, before=None, transaction_type=None,
+                          payment_method=None, start_date=None):
+    """
+    Get one page of a user's transactions, newest first
+    before is the (date_time, id) of the last row of the previous page
+    """
+    try:
+        db = get_db()
+        
+        query = '''
+            SELECT 
+                id,
+                transaction_id,
+                type,
+                amount,
+                balance_after,
+                datetime(date_time) as date_time,
+                payment_method,
+                receiver_identifier,
+                sender_identifier
+            FROM transactions 
+            WHERE phone = ?
+        '''
+        params = [phone]
+        
+        if before:
+            query += ' AND (date_time, id) < (?, ?)'
+            params.extend(before)
+        
+        if transaction_type and transaction_type != 'all':
+            query += ' AND type = ?'
+            params.append(transaction_type)
+        
+        if payment_method and payment_method != 'all':
+            query += ' AND payment_method = ?'
+            params.append(payment_method)
+        
+        if start_date:
+            query += ' AND date_time >= ?'
+            params.append(start_date)
+        
+        query += ' ORDER BY date_time DESC, id DESC LIMIT ?'
+        params.append(limit)
+        
+        rows = db.execute(query, params).fetchall()
+        db.close()
+        
+        result = []
+        for row in rows:
+            transaction = dict(row)
+            transaction['amount'] = float(transaction['amount'])
+            transaction['balance_after'] = float(transaction['balance_after'])
+            result.append(transaction)
+        
+        return result
+        
+    except Exception as e:
+        print(f"Error getting transactions page: {e}")
+        return None
+
 def get_filtered_transactions(phone, transaction_type=None, start_date=None, end_date=None, limit=50):
     """Get filtered transactions"""
     try:
@@ -785,6 +1265,7 @@ def add_contact(user_phone, contact_phone, nickname=None):
             INSERT INTO contacts (user_phone, contact_phone, nickname)
             VALUES (?, ?, ?)
         ''', (user_phone, contact_phone, nickname))
+        record_recipient_use(db, user_phone, contact_phone, 'contact', contact_phone, counted=False)
         
         db.commit()
         db.close()
@@ -804,6 +1285,13 @@ def remove_contact(user_phone, contact_phone):
             WHERE user_phone = ? AND contact_phone = ?
         ''', (user_phone, contact_phone))
         
+        # A suggestion that only came from the contact goes with it;
+        # recipients actually paid keep their history
+        db.execute('''
+            DELETE FROM recipient_suggestions 
+            WHERE user_phone = ? AND suggestion_key = ? AND use_count = 0
+        ''', (user_phone, contact_phone))
+        
         db.commit()
         db.close()
         return True
@@ -812,8 +1300,8 @@ def remove_contact(user_phone, contact_phone):
         print(f"Error removing contact: {e}")
         return False
 
-def send_payment(sender_phone, receiver_identifier, amount, payment_method, description=""):
-    """Send payment to another user"""
+def send_payment(sender_phone, receiver_identifier, amount, payment_method, description="", receiver_name=None):
+    """Send payment to another user (both parties' notifications commit with it)"""
     try:
         db = get_db()
         
@@ -826,12 +1314,10 @@ def send_payment(sender_phone, receiver_identifier, amount, payment_method, desc
         
         receiver = None
         
-        if payment_method == 'mobile':
-            receiver = db.execute('SELECT * FROM users WHERE phone = ?', (receiver_identifier,)).fetchone()
-        elif payment_method == 'upi':
-            receiver = db.execute('SELECT * FROM users WHERE upi_id = ?', (receiver_identifier,)).fetchone()
-        elif payment_method == 'contact':
-            receiver = db.execute('SELECT * FROM users WHERE phone = ?', (receiver_identifier,)).fetchone()
+        recipient = recipient_directory.resolve(receiver_identifier, payment_method)
+        if recipient:
+            receiver = db.execute('SELECT phone, balance FROM users WHERE phone = ?', 
+                                  (recipient['phone'],)).fetchone()
         
         db.execute('BEGIN TRANSACTION')
         
@@ -879,9 +1365,33 @@ def send_payment(sender_phone, receiver_identifier, amount, payment_method, desc
                 sender_phone
             ))
         
+        record_recipient_use(db, sender_phone, receiver_identifier, payment_method, receiver_phone)
+        if receiver_phone:
+            record_recipient_use(db, receiver_phone, sender_phone, 'mobile', sender_phone,
+                                 weight=RECEIVED_SUGGESTION_WEIGHT)
+        
+        stage_transaction_notification(db, sender_phone, 'send', float(amount), transaction_id,
+                                       receiver_name=receiver_name or receiver_identifier)
+        if receiver_phone:
+            stage_transaction_notification(db, receiver_phone, 'receive', float(amount),
+                                           receiver_transaction_id, sender_name=sender['username'])
+        
         db.commit()
         db.close()
         
+        notification_service.wake()
+        event_bus.publish(sender_phone, 'balance', {
+            'balance': new_sender_balance,
+            'transaction_id': transaction_id,
+            'type': 'send'
+        })
+        if receiver_phone:
+            event_bus.publish(receiver_phone, 'balance', {
+                'balance': new_receiver_balance,
+                'transaction_id': receiver_transaction_id,
+                'type': 'receive'
+            })
+        
         return {
             'transaction_id': transaction_id,
             'sender_balance': new_sender_balance,
@@ -969,6 +1479,14 @@ def get_payment_transactions(phone):
 def search_users(search_term):
     """Search users by username, phone, or UPI ID"""
     try:
+        indexed = search_users_index(search_term, limit=20)
+        if indexed is not None:
+            return [{
+                'phone': user['phone'],
+                'username': user['username'],
+                'upi_id': user['upi_id']
+            } for user in indexed]
+        
         db = get_db()
         
         users = db.execute('''
@@ -1000,7 +1518,7 @@ def search_users(search_term):
         print(f"Error searching users: {e}")
         return []
 
-def get_sent_to_contacts(phone, limit=10):
+def get_sent_to_contacts(phone, limit=10, before=None):
     """Get all people the user has sent money to - FIXED VERSION"""
     try:
         db = get_db()
@@ -1028,9 +1546,11 @@ def get_sent_to_contacts(phone, limit=10):
             AND t.type = 'send'
             AND t.receiver_identifier IS NOT NULL
             GROUP BY t.receiver_identifier
-            ORDER BY MAX(t.date_time) DESC
+            {}
+            ORDER BY MAX(t.date_time) DESC, t.receiver_identifier DESC
             LIMIT ?
-        ''', (phone, phone, limit)).fetchall()
+        '''.format('HAVING (MAX(t.date_time), t.receiver_identifier) < (?, ?)' if before else ''),
+            (phone, phone) + (tuple(before) if before else ()) + (limit,)).fetchall()
         
         db.close()
         
@@ -1065,7 +1585,7 @@ def get_sent_to_contacts(phone, limit=10):
         print(f"Error getting sent to contacts: {e}")
         return []
 
-def get_received_from_contacts(phone, limit=10):
+def get_received_from_contacts(phone, limit=10, before=None):
     """Get all people the user has received money from - FIXED VERSION"""
     try:
         db = get_db()
@@ -1093,9 +1613,11 @@ def get_received_from_contacts(phone, limit=10):
             AND t.type = 'receive'
             AND t.sender_identifier IS NOT NULL
             GROUP BY t.sender_identifier
-            ORDER BY MAX(t.date_time) DESC
+            {}
+            ORDER BY MAX(t.date_time) DESC, t.sender_identifier DESC
             LIMIT ?
-        ''', (phone, phone, limit)).fetchall()
+        '''.format('HAVING (MAX(t.date_time), t.sender_identifier) < (?, ?)' if before else ''),
+            (phone, phone) + (tuple(before) if before else ()) + (limit,)).fetchall()
         
         db.close()
         
@@ -1421,6 +1943,7 @@ def add_to_contacts_from_transaction(user_phone, contact_identifier, nickname=No
             INSERT INTO contacts (user_phone, contact_phone, nickname)
             VALUES (?, ?, ?)
         ''', (user_phone, contact_phone, nickname))
+        record_recipient_use(db, user_phone, contact_phone, 'contact', contact_phone, counted=False)
         
         db.commit()
         db.close()
@@ -1431,6 +1954,34 @@ def add_to_contacts_from_transaction(user_phone, contact_identifier, nickname=No
         print(f"Error adding to contacts from transaction: {e}")
         return {'success': False, 'error': str(e)}
         
+def sync_contacts_from_history(phone):
+    """
+    Add everyone the user has paid or been paid by to their contacts
+    Resolves identifiers and inserts in one statement; returns the number added
+    """
+    db = get_db()
+    try:
+        cursor = db.execute('''
+            INSERT OR IGNORE INTO contacts (user_phone, contact_phone)
+            WITH history(identifier) AS (
+                SELECT receiver_identifier FROM transactions
+                WHERE phone = ? AND type = 'send' AND receiver_identifier IS NOT NULL
+                UNION
+                SELECT sender_identifier FROM transactions
+                WHERE phone = ? AND type = 'receive' AND sender_identifier IS NOT NULL
+            )
+            SELECT ?, u.phone FROM history h JOIN users u ON u.phone = h.identifier
+            WHERE u.phone != ?
+            UNION
+            SELECT ?, u.phone FROM history h JOIN users u ON u.upi_id = h.identifier
+            WHERE u.phone != ?
+        ''', (phone, phone, phone, phone, phone, phone))
+        added_count = cursor.rowcount
+        db.commit()
+        return added_count
+    finally:
+        db.close()
+        
 def get_all_received_transactions(phone, limit=50, offset=0):
     """Get all received transactions with sender details"""
     try:
@@ -1506,6 +2057,23 @@ def get_received_transactions_count(phone):
         print(f"Error getting received transactions count: {e}")
         return 0
 
+def get_counterparty_count(phone, transaction_type):
+    """Number of distinct people in a user's sent ('send') or received ('receive') history"""
+    column = 'receiver_identifier' if transaction_type == 'send' else 'sender_identifier'
+    try:
+        db = get_db()
+        result = db.execute(f'''
+            SELECT COUNT(DISTINCT {column}) as count 
+            FROM transactions 
+            WHERE phone = ? AND type = ? AND {column} IS NOT NULL
+        ''', (phone, transaction_type)).fetchone()
+        db.close()
+        
+        return result['count'] if result else 0
+    except Exception as e:
+        print(f"Error getting counterparty count: {e}")
+        return 0
+
 def get_all_people_history(phone, limit=10):
     """Get all people user has interacted with (both sent to and received from)"""
     try:
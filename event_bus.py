@@ -0,0 +1,177 @@
+"""
+Event Bus for EasyCash
+In-process pub/sub feeding the per-user Server-Sent Events stream
+"""
+import itertools
+import json
+import queue
+import threading
+import uuid
+from collections import deque
+
+from ttl_cache import TTLCache
+
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 5000
+MAX_CONNECTIONS = 200
+MAX_CONNECTIONS_PER_USER = 5
+HISTORY_PER_USER = 50
+HISTORY_TTL_SECONDS = 600
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class EventBusFull(Exception):
+    """Raised when this worker cannot accept another event stream"""
+    pass
+
+
+class Subscription:
+    """One open event stream for a user"""
+
+    def __init__(self, phone):
+        self.phone = phone
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+
+class EventBus:
+    """
+    Fans events out to the event streams open on this worker.
+    A short per-user history lets reconnecting clients replay what they
+    missed; when it cannot cover the gap they are told to resync instead.
+    Event IDs are "<worker epoch>-<sequence>", so an ID from another
+    worker or an earlier process is recognised and also triggers a resync.
+    """
+
+    def __init__(self, max_connections=MAX_CONNECTIONS, max_per_user=MAX_CONNECTIONS_PER_USER,
+                 history_size=HISTORY_PER_USER):
+        self.max_connections = max_connections
+        self.max_per_user = max_per_user
+        self.history_size = history_size
+        self.epoch = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._history = TTLCache(maxsize=10000, ttl=HISTORY_TTL_SECONDS)
+        self._ids = itertools.count(1)
+        self._last_seq = 0
+        self.published = 0
+        self.dropped = 0
+
+    def parse_event_id(self, event_id):
+        """Sequence number of an ID issued by this worker, or None"""
+        epoch, _, seq = (event_id or '').partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def publish(self, phone, event, data):
+        """Send an event to every open stream of a user"""
+        if not phone:
+            return None
+
+        with self._lock:
+            seq = self._last_seq = next(self._ids)
+            history = self._history.get(phone)
+            if history is None:
+                history = {'events': deque(maxlen=self.history_size), 'evicted': 0}
+            if len(history['events']) == self.history_size:
+                history['evicted'] = history['events'][0][0]
+            history['events'].append((seq, event, data))
+            self._history.set(phone, history)
+            subscribers = list(self._subscribers.get(phone, ()))
+            self.published += 1
+
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait((seq, event, data))
+            except queue.Full:
+                # A stalled client is cut off; it reconnects and resyncs
+                subscription.overflowed = True
+                self.dropped += 1
+
+        return self.format_id(seq)
+
+    def format_id(self, seq):
+        return f"{self.epoch}-{seq}"
+
+    def subscribe(self, phone):
+        with self._lock:
+            open_streams = sum(len(subs) for subs in self._subscribers.values())
+            user_streams = self._subscribers.get(phone, set())
+            if open_streams >= self.max_connections or len(user_streams) >= self.max_per_user:
+                raise EventBusFull("Too many open event streams")
+
+            subscription = Subscription(phone)
+            self._subscribers.setdefault(phone, set()).add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subs = self._subscribers.get(subscription.phone)
+            if subs:
+                subs.discard(subscription)
+                if not subs:
+                    del self._subscribers[subscription.phone]
+
+    def connected_phones(self):
+        """Users with at least one open stream on this worker"""
+        with self._lock:
+            return set(self._subscribers)
+
+    def replay(self, phone, last_seq):
+        """Events after last_seq, or None if some of them are no longer held"""
+        with self._lock:
+            history = self._history.get(phone)
+            if history is None:
+                # Nothing held: fine only if nothing was published since
+                return [] if last_seq >= self._last_seq else None
+            if history['evicted'] > last_seq:
+                return None
+            return [entry for entry in history['events'] if entry[0] > last_seq]
+
+    def format_event(self, seq, event, data):
+        """Serialize one event in text/event-stream format"""
+        return f"id: {self.format_id(seq)}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def stream(self, subscription, last_event_id=None, heartbeat=HEARTBEAT_SECONDS):
+        """Generator of text/event-stream chunks for one subscription"""
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n\n"
+
+            last_seq = None
+            if last_event_id:
+                last_seq = self.parse_event_id(last_event_id)
+                missed = self.replay(subscription.phone, last_seq) if last_seq is not None else None
+                if missed is None:
+                    # Client must refetch state; it resumes from the current position
+                    last_seq = self._last_seq
+                    yield self.format_event(last_seq, 'resync', {})
+                else:
+                    for entry in missed:
+                        yield self.format_event(*entry)
+                        last_seq = entry[0]
+
+            while not subscription.overflowed:
+                try:
+                    entry = subscription.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                if last_seq is not None and entry[0] <= last_seq:
+                    continue
+                yield self.format_event(*entry)
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'connections': sum(len(subs) for subs in self._subscribers.values()),
+                'users': len(self._subscribers),
+                'max_connections': self.max_connections,
+                'published': self.published,
+                'dropped': self.dropped
+            }
+
+# Create global instance
+event_bus = EventBus()
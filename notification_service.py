@@ -1,20 +1,171 @@
 # notification_service.py
+import argparse
+import atexit
+import base64
 import json
 import os
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta
 import sqlite3
 
+from event_bus import event_bus
+from ttl_cache import TTLCache
+
+# Unread counts are cached briefly per process; writes made here drop the
+# entry at once, writes from other workers show up within the TTL
+UNREAD_COUNT_TTL = 5
+
+# Outbox writer: rows per INSERT batch and how often staged rows are polled
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_POLL_SECONDS = 2
+
+# Failed writes before a staged row is parked in the outbox (attempts
+# column) for inspection instead of being retried
+OUTBOX_MAX_ATTEMPTS = 5
+
+# Most notification IDs accepted by one bulk read/delete
+MAX_BULK_IDS = 500
+
+# Retention: notifications older than the max age are removed, and each
+# user keeps at most this many read notifications (None disables a rule)
+RETENTION_MAX_AGE_DAYS = 180
+RETENTION_MAX_READ_PER_USER = 200
+RETENTION_BATCH_SIZE = 500
+RETENTION_PAUSE_SECONDS = 0.05
+RETENTION_INTERVAL_SECONDS = 3600
+
+# Broadcasts: recipients per chunked transaction, and the pause between
+# chunks that lets payment writes take the lock
+BROADCAST_BATCH_SIZE = 1000
+BROADCAST_PAUSE_SECONDS = 0.05
+
+# Digests: users who opt in get same-type transaction notifications folded
+# into one unread row per window instead of one row per payment
+DIGEST_WINDOW_SECONDS = 3600
+MIN_DIGEST_WINDOW_SECONDS = 60
+MAX_DIGEST_WINDOW_SECONDS = 86400
+DIGEST_LABELS = {
+    'deposit': ('Deposits', 'deposited'),
+    'withdraw': ('Withdrawals', 'withdrawn'),
+    'send': ('Payments Sent', 'sent'),
+    'receive': ('Payments Received', 'received')
+}
+
+def encode_cursor(created_at, notification_id):
+    """Opaque paging cursor for the (created_at, id) position of a notification"""
+    raw = f"{created_at}|{notification_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Return (created_at, id) from a paging cursor, or None if it is invalid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, notification_id = base64.urlsafe_b64decode(padded).decode().rsplit('|', 1)
+        return created_at, int(notification_id)
+    except Exception:
+        return None
+
+def build_transaction_notification(transaction_type, amount, transaction_id,
+                                   receiver_name=None, sender_name=None):
+    """Return (title, message, type, data) for a transaction, or None"""
+    if transaction_type == 'deposit':
+        title = "Deposit Successful"
+        message = f"₹{amount:.2f} has been deposited to your account"
+        notif_type = 'success'
+        data = {
+            'transaction_id': transaction_id,
+            'amount': amount,
+            'type': 'deposit'
+        }
+    
+    elif transaction_type == 'withdraw':
+        title = "Withdrawal Requested"
+        message = f"Withdrawal of ₹{amount:.2f} has been initiated"
+        notif_type = 'info'
+        data = {
+            'transaction_id': transaction_id,
+            'amount': amount,
+            'type': 'withdraw'
+        }
+    
+    elif transaction_type == 'send':
+        title = "Payment Sent"
+        message = f"₹{amount:.2f} sent to {receiver_name or 'contact'}"
+        notif_type = 'info'
+        data = {
+            'transaction_id': transaction_id,
+            'amount': amount,
+            'type': 'send',
+            'receiver_name': receiver_name
+        }
+    
+    elif transaction_type == 'receive':
+        title = "Payment Received"
+        message = f"₹{amount:.2f} received from {sender_name or 'contact'}"
+        notif_type = 'success'
+        data = {
+            'transaction_id': transaction_id,
+            'amount': amount,
+            'type': 'receive',
+            'sender_name': sender_name
+        }
+    else:
+        return None
+    
+    return title, message, notif_type, data
+
+def build_digest_notification(transaction_type, count, total):
+    """Return (title, message) for a digest of count transactions"""
+    label, verb = DIGEST_LABELS[transaction_type]
+    return f"{count} {label}", f"₹{total:.2f} {verb} across {count} transactions"
+
+def stage_notification(conn, phone, title, message, notification_type='info', data=None):
+    """
+    Stage a notification in the outbox using the caller's connection, so it
+    commits or rolls back together with the caller's own writes
+    """
+    conn.execute('''
+        INSERT INTO notification_outbox (phone, title, message, type, data)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (phone, title, message, notification_type, json.dumps(data) if data else None))
+
+def stage_transaction_notification(conn, phone, transaction_type, amount, transaction_id,
+                                   receiver_name=None, sender_name=None):
+    """Stage the notification for a ledger write inside its transaction"""
+    notification = build_transaction_notification(transaction_type, amount, transaction_id,
+                                                  receiver_name, sender_name)
+    if notification:
+        stage_notification(conn, phone, *notification)
+
 class NotificationService:
     def __init__(self):
         self.db_path = 'easycash.db'
+        self._unread_counts = TTLCache(maxsize=50000, ttl=UNREAD_COUNT_TTL)
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._worker = None
+        self._retention_job = None
+        self._broadcast_lock = threading.Lock()
+        self.last_broadcast = None
+        self.max_age_days = RETENTION_MAX_AGE_DAYS
+        self.max_read_per_user = RETENTION_MAX_READ_PER_USER
     
-    def add_notification(self, phone, title, message, notification_type='info', data=None):
-        """Add a notification to the database"""
+    def _read_connection(self):
+        """Connection for reads: the open database.db_scope() one, if any"""
+        # Imported here because database imports this module
+        from database import DATABASE_PATH, scoped_db
+        db = scoped_db()
+        if db is not None and self.db_path == DATABASE_PATH:
+            return db
+        return sqlite3.connect(self.db_path)
+    
+    def init_schema(self):
+        """Create the notifications table and its indexes (run once at startup)"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            # Create notifications table if it doesn't exist
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS notifications (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -29,6 +180,136 @@ class NotificationService:
                 )
             ''')
             
+            # Unread lists, unread counts and bulk read/delete by user
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_notifications_phone_read
+                ON notifications(phone, is_read, created_at)
+            ''')
+            
+            # Newest-first paging over all of a user's notifications
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_notifications_phone_created
+                ON notifications(phone, created_at, id)
+            ''')
+            
+            # Retention finds expired read rows across all users
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_notifications_read_created
+                ON notifications(is_read, created_at)
+            ''')
+            
+            # Open digest rows are looked up by (phone, digest_key)
+            columns = [row[1] for row in cursor.execute('PRAGMA table_info(notifications)')]
+            if 'digest_key' not in columns:
+                cursor.execute('ALTER TABLE notifications ADD COLUMN digest_key TEXT')
+            
+            self._init_unread_counters(cursor)
+            
+            # Notification version behind the API ETags (table shared with the ledger scope)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_versions (
+                    phone TEXT NOT NULL,
+                    scope TEXT NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (phone, scope)
+                ) WITHOUT ROWID
+            ''')
+            for name, event, phone in (('notifications_version_ai', 'AFTER INSERT', 'new.phone'),
+                                       ('notifications_version_au', 'AFTER UPDATE', 'new.phone'),
+                                       ('notifications_version_ad', 'AFTER DELETE', 'old.phone')):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {name} {event} ON notifications BEGIN
+                        INSERT INTO user_versions (phone, scope, version) VALUES ({phone}, 'notifications', 1)
+                        ON CONFLICT(phone, scope) DO UPDATE SET version = version + 1;
+                    END
+                ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS notification_settings (
+                    phone TEXT PRIMARY KEY,
+                    digest_enabled INTEGER NOT NULL DEFAULT 0,
+                    digest_window_seconds INTEGER NOT NULL DEFAULT 3600,
+                    FOREIGN KEY (phone) REFERENCES users(phone)
+                )
+            ''')
+            
+            # Notifications staged by ledger writes, drained by the outbox worker
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS notification_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    phone TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    type TEXT DEFAULT 'info',
+                    data TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Failed write attempts per staged row
+            columns = [row[1] for row in cursor.execute('PRAGMA table_info(notification_outbox)')]
+            if 'attempts' not in columns:
+                cursor.execute('ALTER TABLE notification_outbox ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+            
+            conn.commit()
+            conn.close()
+            print("✓ Created notifications table and indexes")
+            return True
+        except Exception as e:
+            print(f"Error initializing notifications schema: {e}")
+            return False
+    
+    def _init_unread_counters(self, cursor):
+        """Per-user unread counters kept current by triggers on notifications"""
+        exists = cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='notification_counters'"
+        ).fetchone()
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notification_counters (
+                phone TEXT PRIMARY KEY,
+                unread_count INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS notification_counters_ai
+            AFTER INSERT ON notifications WHEN new.is_read = 0 BEGIN
+                INSERT INTO notification_counters (phone, unread_count) VALUES (new.phone, 1)
+                ON CONFLICT(phone) DO UPDATE SET unread_count = unread_count + 1;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS notification_counters_au
+            AFTER UPDATE OF is_read ON notifications WHEN old.is_read != new.is_read BEGIN
+                UPDATE notification_counters
+                SET unread_count = unread_count + (CASE WHEN new.is_read = 0 THEN 1 ELSE -1 END)
+                WHERE phone = new.phone;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS notification_counters_ad
+            AFTER DELETE ON notifications WHEN old.is_read = 0 BEGIN
+                UPDATE notification_counters
+                SET unread_count = unread_count - 1
+                WHERE phone = old.phone;
+            END
+        ''')
+        
+        if not exists:
+            cursor.execute('''
+                INSERT INTO notification_counters (phone, unread_count)
+                SELECT phone, COUNT(*) FROM notifications
+                WHERE is_read = 0
+                GROUP BY phone
+            ''')
+    
+    def add_notification(self, phone, title, message, notification_type='info', data=None):
+        """Add a notification to the database"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
             # Insert notification
             data_json = json.dumps(data) if data else None
             cursor.execute('''
@@ -39,62 +320,543 @@ class NotificationService:
             conn.commit()
             notification_id = cursor.lastrowid
             conn.close()
+            self._unread_counts.pop(phone)
+            
+            event_bus.publish(phone, 'notification', {
+                'notification': {
+                    'id': notification_id,
+                    'title': title,
+                    'message': message,
+                    'type': notification_type,
+                    'data': data or {}
+                },
+                'unread_count': self.get_unread_count(phone)
+            })
             
             return notification_id
         except Exception as e:
             print(f"Error adding notification: {e}")
             return None
     
-    def get_unread_notifications(self, phone, limit=10):
-        """Get unread notifications for a user"""
+    def enqueue(self, phone, title, message, notification_type='info', data=None):
+        """
+        Stage a notification in the outbox for the background writer
+        The row is committed before this returns, so it survives a crash
+        Falls back to a direct insert when the writer is not running
+        """
+        if not (self._worker and self._worker.is_alive()):
+            return self.add_notification(phone, title, message, notification_type, data)
+        
         try:
             conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            stage_notification(conn, phone, title, message, notification_type, data)
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error staging notification: {e}")
+            return None
+        
+        self.wake()
+        return None
+    
+    def wake(self):
+        """Ask the writer to drain the outbox now (after staging rows)"""
+        self._wakeup.set()
+    
+    def start_worker(self):
+        """Start the background outbox writer (once per process)"""
+        if self._worker and self._worker.is_alive():
+            return
+        
+        self._worker = threading.Thread(target=self._run_worker, name='notification-outbox', daemon=True)
+        self._worker.start()
+        atexit.register(self.flush)
+        self._wakeup.set()
+    
+    def _run_worker(self):
+        while True:
+            self._wakeup.wait(OUTBOX_POLL_SECONDS)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing notification outbox: {e}")
+    
+    def flush(self):
+        """Write staged notifications in batches; returns rows written"""
+        written = 0
+        with self._flush_lock:
+            written += self._retry_failed()
+            while True:
+                count = self._write_batch()
+                written += count
+                if count < OUTBOX_BATCH_SIZE:
+                    return written
+    
+    def _retry_failed(self):
+        """
+        Retry each previously failed outbox row on its own, once per flush,
+        so one bad row cannot keep sinking the batches around it
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            staged_ids = [row[0] for row in conn.execute('''
+                SELECT id FROM notification_outbox
+                WHERE attempts > 0 AND attempts < ?
+                ORDER BY id
+            ''', (OUTBOX_MAX_ATTEMPTS,)).fetchall()]
+        finally:
+            conn.close()
+        
+        written = 0
+        for staged_id in staged_ids:
+            try:
+                written += self._write_batch([staged_id])
+            except Exception as e:
+                print(f"Error retrying notification: {e}")
+        return written
+    
+    def _write_batch(self, staged_ids=None):
+        """
+        Move one batch of staged notifications into notifications in one transaction
+        Transaction notifications of users with digests on are folded first
+        staged_ids picks specific outbox rows; by default the oldest
+        never-failed rows fill the batch
+        """
+        conn = sqlite3.connect(self.db_path)
+        staged = []
+        try:
+            # IMMEDIATE takes the write lock first, so two workers never
+            # claim the same staged rows
+            conn.execute('BEGIN IMMEDIATE')
+            if staged_ids is None:
+                staged = conn.execute('''
+                    SELECT id, phone, title, message, type, data, created_at
+                    FROM notification_outbox
+                    WHERE attempts = 0
+                    ORDER BY id
+                    LIMIT ?
+                ''', (OUTBOX_BATCH_SIZE,)).fetchall()
+            else:
+                placeholders = ','.join('?' * len(staged_ids))
+                staged = conn.execute(f'''
+                    SELECT id, phone, title, message, type, data, created_at
+                    FROM notification_outbox
+                    WHERE id IN ({placeholders})
+                ''', staged_ids).fetchall()
             
-            cursor.execute('''
-                SELECT 
-                    id,
-                    title,
-                    message,
-                    type,
-                    data,
-                    is_read,
-                    created_at
-                FROM notifications 
-                WHERE phone = ? AND is_read = 0
-                ORDER BY created_at DESC
-                LIMIT ?
-            ''', (phone, limit))
+            rows = [row[1:] for row in staged]
+            if not rows:
+                conn.rollback()
+                return 0
             
-            notifications = []
-            for row in cursor.fetchall():
-                data = json.loads(row['data']) if row['data'] else {}
-                notifications.append({
-                    'id': row['id'],
-                    'title': row['title'],
-                    'message': row['message'],
-                    'type': row['type'],
-                    'data': data,
-                    'is_read': bool(row['is_read']),
-                    'created_at': row['created_at'],
-                    'created_at_formatted': self.format_date(row['created_at'])
-                })
+            plain, digests = self._coalesce(conn, rows)
+            
+            if plain:
+                conn.executemany('''
+                    INSERT INTO notifications (phone, title, message, type, data, created_at, digest_key)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', plain)
+                # Rows inserted under one write lock get consecutive ids
+                last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+            
+            for digest in digests:
+                if digest['id']:
+                    conn.execute('''
+                        UPDATE notifications SET title = ?, message = ?, data = ?, created_at = ?
+                        WHERE id = ?
+                    ''', (digest['title'], digest['message'], json.dumps(digest['data']),
+                          digest['created_at'], digest['id']))
+                else:
+                    cursor = conn.execute('''
+                        INSERT INTO notifications (phone, title, message, type, data, created_at, digest_key)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', (digest['phone'], digest['title'], digest['message'], digest['type'],
+                          json.dumps(digest['data']), digest['created_at'], digest['key']))
+                    digest['id'] = cursor.lastrowid
+            
+            conn.executemany('DELETE FROM notification_outbox WHERE id = ?',
+                             [(row[0],) for row in staged])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            self._count_failure(staged, e)
+            raise
+        finally:
+            conn.close()
+        
+        written = []
+        if plain:
+            first_id = last_id - len(plain) + 1
+            written = [(first_id + offset, phone, title, message, notification_type,
+                        json.loads(data) if data else {})
+                       for offset, (phone, title, message, notification_type, data, _, _) in enumerate(plain)]
+        written += [(digest['id'], digest['phone'], digest['title'], digest['message'],
+                     digest['type'], digest['data']) for digest in digests]
+        
+        for phone in set(row[0] for row in rows):
+            self._unread_counts.pop(phone)
+        for notification_id, phone, title, message, notification_type, data in written:
+            event_bus.publish(phone, 'notification', {
+                'notification': {
+                    'id': notification_id,
+                    'title': title,
+                    'message': message,
+                    'type': notification_type,
+                    'data': data
+                },
+                'unread_count': self.get_unread_count(phone)
+            })
+        
+        return len(rows)
+    
+    def _count_failure(self, staged, error):
+        """
+        Record a failed write by bumping the attempts of the staged rows;
+        past OUTBOX_MAX_ATTEMPTS a row stays parked in the outbox
+        """
+        if not staged:
+            return
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.executemany('UPDATE notification_outbox SET attempts = attempts + 1 WHERE id = ?',
+                             [(row[0],) for row in staged])
+            parked = [row[0] for row in conn.execute(f'''
+                SELECT id FROM notification_outbox
+                WHERE attempts >= ? AND id IN ({','.join('?' * len(staged))})
+            ''', [OUTBOX_MAX_ATTEMPTS] + [row[0] for row in staged]).fetchall()]
+            conn.commit()
+            conn.close()
+            if parked:
+                print(f"Parked outbox rows {parked} after {OUTBOX_MAX_ATTEMPTS} failed writes: {error}")
+        except sqlite3.Error as e:
+            print(f"Error counting outbox failure: {e}")
+    
+    def _coalesce(self, conn, rows):
+        """
+        Split a batch into plain rows and digests for users who opted in
+        A transaction notification joins the user's open digest of the same
+        kind (unread, last updated within their window) or starts a new one
+        Returns (plain rows to insert, digests to insert or update)
+        """
+        phones = list(set(row[0] for row in rows))
+        placeholders = ','.join('?' * len(phones))
+        windows = dict(conn.execute(f'''
+            SELECT phone, digest_window_seconds FROM notification_settings
+            WHERE digest_enabled = 1 AND phone IN ({placeholders})
+        ''', phones).fetchall())
+        
+        plain = []
+        digests = {}
+        for phone, title, message, notification_type, data, created_at in rows:
+            details = json.loads(data) if data and phone in windows else {}
+            kind = details.get('type')
+            if kind not in DIGEST_LABELS or 'amount' not in details:
+                plain.append((phone, title, message, notification_type, data, created_at, None))
+                continue
             
+            digest = digests.get((phone, kind))
+            if digest is None:
+                window_start = (datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S') -
+                                timedelta(seconds=windows[phone])).strftime('%Y-%m-%d %H:%M:%S')
+                existing = conn.execute('''
+                    SELECT id, type, data, created_at FROM notifications
+                    WHERE phone = ? AND digest_key = ? AND is_read = 0 AND created_at >= ?
+                    ORDER BY id DESC LIMIT 1
+                ''', (phone, kind, window_start)).fetchone()
+                
+                if existing:
+                    previous = json.loads(existing[2]) if existing[2] else {}
+                    digest = {'id': existing[0], 'type': existing[1], 'created_at': existing[3],
+                              'count': previous.get('count', 1), 'total': previous.get('total', previous.get('amount', 0))}
+                else:
+                    digest = {'id': None, 'type': notification_type, 'created_at': created_at,
+                              'count': 0, 'total': 0}
+                    # A lone notification keeps its own wording until a second one joins
+                    digest.update(title=title, message=message)
+                digest.update(phone=phone, key=kind)
+                digests[(phone, kind)] = digest
+            
+            # A digest is dated by its latest event, so it moves back to the
+            # top of newest-first lists and its window runs from that event
+            digest['created_at'] = max(digest['created_at'], created_at)
+            digest['count'] += 1
+            digest['total'] = round(digest['total'] + float(details['amount']), 2)
+            digest['data'] = dict(details, digest=True, count=digest['count'], total=digest['total'])
+            if digest['count'] > 1:
+                digest['title'], digest['message'] = build_digest_notification(
+                    kind, digest['count'], digest['total'])
+        
+        return plain, list(digests.values())
+    
+    def get_settings(self, phone):
+        """Notification preferences of a user"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            row = conn.execute('''
+                SELECT digest_enabled, digest_window_seconds FROM notification_settings
+                WHERE phone = ?
+            ''', (phone,)).fetchone()
             conn.close()
-            return notifications
+            
+            if not row:
+                return {'digest_enabled': False, 'digest_window_seconds': DIGEST_WINDOW_SECONDS}
+            return {'digest_enabled': bool(row[0]), 'digest_window_seconds': row[1]}
         except Exception as e:
-            print(f"Error getting notifications: {e}")
-            return []
+            print(f"Error getting notification settings: {e}")
+            return None
     
-    def get_all_notifications(self, phone, limit=20):
-        """Get all notifications for a user"""
+    def update_settings(self, phone, digest_enabled=None, digest_window_seconds=None):
+        """Change notification preferences; unspecified values are kept"""
+        current = self.get_settings(phone)
+        if current is None:
+            return None
+        
+        if digest_enabled is not None:
+            current['digest_enabled'] = bool(digest_enabled)
+        if digest_window_seconds is not None:
+            current['digest_window_seconds'] = min(max(int(digest_window_seconds), MIN_DIGEST_WINDOW_SECONDS),
+                                                   MAX_DIGEST_WINDOW_SECONDS)
+        
         try:
             conn = sqlite3.connect(self.db_path)
+            conn.execute('''
+                INSERT INTO notification_settings (phone, digest_enabled, digest_window_seconds)
+                VALUES (?, ?, ?)
+                ON CONFLICT(phone) DO UPDATE SET
+                    digest_enabled = excluded.digest_enabled,
+                    digest_window_seconds = excluded.digest_window_seconds
+            ''', (phone, int(current['digest_enabled']), current['digest_window_seconds']))
+            conn.commit()
+            conn.close()
+            return current
+        except Exception as e:
+            print(f"Error updating notification settings: {e}")
+            return None
+    
+    def broadcast(self, title, message, notification_type='info', data=None,
+                  batch_size=BROADCAST_BATCH_SIZE, pause=BROADCAST_PAUSE_SECONDS, progress=None):
+        """
+        Send one notification to every user
+        Phones are read from users in keyset-paged chunks; each chunk is
+        inserted with executemany in its own short transaction, with a pause
+        in between so live payment writes are not starved
+        progress, if given, is called with the running report after each chunk
+        Returns the report, or None if another broadcast is running
+        """
+        if not self._broadcast_lock.acquire(blocking=False):
+            return None
+        try:
+            return self._send_broadcast(title, message, notification_type, data,
+                                        batch_size, pause, progress)
+        finally:
+            self._broadcast_lock.release()
+    
+    def _send_broadcast(self, title, message, notification_type, data, batch_size, pause, progress):
+        """Body of broadcast(); the caller holds _broadcast_lock"""
+        started = time.monotonic()
+        data_json = json.dumps(data) if data else None
+        report = {'title': title, 'sent': 0, 'batches': 0, 'seconds': 0.0, 'per_second': 0.0,
+                  'done': False, 'started_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}
+        self.last_broadcast = report
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            last_phone = ''
+            while True:
+                phones = [row[0] for row in conn.execute('''
+                    SELECT phone FROM users WHERE phone > ? ORDER BY phone LIMIT ?
+                ''', (last_phone, batch_size)).fetchall()]
+                if not phones:
+                    break
+                
+                created_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany('''
+                    INSERT INTO notifications (phone, title, message, type, data, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', [(phone, title, message, notification_type, data_json, created_at) for phone in phones])
+                last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+                conn.commit()
+                
+                # Only users with an open stream get a push; others see it on load
+                first_id = last_id - len(phones) + 1
+                connected = event_bus.connected_phones()
+                for offset, phone in enumerate(phones):
+                    self._unread_counts.pop(phone)
+                    if phone in connected:
+                        event_bus.publish(phone, 'notification', {
+                            'notification': {
+                                'id': first_id + offset,
+                                'title': title,
+                                'message': message,
+                                'type': notification_type,
+                                'data': data or {}
+                            },
+                            'unread_count': self.get_unread_count(phone)
+                        })
+                
+                last_phone = phones[-1]
+                report['sent'] += len(phones)
+                report['batches'] += 1
+                report['seconds'] = round(time.monotonic() - started, 3)
+                report['per_second'] = round(report['sent'] / max(report['seconds'], 0.001), 1)
+                if progress:
+                    progress(report)
+                
+                if len(phones) < batch_size:
+                    break
+                time.sleep(pause)
+            
+            report['done'] = True
+        except Exception as e:
+            conn.rollback()
+            report['error'] = str(e)
+            print(f"Error broadcasting notification: {e}")
+        finally:
+            conn.close()
+            report['seconds'] = round(time.monotonic() - started, 3)
+        
+        return report
+    
+    def start_broadcast(self, title, message, notification_type='info', data=None):
+        """Run broadcast in a background thread; False if one is already running"""
+        # Taken here so two callers cannot both start; the thread releases it
+        if not self._broadcast_lock.acquire(blocking=False):
+            return False
+        
+        def run():
+            try:
+                self._send_broadcast(title, message, notification_type, data,
+                                     BROADCAST_BATCH_SIZE, BROADCAST_PAUSE_SECONDS, None)
+            finally:
+                self._broadcast_lock.release()
+        
+        try:
+            threading.Thread(target=run, name='notification-broadcast', daemon=True).start()
+        except Exception:
+            self._broadcast_lock.release()
+            raise
+        return True
+    
+    def enforce_retention(self, max_age_days=None, max_read_per_user=None,
+                          batch_size=RETENTION_BATCH_SIZE, pause=RETENTION_PAUSE_SECONDS):
+        """
+        Delete notifications outside the retention policy in small batches
+        Each batch is its own short transaction, with a pause in between so
+        request writes are not kept waiting on the lock
+        Returns a report with rows removed and space reclaimed
+        """
+        max_age_days = self.max_age_days if max_age_days is None else max_age_days
+        max_read_per_user = self.max_read_per_user if max_read_per_user is None else max_read_per_user
+        started = time.monotonic()
+        report = {'expired': 0, 'over_limit': 0, 'rows_removed': 0, 'bytes_reclaimed': 0}
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            pages_before = conn.execute('PRAGMA page_count').fetchone()[0]
+            free_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            
+            if max_age_days:
+                cutoff = (datetime.utcnow() - timedelta(days=max_age_days)).strftime('%Y-%m-%d %H:%M:%S')
+                while True:
+                    # Only read notifications expire; unread ones are kept at any age
+                    cursor = conn.execute('''
+                        DELETE FROM notifications WHERE id IN (
+                            SELECT id FROM notifications
+                            WHERE is_read = 1 AND created_at < ?
+                            ORDER BY created_at
+                            LIMIT ?
+                        )
+                    ''', (cutoff, batch_size))
+                    conn.commit()
+                    report['expired'] += cursor.rowcount
+                    if cursor.rowcount < batch_size:
+                        break
+                    time.sleep(pause)
+            
+            if max_read_per_user:
+                phones = [row[0] for row in conn.execute('''
+                    SELECT phone FROM notifications
+                    WHERE is_read = 1
+                    GROUP BY phone
+                    HAVING COUNT(*) > ?
+                ''', (max_read_per_user,)).fetchall()]
+                for phone in phones:
+                    while True:
+                        # Everything past the newest max_read_per_user read rows
+                        cursor = conn.execute('''
+                            DELETE FROM notifications WHERE id IN (
+                                SELECT id FROM notifications
+                                WHERE phone = ? AND is_read = 1
+                                ORDER BY created_at DESC, id DESC
+                                LIMIT ? OFFSET ?
+                            )
+                        ''', (phone, batch_size, max_read_per_user))
+                        conn.commit()
+                        report['over_limit'] += cursor.rowcount
+                        if cursor.rowcount < batch_size:
+                            break
+                        time.sleep(pause)
+            
+            pages_after = conn.execute('PRAGMA page_count').fetchone()[0]
+            free_after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            # Freed pages go to the freelist (reused by new rows) unless the file shrank
+            freed_pages = (pages_before - pages_after) + (free_after - free_before)
+            report['bytes_reclaimed'] = max(freed_pages, 0) * page_size
+        finally:
+            conn.close()
+        
+        report['rows_removed'] = report['expired'] + report['over_limit']
+        report['duration_seconds'] = round(time.monotonic() - started, 3)
+        if report['rows_removed']:
+            self._unread_counts.clear()
+        return report
+    
+    def start_retention_job(self, interval=RETENTION_INTERVAL_SECONDS):
+        """Run enforce_retention periodically in a background thread"""
+        if self._retention_job and self._retention_job.is_alive():
+            return
+        
+        def run():
+            while True:
+                try:
+                    report = self.enforce_retention()
+                    if report['rows_removed']:
+                        print(f"Notification retention: removed {report['rows_removed']} rows "
+                              f"({report['expired']} expired, {report['over_limit']} over limit), "
+                              f"reclaimed {report['bytes_reclaimed']} bytes in {report['duration_seconds']}s")
+                except Exception as e:
+                    print(f"Error enforcing notification retention: {e}")
+                time.sleep(interval)
+        
+        self._retention_job = threading.Thread(target=run, name='notification-retention', daemon=True)
+        self._retention_job.start()
+    
+    def get_notifications_page(self, phone, limit=20, cursor=None, unread_only=False, relative_times=True):
+        """
+        Get one page of notifications, newest first
+        Returns (notifications, next_cursor); next_cursor is None on the last page
+        relative_times=False leaves out created_at_formatted ("5 minutes ago"),
+        which goes stale in responses cached behind an ETag
+        """
+        try:
+            conn = self._read_connection()
             conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
             
-            cursor.execute('''
+            where = 'phone = ?'
+            params = [phone]
+            if unread_only:
+                where += ' AND is_read = 0'
+            
+            position = decode_cursor(cursor) if cursor else None
+            if position:
+                where += ' AND (created_at, id) < (?, ?)'
+                params.extend(position)
+            
+            # One extra row tells us whether another page exists
+            rows = conn.execute(f'''
                 SELECT 
                     id,
                     title,
@@ -104,30 +866,48 @@ class NotificationService:
                     is_read,
                     created_at
                 FROM notifications 
-                WHERE phone = ?
-                ORDER BY created_at DESC
+                WHERE {where}
+                ORDER BY created_at DESC, id DESC
                 LIMIT ?
-            ''', (phone, limit))
+            ''', params + [limit + 1]).fetchall()
+            
+            conn.close()
             
             notifications = []
-            for row in cursor.fetchall():
+            for row in rows[:limit]:
                 data = json.loads(row['data']) if row['data'] else {}
-                notifications.append({
+                notification = {
                     'id': row['id'],
                     'title': row['title'],
                     'message': row['message'],
                     'type': row['type'],
                     'data': data,
                     'is_read': bool(row['is_read']),
-                    'created_at': row['created_at'],
-                    'created_at_formatted': self.format_date(row['created_at'])
-                })
+                    'created_at': row['created_at']
+                }
+                if relative_times:
+                    notification['created_at_formatted'] = self.format_date(row['created_at'])
+                notifications.append(notification)
             
-            conn.close()
-            return notifications
+            next_cursor = None
+            if len(rows) > limit and notifications:
+                last = notifications[-1]
+                next_cursor = encode_cursor(last['created_at'], last['id'])
+            
+            return notifications, next_cursor
         except Exception as e:
-            print(f"Error getting all notifications: {e}")
-            return []
+            print(f"Error getting notifications page: {e}")
+            return [], None
+    
+    def get_unread_notifications(self, phone, limit=10):
+        """Get unread notifications for a user"""
+        notifications, _ = self.get_notifications_page(phone, limit, unread_only=True)
+        return notifications
+    
+    def get_all_notifications(self, phone, limit=20):
+        """Get all notifications for a user"""
+        notifications, _ = self.get_notifications_page(phone, limit)
+        return notifications
     
     def mark_as_read(self, notification_id, phone=None):
         """Mark a notification as read"""
@@ -150,6 +930,7 @@ class NotificationService:
             
             conn.commit()
             conn.close()
+            self._forget_unread_count(phone)
             return True
         except Exception as e:
             print(f"Error marking notification as read: {e}")
@@ -169,30 +950,88 @@ class NotificationService:
             
             conn.commit()
             conn.close()
+            self._forget_unread_count(phone)
             return True
         except Exception as e:
             print(f"Error marking all notifications as read: {e}")
             return False
     
+    def mark_many_as_read(self, notification_ids, phone):
+        """Mark a list of a user's notifications as read in one statement"""
+        ids = list(dict.fromkeys(notification_ids))[:MAX_BULK_IDS]
+        if not ids:
+            return 0
+        
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.execute(f'''
+                UPDATE notifications 
+                SET is_read = 1 
+                WHERE phone = ? AND is_read = 0 AND id IN ({','.join('?' * len(ids))})
+            ''', [phone] + ids)
+            updated = cursor.rowcount
+            conn.commit()
+            conn.close()
+            self._forget_unread_count(phone)
+            return updated
+        except Exception as e:
+            print(f"Error marking notifications as read: {e}")
+            return None
+    
+    def delete_many(self, notification_ids, phone):
+        """Delete a list of a user's notifications in one statement"""
+        ids = list(dict.fromkeys(notification_ids))[:MAX_BULK_IDS]
+        if not ids:
+            return 0
+        
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.execute(f'''
+                DELETE FROM notifications 
+                WHERE phone = ? AND id IN ({','.join('?' * len(ids))})
+            ''', [phone] + ids)
+            deleted = cursor.rowcount
+            conn.commit()
+            conn.close()
+            self._forget_unread_count(phone)
+            return deleted
+        except Exception as e:
+            print(f"Error deleting notifications: {e}")
+            return None
+    
     def get_unread_count(self, phone):
         """Get count of unread notifications"""
+        cached = self._unread_counts.get(phone)
+        if cached is not None:
+            return cached
+        
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._read_connection()
             cursor = conn.cursor()
             
             cursor.execute('''
-                SELECT COUNT(*) as count 
-                FROM notifications 
-                WHERE phone = ? AND is_read = 0
+                SELECT unread_count 
+                FROM notification_counters 
+                WHERE phone = ?
             ''', (phone,))
             
             result = cursor.fetchone()
             conn.close()
-            return result[0] if result else 0
+            count = max(result[0], 0) if result else 0
+            self._unread_counts.set(phone, count)
+            return count
         except Exception as e:
             print(f"Error getting unread count: {e}")
             return 0
     
+    def _forget_unread_count(self, phone=None):
+        """Drop cached counts after a write (all of them when the owner is unknown)"""
+        if phone:
+            self._unread_counts.pop(phone)
+            event_bus.publish(phone, 'unread_count', {'unread_count': self.get_unread_count(phone)})
+        else:
+            self._unread_counts.clear()
+    
     def delete_notification(self, notification_id, phone=None):
         """Delete a notification"""
         try:
@@ -207,6 +1046,7 @@ class NotificationService:
             
             conn.commit()
             conn.close()
+            self._forget_unread_count(phone)
             return True
         except Exception as e:
             print(f"Error deleting notification: {e}")
@@ -263,52 +1103,13 @@ class NotificationService:
     
     def send_transaction_notification(self, phone, transaction_type, amount, transaction_id, 
                                       receiver_name=None, sender_name=None):
-        """Send notification for a transaction"""
-        if transaction_type == 'deposit':
-            title = "Deposit Successful"
-            message = f"₹{amount:.2f} has been deposited to your account"
-            notif_type = 'success'
-            data = {
-                'transaction_id': transaction_id,
-                'amount': amount,
-                'type': 'deposit'
-            }
-        
-        elif transaction_type == 'withdraw':
-            title = "Withdrawal Requested"
-            message = f"Withdrawal of ₹{amount:.2f} has been initiated"
-            notif_type = 'info'
-            data = {
-                'transaction_id': transaction_id,
-                'amount': amount,
-                'type': 'withdraw'
-            }
-        
-        elif transaction_type == 'send':
-            title = "Payment Sent"
-            message = f"₹{amount:.2f} sent to {receiver_name or 'contact'}"
-            notif_type = 'info'
-            data = {
-                'transaction_id': transaction_id,
-                'amount': amount,
-                'type': 'send',
-                'receiver_name': receiver_name
-            }
-        
-        elif transaction_type == 'receive':
-            title = "Payment Received"
-            message = f"₹{amount:.2f} received from {sender_name or 'contact'}"
-            notif_type = 'success'
-            data = {
-                'transaction_id': transaction_id,
-                'amount': amount,
-                'type': 'receive',
-                'sender_name': sender_name
-            }
-        else:
+        """Queue notification for a transaction"""
+        notification = build_transaction_notification(transaction_type, amount, transaction_id,
+                                                      receiver_name, sender_name)
+        if notification is None:
             return None
         
-        return self.add_notification(phone, title, message, notif_type, data)
+        return self.enqueue(phone, *notification)
     
     def send_security_notification(self, phone, event_type, ip_address=None, device=None):
         """Send security-related notifications"""
@@ -342,7 +1143,7 @@ class NotificationService:
                 'device': device,
                 'timestamp': datetime.now().isoformat()
             }
-            return self.add_notification(
+            return self.enqueue(
                 phone,
                 notifications[event_type]['title'],
                 notifications[event_type]['message'],
@@ -352,4 +1153,30 @@ class NotificationService:
         return None
 
 # Create global instance
-notification_service = NotificationService()
\ No newline at end of file
+notification_service = NotificationService()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Send a notification to every EasyCash user')
+    parser.add_argument('title')
+    parser.add_argument('message')
+    parser.add_argument('--type', default='info', choices=['info', 'success', 'warning', 'error'])
+    parser.add_argument('--db', default=notification_service.db_path, help='database path')
+    parser.add_argument('--batch-size', type=int, default=BROADCAST_BATCH_SIZE)
+    parser.add_argument('--pause', type=float, default=BROADCAST_PAUSE_SECONDS,
+                        help='seconds to yield the write lock between batches')
+    args = parser.parse_args()
+    
+    notification_service.db_path = args.db
+    result = notification_service.broadcast(
+        args.title, args.message, args.type,
+        data={'type': 'broadcast'},
+        batch_size=args.batch_size,
+        pause=args.pause,
+        progress=lambda r: print(f"  {r['sent']} sent in {r['seconds']}s ({r['per_second']}/s)")
+    )
+    
+    if result and result['done']:
+        print(f"✓ Broadcast sent to {result['sent']} users in {result['seconds']}s")
+    else:
+        print(f"Broadcast failed: {(result or {}).get('error', 'another broadcast is running')}")
+        raise SystemExit(1)
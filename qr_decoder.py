@@ -0,0 +1,208 @@
+"""
+QR Image Decoder for EasyCash UPI Wallet
+Bounded, off-thread decoding pipeline for uploaded QR code images
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from io import BytesIO
+from PIL import Image
+
+# Try to import pyzbar, but make it optional
+try:
+    from pyzbar.pyzbar import decode, ZBarSymbol
+    PYZBAR_AVAILABLE = True
+except ImportError:
+    PYZBAR_AVAILABLE = False
+    print("Warning: pyzbar not installed. QR file scanning will not work.")
+    print("Install with: pip install pyzbar pillow")
+
+# Upload limits - anything above these is rejected before decoding
+MAX_UPLOAD_BYTES = 8 * 1024 * 1024
+MAX_IMAGE_PIXELS = 40 * 1000 * 1000
+
+# Longest-side sizes tried in order; a QR code that fills a decent part of
+# the frame is found at the smallest size, harder images retry larger
+DECODE_SCALES = (640, 1280, 2048)
+
+# Worker pool limits
+DECODE_WORKERS = 2
+MAX_PENDING_DECODES = 8
+DECODE_TIMEOUT_SECONDS = 5.0
+
+
+class QRDecodeError(Exception):
+    """Raised when an uploaded image cannot be decoded"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class DecodeMetrics:
+    """Thread-safe counters for decode latency and success rate"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.attempts = 0
+            self.successes = 0
+            self.no_code = 0
+            self.timeouts = 0
+            self.rejected = 0
+            self.errors = 0
+            self.total_latency = 0.0
+            self.max_latency = 0.0
+            self.scale_hits = {}
+
+    def record(self, outcome, latency=None, scale=None):
+        with self._lock:
+            self.attempts += 1
+            if outcome == 'success':
+                self.successes += 1
+                self.scale_hits[scale] = self.scale_hits.get(scale, 0) + 1
+            elif outcome == 'no_code':
+                self.no_code += 1
+            elif outcome == 'timeout':
+                self.timeouts += 1
+            elif outcome == 'rejected':
+                self.rejected += 1
+            else:
+                self.errors += 1
+
+            if latency is not None:
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+
+    def snapshot(self):
+        with self._lock:
+            # Uploads rejected by the caps or a full queue never reached the
+            # decoder, so rates and latency count only decodes that ran
+            decoded = self.successes + self.no_code + self.timeouts + self.errors
+            return {
+                'attempts': self.attempts,
+                'successes': self.successes,
+                'no_code': self.no_code,
+                'timeouts': self.timeouts,
+                'rejected': self.rejected,
+                'errors': self.errors,
+                'success_rate': round(self.successes / decoded, 4) if decoded else 0.0,
+                'avg_latency_ms': round(self.total_latency / decoded * 1000, 2) if decoded else 0.0,
+                'max_latency_ms': round(self.max_latency * 1000, 2),
+                'scale_hits': {str(k): v for k, v in self.scale_hits.items()}
+            }
+
+
+decode_metrics = DecodeMetrics()
+
+_executor = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix='qr-decode')
+_pending = threading.BoundedSemaphore(MAX_PENDING_DECODES)
+
+
+def _read_upload(stream):
+    """Read an uploaded stream, refusing anything above MAX_UPLOAD_BYTES"""
+    data = stream.read(MAX_UPLOAD_BYTES + 1)
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise QRDecodeError(
+            f'Image too large. Maximum size is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB', 413)
+    if not data:
+        raise QRDecodeError('Uploaded file is empty')
+    return data
+
+
+def _check_dimensions(data):
+    """Check image dimensions from the header without decoding pixels"""
+    try:
+        with Image.open(BytesIO(data)) as image:
+            width, height = image.size
+    except Exception:
+        raise QRDecodeError('Could not read image file')
+
+    if width * height > MAX_IMAGE_PIXELS:
+        raise QRDecodeError(
+            f'Image resolution too high ({width}x{height}). Please upload a smaller image', 413)
+
+
+def _decode_image(data):
+    """
+    Decode all QR codes in an image (runs on a pool thread)
+    Returns tuple (codes, scale) where scale is the size that succeeded
+    """
+    largest = DECODE_SCALES[-1]
+
+    with Image.open(BytesIO(data)) as image:
+        # JPEG can decode straight to a reduced grayscale image
+        image.draft('L', (largest, largest))
+        gray = image.convert('L')
+
+    for scale in DECODE_SCALES:
+        if max(gray.size) > scale:
+            candidate = gray.copy()
+            candidate.thumbnail((scale, scale))
+        else:
+            candidate = gray
+
+        symbols = decode(candidate, symbols=[ZBarSymbol.QRCODE])
+        if symbols:
+            codes = []
+            for symbol in symbols:
+                text = symbol.data.decode('utf-8', errors='replace')
+                if text not in codes:
+                    codes.append(text)
+            return codes, scale
+
+        # Image already at full size, retrying larger would not help
+        if candidate is gray:
+            break
+
+    return [], None
+
+
+def decode_qr_upload(stream):
+    """
+    Decode every QR code in an uploaded image stream
+    Returns list of decoded strings, raises QRDecodeError on failure
+    """
+    if not PYZBAR_AVAILABLE:
+        raise QRDecodeError('QR scanning requires pyzbar package. Install with: pip install pyzbar pillow', 500)
+
+    try:
+        data = _read_upload(stream)
+        _check_dimensions(data)
+    except QRDecodeError:
+        decode_metrics.record('rejected')
+        raise
+
+    if not _pending.acquire(blocking=False):
+        decode_metrics.record('rejected')
+        raise QRDecodeError('QR scanner is busy. Please try again in a moment', 503)
+
+    started = time.perf_counter()
+    try:
+        future = _executor.submit(_decode_image, data)
+    except Exception:
+        _pending.release()
+        raise
+    # Free the slot only once the work really finishes, even after a timeout
+    future.add_done_callback(lambda _: _pending.release())
+
+    try:
+        codes, scale = future.result(timeout=DECODE_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        decode_metrics.record('timeout', time.perf_counter() - started)
+        raise QRDecodeError('Timed out reading QR code. Try a clearer or smaller image', 504)
+    except Exception as e:
+        decode_metrics.record('error', time.perf_counter() - started)
+        raise QRDecodeError(f'Could not decode image: {e}')
+
+    latency = time.perf_counter() - started
+    if not codes:
+        decode_metrics.record('no_code', latency)
+        raise QRDecodeError('No QR code found in image')
+
+    decode_metrics.record('success', latency, scale)
+    return codes
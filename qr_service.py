@@ -6,20 +6,17 @@ import qrcode
 import qrcode.image.svg
 from io import BytesIO
 import base64
-import re
 from flask import Blueprint, request, jsonify, send_file, current_app
 from PIL import Image
 import sqlite3
 from urllib.parse import quote, urlparse, parse_qs, unquote
 
-# Try to import pyzbar, but make it optional
-try:
-    from pyzbar.pyzbar import decode
-    PYZBAR_AVAILABLE = True
-except ImportError:
-    PYZBAR_AVAILABLE = False
-    print("Warning: pyzbar not installed. QR file scanning will not work.")
-    print("Install with: pip install pyzbar pillow")
+from qr_decoder import PYZBAR_AVAILABLE, QRDecodeError, decode_qr_upload, decode_metrics
+from upi_parser import (
+    PHONE_RE, PHONE_VPA_RE, VPA_RE, parse_upi_payload, phone_from_vpa,
+    is_valid_phone, is_valid_vpa
+)
+from recipient_directory import recipient_directory
 
 # Create blueprint
 qr_bp = Blueprint('qr', __name__, url_prefix='/qr')
@@ -88,123 +85,8 @@ def parse_upi_qr(qr_data):
     Parse UPI QR code data and extract parameters
     Handles multiple formats including phone-based UPI IDs
     """
-    if not qr_data:
-        return None
-    
-    # Clean and decode the data
-    qr_data = qr_data.strip()
-    
-    print(f"DEBUG parse_upi_qr: Raw QR data: {qr_data}")
-    
-    params = {}
-    
-    # Check if it's a phone-based UPI ID format: {phone}@easycash
-    phone_upi_pattern = r'^(\+91)?[6-9]\d{9}@easycash$'
-    if re.match(phone_upi_pattern, qr_data, re.IGNORECASE):
-        print(f"DEBUG: Phone-based UPI ID detected: {qr_data}")
-        params['pa'] = qr_data
-        # Try to extract phone number from UPI ID
-        phone_match = re.match(r'^(\+91)?([6-9]\d{9})@easycash$', qr_data, re.IGNORECASE)
-        if phone_match:
-            phone = phone_match.group(2)  # Get phone without country code
-            params['phone'] = phone
-        return params
-    
-    # Check if it's already a simple UPI ID (backward compatibility)
-    if re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+$', qr_data):
-        print(f"DEBUG: Direct UPI ID detected: {qr_data}")
-        params['pa'] = qr_data
-        # Check if it's a phone-based UPI ID
-        phone_match = re.match(r'^(\+91)?([6-9]\d{9})@easycash$', qr_data, re.IGNORECASE)
-        if phone_match:
-            phone = phone_match.group(2)
-            params['phone'] = phone
-        return params
-    
-    # Handle URL-encoded UPI data
-    if qr_data.startswith('upi://pay'):
-        print(f"DEBUG: UPI URL detected: {qr_data}")
-        
-        # Extract the query string
-        if '?' in qr_data:
-            query_string = qr_data.split('?', 1)[1]
-            
-            # Parse parameters
-            for param in query_string.split('&'):
-                if '=' in param:
-                    key, value = param.split('=', 1)
-                    params[key] = unquote(value)
-        
-        # Check for phone-based UPI ID in pa parameter
-        if 'pa' in params:
-            phone_match = re.match(r'^(\+91)?([6-9]\d{9})@easycash$', params['pa'], re.IGNORECASE)
-            if phone_match:
-                phone = phone_match.group(2)
-                params['phone'] = phone
-    
-    # Handle other UPI formats
-    elif qr_data.startswith('UPI:'):
-        print(f"DEBUG: Alternative UPI format detected: {qr_data}")
-        
-        # Remove 'UPI:' prefix
-        qr_data = qr_data[4:]
-        
-        if '?' in qr_data:
-            # Format: UPI:phone@easycash?pn=Name&am=100
-            upi_part, query_part = qr_data.split('?', 1)
-            params['pa'] = unquote(upi_part)
-            
-            # Check for phone number
-            phone_match = re.match(r'^(\+91)?([6-9]\d{9})@easycash$', params['pa'], re.IGNORECASE)
-            if phone_match:
-                phone = phone_match.group(2)
-                params['phone'] = phone
-            
-            # Parse remaining parameters
-            for param in query_part.split('&'):
-                if '=' in param:
-                    key, value = param.split('=', 1)
-                    params[key] = unquote(value)
-        else:
-            # Just UPI ID after UPI:
-            params['pa'] = unquote(qr_data)
-            # Check for phone number
-            phone_match = re.match(r'^(\+91)?([6-9]\d{9})@easycash$', params['pa'], re.IGNORECASE)
-            if phone_match:
-                phone = phone_match.group(2)
-                params['phone'] = phone
-    
-    # Check for plain text that might contain UPI ID
-    elif '@easycash' in qr_data.lower():
-        print(f"DEBUG: Checking for phone-based UPI ID in text: {qr_data}")
-        
-        # Try to find phone-based UPI ID pattern in the text
-        phone_upi_match = re.search(r'((\+91)?[6-9]\d{9}@easycash)', qr_data, re.IGNORECASE)
-        if phone_upi_match:
-            params['pa'] = phone_upi_match.group(1)
-            print(f"DEBUG: Found phone-based UPI ID in text: {params['pa']}")
-            
-            # Extract phone number
-            phone_match = re.match(r'^(\+91)?([6-9]\d{9})@easycash$', params['pa'], re.IGNORECASE)
-            if phone_match:
-                phone = phone_match.group(2)
-                params['phone'] = phone
-    
-    # Check for phone number in the text (without @easycash)
-    elif re.search(r'(\+91)?[6-9]\d{9}', qr_data):
-        print(f"DEBUG: Checking for phone number in text: {qr_data}")
-        
-        # Try to find phone number pattern in the text
-        phone_match = re.search(r'(\+91)?([6-9]\d{9})', qr_data)
-        if phone_match:
-            phone = phone_match.group(2)
-            params['phone'] = phone
-            # Create phone-based UPI ID
-            params['pa'] = f"{phone}@easycash"
-            print(f"DEBUG: Created phone-based UPI ID: {params['pa']}")
-    
-    print(f"DEBUG: Final parsed params: {params}")
-    return params if params else None
+    payload = parse_upi_payload(qr_data)
+    return payload.as_params() if payload else None
 
 def validate_upi_qr_data(qr_data):
     """
@@ -214,83 +96,48 @@ def validate_upi_qr_data(qr_data):
     if not qr_data:
         return False, "No QR data provided", None
     
-    print(f"DEBUG validate_upi_qr_data: Input: {qr_data[:100]}...")
-    
     # Parse QR data
-    params = parse_upi_qr(qr_data)
+    payload = parse_upi_payload(qr_data)
     
-    if not params:
-        print(f"DEBUG: Failed to parse QR data")
+    if not payload:
         return False, "Invalid QR code format. Could not extract UPI ID or phone number", None
     
     # Check if we have a UPI ID or phone number
-    upi_id = params.get('pa')
-    phone_number = params.get('phone')
+    upi_id = payload.pa
+    phone_number = payload.phone
     
     if not upi_id and not phone_number:
-        print(f"DEBUG: No UPI ID or phone number found in params: {params}")
         return False, "No UPI ID or phone number found in QR code", None
     
     # If we have phone number but not UPI ID, construct phone-based UPI ID
     if phone_number and not upi_id:
         upi_id = f"{phone_number}@easycash"
-        params['pa'] = upi_id
     
     # If we have UPI ID but not phone number, try to extract phone from UPI ID
     elif upi_id and not phone_number:
-        phone_match = re.match(r'^(\+91)?([6-9]\d{9})@easycash$', upi_id, re.IGNORECASE)
-        if phone_match:
-            phone_number = phone_match.group(2)
-            params['phone'] = phone_number
+        phone_number = phone_from_vpa(upi_id)
     
-    user_name = params.get('pn', '')
-    
-    print(f"DEBUG: Extracted UPI ID: {upi_id}")
-    print(f"DEBUG: Extracted phone number: {phone_number}")
-    print(f"DEBUG: Extracted name: {user_name}")
+    user_name = payload.name or ''
     
     # Validate UPI ID format (allow both phone-based and legacy formats)
-    phone_upi_pattern = r'^(\+91)?[6-9]\d{9}@easycash$'
-    legacy_upi_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+$'
-    
-    if not re.match(phone_upi_pattern, upi_id, re.IGNORECASE) and not re.match(legacy_upi_pattern, upi_id):
-        print(f"DEBUG: Invalid UPI ID format: {upi_id}")
+    if not is_valid_vpa(upi_id):
         return False, f"Invalid UPI ID format: {upi_id}", None
     
     # Validate phone number format if present
-    if phone_number and not re.match(r'^[6-9]\d{9}$', phone_number):
-        print(f"DEBUG: Invalid phone number format: {phone_number}")
+    if phone_number and not is_valid_phone(phone_number):
         return False, f"Invalid phone number format: {phone_number}", None
     
     # Check if user exists in database (prefer phone-based lookup)
     try:
-        conn = get_db_connection()
-        
-        # Try to find user by phone number first
-        user = None
-        if phone_number:
-            user = conn.execute(
-                'SELECT phone, username, upi_id, created_at FROM users WHERE phone = ?',
-                (phone_number,)
-            ).fetchone()
+        user = recipient_directory.by_phone(phone_number) if phone_number else None
         
         # If not found by phone, try by UPI ID (for backward compatibility)
         if not user and upi_id:
-            user = conn.execute(
-                'SELECT phone, username, upi_id, created_at FROM users WHERE upi_id = ?',
-                (upi_id.lower(),)
-            ).fetchone()
-        
-        conn.close()
+            user = recipient_directory.by_upi(upi_id.lower())
         
         if user:
-            user_dict = dict(user)
-            print(f"DEBUG: User found with phone: {user_dict['phone']}")
-            
-            return True, f"Valid user found: {user_dict['phone']}", user_dict
+            return True, f"Valid user found: {user['phone']}", user
         else:
-            print(f"DEBUG: User not found for phone/UPI: {phone_number or upi_id}")
-            
             # Prepare user data for response
             user_data = {
                 'upi_id': upi_id,
@@ -305,7 +152,7 @@ def validate_upi_qr_data(qr_data):
             return True, "User not found in system", user_data
             
     except Exception as e:
-        print(f"DEBUG: Database error: {e}")
+        print(f"Error validating UPI QR data: {e}")
         return False, f"Database error: {str(e)}", None
 
 @qr_bp.route('/generate/<phone>', methods=['GET'])
@@ -313,16 +160,11 @@ def generate_user_qr(phone):
     """Generate QR code for a user by phone number"""
     try:
         # Validate phone number format
-        if not re.match(r'^[6-9]\d{9}$', phone):
+        if not PHONE_RE.match(phone):
             return jsonify({'success': False, 'error': 'Invalid phone number format. Use 10-digit Indian mobile number'}), 400
         
         # Get user data
-        conn = get_db_connection()
-        user = conn.execute(
-            'SELECT phone, username, upi_id FROM users WHERE phone = ?',
-            (phone,)
-        ).fetchone()
-        conn.close()
+        user = recipient_directory.by_phone(phone)
         
         if not user:
             return jsonify({'success': False, 'error': 'User not found with this phone number'}), 404
@@ -425,39 +267,34 @@ def scan_qr_from_file():
         if not any(file.filename.lower().endswith(ext) for ext in allowed_extensions):
             return jsonify({'success': False, 'error': 'Invalid file type. Use PNG, JPG, JPEG, GIF, or BMP'}), 400
         
-        # Check if pyzbar is available
-        if not PYZBAR_AVAILABLE:
-            return jsonify({
-                'success': False,
-                'error': 'QR scanning requires pyzbar package. Install with: pip install pyzbar pillow'
-            }), 500
-        
-        # Read image file
-        image = Image.open(file.stream)
-        
-        # Decode QR codes
-        decoded_objects = decode(image)
-        
-        if not decoded_objects:
-            return jsonify({'success': False, 'error': 'No QR code found in image'}), 400
-        
-        # Get first QR code data
-        qr_data = decoded_objects[0].data.decode('utf-8')
+        # Decode off the request thread with size and time limits
+        try:
+            codes = decode_qr_upload(file.stream)
+        except QRDecodeError as e:
+            return jsonify({'success': False, 'error': e.message}), e.status
+        
+        # Use the first code that is a valid UPI payload, report all of them
+        qr_data = codes[0]
+        is_valid, message, user_data = False, 'No QR code found in image', None
+        for code in codes:
+            is_valid, message, user_data = validate_upi_qr_data(code)
+            if is_valid:
+                qr_data = code
+                break
         
         print("=" * 60)
         print("FILE SCAN DEBUG:")
         print(f"File: {file.filename}")
         print(f"QR Data (first 200 chars): {qr_data[:200]}")
         print(f"Full length: {len(qr_data)}")
+        print(f"Codes found: {len(codes)}")
         print("=" * 60)
         
-        # Validate the QR data
-        is_valid, message, user_data = validate_upi_qr_data(qr_data)
-        
         if not is_valid:
             return jsonify({
                 'success': False,
                 'error': message,
+                'codes': codes,
                 'debug': {
                     'raw_qr_data': qr_data[:200],
                     'length': len(qr_data)
@@ -470,6 +307,8 @@ def scan_qr_from_file():
             'message': message,
             'user': user_data,
             'is_registered': user_data.get('is_registered', True) if user_data else False,
+            'codes': codes,
+            'code_count': len(codes),
             'file_name': file.filename
         })
         
@@ -486,19 +325,14 @@ def get_upi_details(upi_id):
         # Decode URL if needed
         upi_id = unquote(upi_id)
         
-        conn = get_db_connection()
-        user = conn.execute(
-            'SELECT phone, username, upi_id, created_at FROM users WHERE upi_id = ?',
-            (upi_id,)
-        ).fetchone()
-        conn.close()
+        user = recipient_directory.by_upi(upi_id)
         
         if not user:
             return jsonify({'success': False, 'error': 'User not found'}), 404
         
         return jsonify({
             'success': True,
-            'user': dict(user)
+            'user': user
         })
         
     except Exception as e:
@@ -510,22 +344,17 @@ def get_user_by_phone(phone):
     """Get user details by phone number"""
     try:
         # Validate phone number format
-        if not re.match(r'^[6-9]\d{9}$', phone):
+        if not PHONE_RE.match(phone):
             return jsonify({'success': False, 'error': 'Invalid phone number format'}), 400
         
-        conn = get_db_connection()
-        user = conn.execute(
-            'SELECT phone, username, upi_id, created_at FROM users WHERE phone = ?',
-            (phone,)
-        ).fetchone()
-        conn.close()
+        user = recipient_directory.by_phone(phone)
         
         if not user:
             return jsonify({'success': False, 'error': 'User not found with this phone number'}), 404
         
         return jsonify({
             'success': True,
-            'user': dict(user)
+            'user': user
         })
         
     except Exception as e:
@@ -545,7 +374,8 @@ def qr_health():
             'validate_qr': True,
             'upi_details': True,
             'phone_based_auth': True
-        }
+        },
+        'decode_metrics': decode_metrics.snapshot()
     })
 
 @qr_bp.route('/test-parse', methods=['POST'])
@@ -569,12 +399,10 @@ def test_parse():
         print(f"Parsed params: {params}")
         
         # Check if it looks like a phone-based UPI ID
-        phone_upi_pattern = r'^(\+91)?[6-9]\d{9}@easycash$'
-        is_phone_upi_id = re.match(phone_upi_pattern, qr_data, re.IGNORECASE)
+        is_phone_upi_id = PHONE_VPA_RE.match(qr_data)
         
         # Check if it looks like a legacy UPI ID
-        legacy_upi_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+$'
-        is_legacy_upi_id = re.match(legacy_upi_pattern, qr_data)
+        is_legacy_upi_id = VPA_RE.match(qr_data)
         
         print(f"Is phone-based UPI ID: {bool(is_phone_upi_id)}")
         print(f"Is legacy UPI ID: {bool(is_legacy_upi_id)}")
@@ -599,7 +427,7 @@ def test_phone_qr(phone):
     """Test endpoint to generate QR for phone number"""
     try:
         # Validate phone number format
-        if not re.match(r'^[6-9]\d{9}$', phone):
+        if not PHONE_RE.match(phone):
             return jsonify({'success': False, 'error': 'Invalid phone number format'}), 400
         
         # Create phone-based UPI ID
@@ -0,0 +1,154 @@
+"""
+Recipient Directory for EasyCash
+Shared, cached resolution of recipients by phone, UPI ID or username
+"""
+import sqlite3
+
+from ttl_cache import TTLCache
+
+# Sentinel stored for identifiers that did not match any user
+_NOT_FOUND = object()
+
+# Identifiers per IN (...) list in batch lookups
+RESOLVE_CHUNK_SIZE = 400
+
+
+class RecipientDirectory:
+    """
+    Resolves recipients through one in-memory TTL/LRU cache.
+    Misses are cached too, with a shorter TTL, so repeated lookups of
+    unregistered numbers do not hit the database either.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300, negative_ttl=30):
+        self.db_path = 'easycash.db'
+        self.negative_ttl = negative_ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def _lookup(self, field, value):
+        if not value:
+            return None
+
+        key = (field, value)
+        cached = self._cache.get(key)
+        if cached is _NOT_FOUND:
+            return None
+        if cached is not None:
+            return dict(cached)
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(
+                f'SELECT phone, username, upi_id, created_at FROM users WHERE {field} = ?',
+                (value,)
+            ).fetchone()
+            conn.close()
+        except Exception as e:
+            print(f"Error resolving recipient by {field}: {e}")
+            return None
+
+        if row is None:
+            self._cache.set(key, _NOT_FOUND, ttl=self.negative_ttl)
+            return None
+
+        user = dict(row)
+        self._cache.set(key, user)
+        return dict(user)
+
+    def by_phone(self, phone):
+        """Get recipient by phone number"""
+        return self._lookup('phone', phone)
+
+    def by_upi(self, upi_id):
+        """Get recipient by UPI ID"""
+        return self._lookup('upi_id', upi_id)
+
+    def by_username(self, username):
+        """Get recipient by username"""
+        return self._lookup('username', username)
+
+    def resolve_many(self, phones=(), upi_ids=()):
+        """
+        Resolve many phones and UPI IDs with one cache pass and one query
+        Returns tuple (by_phone, by_upi) of dicts mapping identifier -> user or None
+        """
+        found = {'phone': {}, 'upi_id': {}}
+        missing = {'phone': [], 'upi_id': []}
+
+        for field, values in (('phone', phones), ('upi_id', upi_ids)):
+            for value in set(v for v in values if v):
+                cached = self._cache.get((field, value))
+                if cached is _NOT_FOUND:
+                    found[field][value] = None
+                elif cached is not None:
+                    found[field][value] = dict(cached)
+                else:
+                    missing[field].append(value)
+
+        if missing['phone'] or missing['upi_id']:
+            try:
+                conn = sqlite3.connect(self.db_path)
+                conn.row_factory = sqlite3.Row
+                # Chunk to stay under SQLite's bound-parameter limit
+                for start in range(0, max(len(missing['phone']), len(missing['upi_id'])), RESOLVE_CHUNK_SIZE):
+                    phone_chunk = missing['phone'][start:start + RESOLVE_CHUNK_SIZE]
+                    upi_chunk = missing['upi_id'][start:start + RESOLVE_CHUNK_SIZE]
+                    phone_marks = ','.join('?' * len(phone_chunk)) or 'NULL'
+                    upi_marks = ','.join('?' * len(upi_chunk)) or 'NULL'
+                    rows = conn.execute(f'''
+                        SELECT phone, username, upi_id, created_at
+                        FROM users
+                        WHERE phone IN ({phone_marks}) OR upi_id IN ({upi_marks})
+                    ''', phone_chunk + upi_chunk).fetchall()
+
+                    wanted_phones, wanted_upis = set(phone_chunk), set(upi_chunk)
+                    for row in rows:
+                        user = dict(row)
+                        self._cache.set(('phone', user['phone']), user)
+                        if user['upi_id']:
+                            self._cache.set(('upi_id', user['upi_id']), user)
+                        if user['phone'] in wanted_phones:
+                            found['phone'][user['phone']] = dict(user)
+                        if user['upi_id'] in wanted_upis:
+                            found['upi_id'][user['upi_id']] = dict(user)
+                conn.close()
+            except Exception as e:
+                print(f"Error resolving recipients in batch: {e}")
+                return found['phone'], found['upi_id']
+
+            for field in ('phone', 'upi_id'):
+                for value in missing[field]:
+                    if value not in found[field]:
+                        found[field][value] = None
+                        self._cache.set((field, value), _NOT_FOUND, ttl=self.negative_ttl)
+
+        return found['phone'], found['upi_id']
+
+    def resolve(self, identifier, payment_method):
+        """Resolve a send-money identifier for the given payment method"""
+        if payment_method in ('mobile', 'contact'):
+            return self.by_phone(identifier)
+        if payment_method == 'upi':
+            return self.by_upi(identifier)
+        return None
+
+    def invalidate(self, phone=None, upi_ids=(), usernames=()):
+        """Drop cached entries for a user whose identifiers were created or changed"""
+        if phone:
+            self._cache.pop(('phone', phone))
+        for upi_id in upi_ids:
+            if upi_id:
+                self._cache.pop(('upi_id', upi_id))
+        for username in usernames:
+            if username:
+                self._cache.pop(('username', username))
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+# Create global instance
+recipient_directory = RecipientDirectory()
@@ -50,7 +50,7 @@ self.addEventListener('activate', event => {
     caches.keys().then(cacheNames => {
       return Promise.all(
         cacheNames.map(cacheName => {
-          if (cacheName !== CACHE_NAME) {
+          if (cacheName !== CACHE_NAME && cacheName !== LEDGER_CACHE) {
             console.log('[Service Worker] Deleting old cache:', cacheName);
             return caches.delete(cacheName);
           }
@@ -68,6 +68,27 @@ self.addEventListener('activate', event => {
 
 // Fetch event
 self.addEventListener('fetch', event => {
+  const url = new URL(event.request.url);
+
+  if (event.request.mode === 'navigate' && url.pathname === '/logout') {
+    // Leave nothing of the account behind on this device
+    event.waitUntil(clearLedger());
+  } else if (event.request.mode === 'navigate' && url.pathname === '/transactions') {
+    // Network first; offline, the last copy renders from the ledger store
+    event.respondWith(
+      fetch(event.request)
+        .then(response => {
+          const owner = response.headers.get('X-Ledger-Owner');
+          if (response.ok && !response.redirected && owner) {
+            event.waitUntil(storeLedgerPage(owner, response.clone()));
+          }
+          return response;
+        })
+        .catch(() => matchLedgerPage())
+    );
+    return;
+  }
+
   event.respondWith(
     caches.match(event.request)
       .then(response => {
@@ -79,6 +100,179 @@ self.addEventListener('fetch', event => {
   );
 });
 
+// Offline transaction history: an IndexedDB copy kept current through
+// /api/sync/transactions, read by pages via postMessage (static/js/ledger.js)
+const LEDGER_DB = 'easycash-ledger';
+const LEDGER_CACHE = 'easycash-ledger-pages';
+
+function openLedger() {
+  return new Promise((resolve, reject) => {
+    const request = indexedDB.open(LEDGER_DB, 1);
+    request.onupgradeneeded = () => {
+      const db = request.result;
+      db.createObjectStore('transactions', { keyPath: 'id' });
+      db.createObjectStore('meta');
+    };
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+function ledgerTransaction(db, stores, mode, work) {
+  return new Promise((resolve, reject) => {
+    const tx = db.transaction(stores, mode);
+    const result = work(tx);
+    tx.oncomplete = () => resolve(result && 'result' in result ? result.result : result);
+    tx.onerror = () => reject(tx.error);
+  });
+}
+
+// Cached /transactions pages are keyed by account; only the latest account's is kept
+function ledgerPageKey(owner) {
+  return `/transactions?owner=${encodeURIComponent(owner)}`;
+}
+
+async function storeLedgerPage(owner, response) {
+  const cache = await caches.open(LEDGER_CACHE);
+  const keep = new URL(ledgerPageKey(owner), self.location.origin).href;
+  const keys = await cache.keys();
+  await Promise.all(keys.filter(request => request.url !== keep).map(request => cache.delete(request)));
+  await cache.put(ledgerPageKey(owner), response);
+}
+
+// Offline copy of the page for the account the ledger store belongs to
+async function matchLedgerPage() {
+  const db = await openLedger();
+  const state = await ledgerTransaction(db, ['meta'], 'readonly', tx => tx.objectStore('meta').get('state'));
+  db.close();
+  if (!state || !state.owner) {
+    return undefined;
+  }
+  const cache = await caches.open(LEDGER_CACHE);
+  return cache.match(ledgerPageKey(state.owner));
+}
+
+// Rows and balance for owner, or null; a store left by another account is wiped
+async function readLedger(limit, owner) {
+  const db = await openLedger();
+  const state = await ledgerTransaction(db, ['meta'], 'readonly', tx => tx.objectStore('meta').get('state'));
+  if (!owner || !state || state.owner !== owner) {
+    db.close();
+    if (state && owner) {
+      await clearLedgerStore();
+    }
+    return null;
+  }
+  const transactions = [];
+
+  await new Promise((resolve, reject) => {
+    // Newest first, stopping after limit rows
+    const request = db.transaction('transactions').objectStore('transactions').openCursor(null, 'prev');
+    request.onsuccess = () => {
+      const cursor = request.result;
+      if (cursor && transactions.length < limit) {
+        transactions.push(cursor.value);
+        cursor.continue();
+      } else {
+        resolve();
+      }
+    };
+    request.onerror = () => reject(request.error);
+  });
+
+  db.close();
+  return { transactions, balance: state ? state.balance : null, syncedAt: state ? state.syncedAt : null };
+}
+
+async function clearLedgerStore() {
+  const db = await openLedger();
+  await ledgerTransaction(db, ['transactions', 'meta'], 'readwrite', tx => {
+    tx.objectStore('transactions').clear();
+    tx.objectStore('meta').clear();
+  });
+  db.close();
+}
+
+async function clearLedger() {
+  await clearLedgerStore();
+  await caches.delete(LEDGER_CACHE);
+}
+
+let ledgerSyncing = null;
+
+// Pull deltas until caught up; resolves to the number of new transactions
+function syncLedger() {
+  if (!ledgerSyncing) {
+    ledgerSyncing = runLedgerSync().finally(() => { ledgerSyncing = null; });
+  }
+  return ledgerSyncing;
+}
+
+async function runLedgerSync() {
+  const db = await openLedger();
+  let state = await ledgerTransaction(db, ['meta'], 'readonly', tx => tx.objectStore('meta').get('state'));
+  let added = 0;
+
+  try {
+    while (true) {
+      const cursor = state ? state.cursor : '';
+      const response = await fetch(`/api/sync/transactions?cursor=${encodeURIComponent(cursor)}`,
+                                   { credentials: 'same-origin' });
+      if (response.redirected || !(response.headers.get('Content-Type') || '').includes('json')) {
+        // Signed out: drop the local copy
+        db.close();
+        await clearLedger();
+        return 0;
+      }
+
+      const data = await response.json();
+      if (!data.success) {
+        throw new Error(data.error || 'Sync failed');
+      }
+
+      state = { cursor: data.cursor, owner: data.owner, balance: data.balance, syncedAt: Date.now() };
+      await ledgerTransaction(db, ['transactions', 'meta'], 'readwrite', tx => {
+        const store = tx.objectStore('transactions');
+        if (data.reset) {
+          // First sync or another account signed in on this device
+          store.clear();
+        }
+        data.transactions.forEach(transaction => store.put(transaction));
+        tx.objectStore('meta').put(state, 'state');
+      });
+      added += data.transactions.length;
+
+      if (!data.has_more) {
+        break;
+      }
+    }
+  } finally {
+    db.close();
+  }
+
+  return added;
+}
+
+self.addEventListener('message', event => {
+  const message = event.data || {};
+  const port = event.ports[0];
+  if (!port || (message.type !== 'LEDGER_LOAD' && message.type !== 'LEDGER_SYNC')) {
+    return;
+  }
+
+  // The page says which account it shows; another account's rows are never returned
+  const limit = message.limit || 50;
+  const work = message.type === 'LEDGER_LOAD'
+    ? readLedger(limit, message.owner)
+    : syncLedger().then(added => readLedger(limit, message.owner).then(ledger => ledger && { ...ledger, added }));
+
+  event.waitUntil(
+    work
+      .then(result => port.postMessage(result ? { ok: true, ...result } : { ok: false }))
+      .catch(error => port.postMessage({ ok: false, error: String(error) }))
+  );
+});
+
 // Push event - handle push notifications
 self.addEventListener('push', event => {
   console.log('[Service Worker] Push received');
@@ -0,0 +1,118 @@
+"""
+App Shell Assets for EasyCash
+Service worker and manifest kept in memory with their compressed copies,
+reloaded only when the file on disk changes
+"""
+import hashlib
+import os
+import threading
+
+from flask import Response, request
+
+from compression import BROTLI_AVAILABLE, COMPRESS_MIN_SIZE, choose_encoding, compress
+
+
+class ShellAsset:
+    """One file served from memory"""
+
+    def __init__(self, path, mimetype, cache_control, headers=None, transform=None):
+        self.path = path
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        self.headers = headers or {}
+        self.transform = transform
+        self.mtime = None
+        self.data = b''
+        self.etag = None
+        self.variants = {}
+
+    def load(self):
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        if self.transform:
+            data = self.transform(data)
+
+        variants = {}
+        if len(data) >= COMPRESS_MIN_SIZE:
+            for name in (('br', 'gzip') if BROTLI_AVAILABLE else ('gzip',)):
+                compressed = compress(data, name, static=True)
+                if len(compressed) < len(data):
+                    variants[name] = compressed
+
+        self.data = data
+        self.etag = hashlib.sha256(data).hexdigest()[:16]
+        self.variants = variants
+        self.mtime = mtime
+
+
+class ShellAssets:
+    """
+    Named in-memory files answered with ETag/304 and precompressed bodies
+    Each request only stats the file; it is re-read when its mtime changes
+    """
+
+    def __init__(self):
+        self._assets = {}
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def add(self, name, path, mimetype, cache_control, headers=None, transform=None):
+        asset = ShellAsset(path, mimetype, cache_control, headers, transform)
+        asset.load()
+        self._assets[name] = asset
+        return asset
+
+    def get(self, name):
+        asset = self._assets[name]
+        try:
+            mtime = os.path.getmtime(asset.path)
+        except OSError:
+            # Keep serving the copy in memory if the file is briefly missing
+            return asset
+
+        if mtime != asset.mtime:
+            with self._lock:
+                if mtime != asset.mtime:
+                    try:
+                        asset.load()
+                        self.reloads += 1
+                    except OSError as e:
+                        print(f"Error reloading {asset.path}: {e}")
+        return asset
+
+    def response(self, name):
+        """Response for the current request: 304, compressed or plain"""
+        asset = self.get(name)
+
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        body = asset.variants.get(encoding)
+        if body is None:
+            encoding = None
+
+        if request.if_none_match.contains(asset.etag):
+            response = Response(status=304)
+        elif encoding:
+            response = Response(body, mimetype=asset.mimetype)
+            response.headers['Content-Encoding'] = encoding
+        else:
+            response = Response(asset.data, mimetype=asset.mimetype)
+
+        # Compressed bodies carry a suffixed ETag; the middleware strips it on the way back in
+        response.set_etag(f"{asset.etag}-{encoding}" if encoding else asset.etag)
+        if asset.variants:
+            response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = asset.cache_control
+        for key, value in asset.headers.items():
+            response.headers[key] = value
+        return response
+
+    def stats(self):
+        return {
+            'files': {name: {'bytes': len(a.data), 'encodings': sorted(a.variants)}
+                      for name, a in self._assets.items()},
+            'reloads': self.reloads
+        }
+
+# Create global instance
+shell_assets = ShellAssets()
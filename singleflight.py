@@ -0,0 +1,79 @@
+"""
+Single-flight Request Coalescing for EasyCash
+Concurrent identical calls wait on one in-flight computation and share its
+result, instead of each running the same heavy work
+"""
+import threading
+
+# A waiter gives up and computes on its own after this long
+WAIT_TIMEOUT_SECONDS = 30
+
+
+class _Call:
+    """One in-flight computation and the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs fn once per key while a call for that key is in flight.
+    Nothing is kept after the call finishes, so results are never stale;
+    callers must treat shared results as read-only.
+    Keys are tuples whose first element names the operation, for metrics.
+    """
+
+    def __init__(self, wait_timeout=WAIT_TIMEOUT_SECONDS):
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._metrics = {}
+
+    def _count(self, name, field):
+        metrics = self._metrics.setdefault(name, {'calls': 0, 'executed': 0, 'coalesced': 0, 'errors': 0})
+        metrics[field] += 1
+
+    def do(self, key, fn):
+        name = key[0] if isinstance(key, tuple) else key
+        with self._lock:
+            self._count(name, 'calls')
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._count(name, 'executed')
+            else:
+                self._count(name, 'coalesced')
+
+        if not leader:
+            if not call.done.wait(self.wait_timeout):
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self._count(name, 'errors')
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'operations': {name: dict(metrics) for name, metrics in self._metrics.items()}
+            }
+
+# Create global instance
+singleflight = SingleFlight()
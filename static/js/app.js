@@ -197,6 +197,56 @@ async function validateRecipient(method, identifier) {
     }
 }
 
+// Recipient resolution: lookups made in the same tick share one request
+const recipientResults = new Map();
+let pendingRecipients = null;
+
+async function resolveRecipients(identifiers) {
+    const unique = [...new Set(identifiers)];
+    const missing = unique.filter(id => !recipientResults.has(id));
+
+    for (let i = 0; i < missing.length; i += 500) {
+        const response = await fetch('/api/recipients/resolve', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-Requested-With': 'XMLHttpRequest'
+            },
+            body: JSON.stringify({ identifiers: missing.slice(i, i + 500) })
+        });
+
+        if (!response.ok) {
+            throw new Error('Network response was not ok');
+        }
+
+        const data = await response.json();
+        Object.entries(data.results || {}).forEach(([id, result]) => {
+            recipientResults.set(id, result);
+        });
+    }
+
+    const results = {};
+    unique.forEach(id => {
+        results[id] = recipientResults.get(id) || { exists: false };
+    });
+    return results;
+}
+
+function resolveRecipient(identifier) {
+    if (!pendingRecipients) {
+        const batch = { identifiers: new Set() };
+        batch.promise = new Promise(resolve => setTimeout(resolve, 0))
+            .then(() => {
+                pendingRecipients = null;
+                return resolveRecipients([...batch.identifiers]);
+            });
+        pendingRecipients = batch;
+    }
+
+    pendingRecipients.identifiers.add(identifier);
+    return pendingRecipients.promise.then(results => results[identifier]);
+}
+
 async function quickSend(amount, recipient, method = 'contact') {
     if (!validateAmount(amount)) return;
     
@@ -0,0 +1,64 @@
+// static/js/batch.js
+// Read requests made in the same tick go to /api/batch as one POST.
+// EasyCashBatch.get(path) resolves with the JSON body, like fetch().json().
+// ETags are remembered per path, so unchanged data comes back as a 304
+// and is answered from the last body seen.
+const EasyCashBatch = {
+    queue: [],
+    cache: new Map(),
+    timer: null,
+
+    get(path) {
+        return new Promise((resolve, reject) => {
+            this.queue.push({ path, resolve, reject });
+            if (!this.timer) {
+                this.timer = setTimeout(() => this.flush(), 0);
+            }
+        });
+    },
+
+    flush() {
+        const pending = this.queue.splice(0, 10);
+        this.timer = this.queue.length ? setTimeout(() => this.flush(), 0) : null;
+
+        const requests = pending.map((item, index) => {
+            const cached = this.cache.get(item.path);
+            return { id: String(index), path: item.path, etag: cached ? cached.etag : undefined };
+        });
+
+        fetch('/api/batch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ requests })
+        })
+            .then(response => {
+                if (!response.ok) throw new Error(`Batch failed: ${response.status}`);
+                return response.json();
+            })
+            .then(data => {
+                pending.forEach((item, index) => {
+                    const result = data.responses[String(index)];
+                    if (result.status === 304 && this.cache.has(item.path)) {
+                        item.resolve(this.cache.get(item.path).body);
+                    } else if (result.status === 200) {
+                        if (result.etag) {
+                            this.cache.set(item.path, { etag: result.etag, body: result.body });
+                        }
+                        item.resolve(result.body);
+                    } else {
+                        item.reject(new Error(`${item.path}: ${result.status}`));
+                    }
+                });
+            })
+            .catch(() => {
+                // Fall back to one request each
+                pending.forEach(item => {
+                    fetch(item.path)
+                        .then(response => response.json())
+                        .then(item.resolve, item.reject);
+                });
+            });
+    }
+};
+
+window.EasyCashBatch = EasyCashBatch;
@@ -0,0 +1,51 @@
+// static/js/events.js
+// One Server-Sent Events connection per page. Other scripts listen for the
+// window events it dispatches (easycash:<type>) instead of polling.
+const EasyCashEvents = {
+    types: ['notification', 'unread_count', 'balance', 'resync'],
+    supported: 'EventSource' in window,
+    source: null,
+
+    connect() {
+        if (!this.supported || this.source) return;
+
+        // The browser reconnects on its own and sends Last-Event-ID
+        this.source = new EventSource('/api/events');
+
+        this.types.forEach(type => {
+            this.source.addEventListener(type, (e) => {
+                let detail = {};
+                try {
+                    detail = JSON.parse(e.data);
+                } catch (error) {
+                    console.error('Bad event payload:', error);
+                }
+                window.dispatchEvent(new CustomEvent(`easycash:${type}`, { detail }));
+            });
+        });
+
+        this.source.onerror = () => {
+            // CLOSED means the server refused the stream (e.g. connection limit)
+            if (this.source.readyState === EventSource.CLOSED) {
+                this.supported = false;
+                this.source = null;
+                window.dispatchEvent(new CustomEvent('easycash:fallback'));
+            }
+        };
+    },
+
+    on(type, handler) {
+        window.addEventListener(`easycash:${type}`, (e) => handler(e.detail));
+    },
+
+    // Run a polling fallback now, or later if the stream gets refused
+    whenUnavailable(callback) {
+        if (!this.supported) {
+            callback();
+        } else {
+            window.addEventListener('easycash:fallback', callback, { once: true });
+        }
+    }
+};
+
+window.EasyCashEvents = EasyCashEvents;
@@ -0,0 +1,51 @@
+// static/js/ledger.js
+// Page side of the offline transaction history kept by the service worker.
+// load() answers from the local store at once; sync() pulls what changed
+// since the last sync and dispatches easycash:ledger when rows were added.
+// Both answer only for the account named by the page's data-ledger-owner.
+const EasyCashLedger = {
+    owner() {
+        const element = document.querySelector('[data-ledger-owner]');
+        return element ? element.dataset.ledgerOwner : null;
+    },
+
+    ask(type, limit) {
+        const owner = this.owner();
+        const worker = navigator.serviceWorker && navigator.serviceWorker.controller;
+        if (!worker || !owner) {
+            return Promise.resolve(null);
+        }
+
+        return new Promise(resolve => {
+            const channel = new MessageChannel();
+            channel.port1.onmessage = (e) => resolve(e.data.ok ? e.data : null);
+            worker.postMessage({ type, limit, owner }, [channel.port2]);
+        });
+    },
+
+    // Newest transactions and balance as last synced, or null without a store
+    load(limit = 50) {
+        return this.ask('LEDGER_LOAD', limit);
+    },
+
+    sync(limit = 50) {
+        return this.ask('LEDGER_SYNC', limit).then(ledger => {
+            if (ledger && ledger.added > 0) {
+                window.dispatchEvent(new CustomEvent('easycash:ledger', { detail: ledger }));
+            }
+            return ledger;
+        });
+    },
+
+    // Re-sync whenever the event stream reports a balance change
+    follow(limit = 50) {
+        if (window.EasyCashEvents) {
+            EasyCashEvents.on('balance', () => this.sync(limit));
+            EasyCashEvents.on('resync', () => this.sync(limit));
+        }
+        window.addEventListener('online', () => this.sync(limit));
+        return this.sync(limit);
+    }
+};
+
+window.EasyCashLedger = EasyCashLedger;
@@ -0,0 +1,39 @@
+// static/js/notification-badge.js
+// Unread badge in the bottom nav, kept current from the event stream
+// Notification badge update function
+function updateNotificationBadge(count) {
+    const badge = document.getElementById('notification-badge');
+    if (badge) {
+        if (count > 0) {
+            badge.textContent = count < 10 ? count : '9+';
+            badge.style.display = 'flex';
+        } else {
+            badge.style.display = 'none';
+        }
+    }
+    
+    // Update document title
+    if (count > 0) {
+        document.title = `(${count}) EasyCash - Digital Wallet`;
+    } else {
+        document.title = 'EasyCash - Digital Wallet';
+    }
+}
+
+// Keep the badge current from the event stream; poll only without it
+function refreshNotificationBadge() {
+    EasyCashBatch.get('/api/notifications/count')
+        .then(data => {
+            if (data.success) updateNotificationBadge(data.count);
+        })
+        .catch(error => console.error('Error refreshing badge:', error));
+}
+
+window.addEventListener('DOMContentLoaded', () => {
+    if (!window.EasyCashEvents) return;
+    
+    EasyCashEvents.on('notification', data => updateNotificationBadge(data.unread_count));
+    EasyCashEvents.on('unread_count', data => updateNotificationBadge(data.unread_count));
+    EasyCashEvents.on('resync', refreshNotificationBadge);
+    EasyCashEvents.whenUnavailable(() => setInterval(refreshNotificationBadge, 30000));
+});
@@ -4,6 +4,7 @@ class NotificationManager {
         this.unreadCount = 0;
         this.checkInterval = 30000; // Check every 30 seconds
         this.selectedNotifications = new Set();
+        this.bulkChunkSize = 500; // Server limit per request (MAX_BULK_IDS)
         this.bulkActions = document.getElementById('bulkActions');
         this.init();
     }
@@ -13,11 +14,12 @@ class NotificationManager {
         if ('serviceWorker' in navigator && 'PushManager' in window) {
             await this.registerServiceWorker();
             await this.requestNotificationPermission();
-            this.startPolling();
         } else {
             console.log('Push notifications not supported');
         }
         
+        this.listenForUpdates();
+        
         // Load initial notification count
         await this.updateBadge();
         
@@ -48,6 +50,31 @@ class NotificationManager {
         return false;
     }
     
+    listenForUpdates() {
+        // Live updates arrive on the shared event stream; poll only without it
+        if (!window.EasyCashEvents) {
+            this.startPolling();
+            return;
+        }
+        
+        EasyCashEvents.on('notification', (data) => {
+            this.unreadCount = data.unread_count;
+            this.updateBadgeUI();
+            
+            const lastShownId = localStorage.getItem('lastShownNotificationId');
+            if (lastShownId !== data.notification.id.toString()) {
+                this.showBrowserNotification(data.notification);
+                localStorage.setItem('lastShownNotificationId', data.notification.id);
+            }
+        });
+        EasyCashEvents.on('unread_count', (data) => {
+            this.unreadCount = data.unread_count;
+            this.updateBadgeUI();
+        });
+        EasyCashEvents.on('resync', () => this.checkForNewNotifications());
+        EasyCashEvents.whenUnavailable(() => this.startPolling());
+    }
+    
     startPolling() {
         // Check for new notifications periodically
         setInterval(() => {
@@ -544,15 +571,25 @@ class NotificationManager {
         this.showToast('Selection cleared', 'info');
     }
     
+    // Post ids in chunks the server accepts, one request after another
+    async postIdsInChunks(url, ids) {
+        for (let start = 0; start < ids.length; start += this.bulkChunkSize) {
+            const response = await fetch(url, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ ids: ids.slice(start, start + this.bulkChunkSize) })
+            });
+            const data = await response.json();
+            if (!data.success) throw new Error(data.error || 'Bulk request failed');
+        }
+    }
+    
     async bulkMarkAsRead() {
         if (this.selectedNotifications.size === 0) return;
         
         try {
-            const promises = Array.from(this.selectedNotifications).map(id => 
-                fetch(`/api/notifications/${id}/read`, { method: 'POST' })
-            );
-            
-            await Promise.all(promises);
+            await this.postIdsInChunks('/api/notifications/read-selected',
+                                       Array.from(this.selectedNotifications));
             
             // Update UI
             Array.from(this.selectedNotifications).forEach(id => {
@@ -586,11 +623,8 @@ class NotificationManager {
         }
         
         try {
-            const promises = Array.from(this.selectedNotifications).map(id => 
-                fetch(`/api/notifications/${id}`, { method: 'DELETE' })
-            );
-            
-            await Promise.all(promises);
+            await this.postIdsInChunks('/api/notifications/delete-selected',
+                                       Array.from(this.selectedNotifications));
             
             // Remove from UI with animation
             Array.from(this.selectedNotifications).forEach((id, index) => {
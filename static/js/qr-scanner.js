@@ -0,0 +1,1054 @@
+// static/js/qr-scanner.js
+// Camera/file QR scanning and the QR payment flow (/qr/validate,
+// /qr/scan/file, /send-money-qr). base.html loads this on the first tap of
+// the Scan QR button, so other pages do not download or parse it.
+class EnhancedQRScanner {
+    constructor() {
+        this.scannedData = null;
+        this.cameraStream = null;
+        this.isFlashOn = false;
+        this.currentFacingMode = 'environment'; // 'environment' for rear camera, 'user' for front
+        this.videoTrack = null;
+        this.scanInterval = null;
+        // Rendered onto the Scan QR button by base.html
+        const trigger = document.getElementById('qrScanTrigger');
+        this.currentUserUPI = (trigger?.dataset.upiId || '').trim().toLowerCase();
+        this.currentUserName = (trigger?.dataset.username || '').trim();
+        this.pinAttempts = 3;
+        this.currentPaymentAmount = 0;
+    }
+
+    async startCamera() {
+        try {
+            const scannerPreview = document.getElementById('scannerPreview');
+            const cameraFallback = document.getElementById('cameraFallback');
+            const video = document.getElementById('cameraVideo');
+            
+            // Hide fallback, show video
+            cameraFallback.style.display = 'none';
+            video.style.display = 'block';
+            
+            // Stop existing stream if any
+            if (this.cameraStream) {
+                this.stopCamera();
+            }
+            
+            // Get camera constraints
+            const constraints = {
+                video: {
+                    facingMode: this.currentFacingMode,
+                    width: { ideal: 1280 },
+                    height: { ideal: 720 }
+                },
+                audio: false
+            };
+            
+            // Request camera access
+            this.cameraStream = await navigator.mediaDevices.getUserMedia(constraints);
+            video.srcObject = this.cameraStream;
+            
+            // Store video track for flashlight control
+            this.videoTrack = this.cameraStream.getVideoTracks()[0];
+            
+            // Start QR scanning
+            this.startQRScanning();
+            
+            return true;
+        } catch (error) {
+            console.error('Camera error:', error);
+            this.showCameraFallback();
+            return false;
+        }
+    }
+
+    showCameraFallback() {
+        const scannerPreview = document.getElementById('scannerPreview');
+        const video = document.getElementById('cameraVideo');
+        const cameraFallback = document.getElementById('cameraFallback');
+        
+        video.style.display = 'none';
+        cameraFallback.style.display = 'flex';
+    }
+
+    stopCamera() {
+        if (this.cameraStream) {
+            this.cameraStream.getTracks().forEach(track => track.stop());
+            this.cameraStream = null;
+            this.videoTrack = null;
+        }
+        
+        if (this.scanInterval) {
+            clearInterval(this.scanInterval);
+            this.scanInterval = null;
+        }
+        
+        // Turn off flashlight
+        this.toggleFlashlight(false);
+    }
+
+    async toggleFlashlight(force = null) {
+        if (!this.videoTrack || !this.videoTrack.getCapabilities) {
+            return false;
+        }
+        
+        const capabilities = this.videoTrack.getCapabilities();
+        if (!capabilities.torch) {
+            return false;
+        }
+        
+        const flashlightBtn = document.getElementById('flashlightBtn');
+        this.isFlashOn = force !== null ? force : !this.isFlashOn;
+        
+        try {
+            await this.videoTrack.applyConstraints({
+                advanced: [{ torch: this.isFlashOn }]
+            });
+            
+            // Update button state
+            flashlightBtn.classList.toggle('active', this.isFlashOn);
+            
+            return true;
+        } catch (error) {
+            console.error('Flashlight error:', error);
+            return false;
+        }
+    }
+
+    async switchCamera() {
+        this.currentFacingMode = this.currentFacingMode === 'environment' ? 'user' : 'environment';
+        await this.stopCamera();
+        await this.startCamera();
+    }
+
+    startQRScanning() {
+        // For PythonAnywhere, we can't do real-time QR scanning with camera
+        // This is a placeholder that would need a proper QR scanning library
+        // For now, we'll just show the camera and let users capture an image
+        
+        console.log('Camera started - QR scanning ready');
+    }
+
+    captureImageFromCamera() {
+        const video = document.getElementById('cameraVideo');
+        const canvas = document.createElement('canvas');
+        const context = canvas.getContext('2d');
+        
+        // Set canvas dimensions to match video
+        canvas.width = video.videoWidth;
+        canvas.height = video.videoHeight;
+        
+        // Draw video frame to canvas
+        context.drawImage(video, 0, 0, canvas.width, canvas.height);
+        
+        // Convert to blob
+        return new Promise((resolve) => {
+            canvas.toBlob((blob) => {
+                resolve(blob);
+            }, 'image/jpeg');
+        });
+    }
+
+    async processScannedData(qrData) {
+        try {
+            this.showLoading('Validating QR code...');
+            
+            // First try to parse locally
+            const parsedData = this.parseUPIQR(qrData);
+            if (!parsedData || !parsedData.upiId) {
+                this.hideLoading();
+                this.showError('Invalid QR format. Could not extract UPI ID.');
+                return false;
+            }
+
+            // CRITICAL: Check if user is scanning their own QR BEFORE anything else
+            const scannedUpi = parsedData.upiId.toLowerCase();
+            
+            // Show current user UPI in self-scan modal
+            document.getElementById('currentUserUpi').textContent = this.currentUserUPI || 'Not set';
+            
+            if (this.currentUserUPI && scannedUpi === this.currentUserUPI) {
+                this.hideLoading();
+                this.showSelfScanError(parsedData);
+                return false;
+            }
+            
+            // Also check if the name matches (in case UPI ID is different but it's still the user)
+            if (this.currentUserName && parsedData.name && 
+                parsedData.name.toLowerCase() === this.currentUserName.toLowerCase()) {
+                this.hideLoading();
+                this.showSelfScanError(parsedData);
+                return false;
+            }
+
+            // Validate with server
+            const response = await fetch('/qr/validate', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ qr_data: qrData })
+            });
+            
+            const result = await response.json();
+            
+            this.hideLoading();
+            
+            if (result.success) {
+                // Final check with server-side validation
+                if (result.user && result.user.upi_id && this.currentUserUPI && 
+                    result.user.upi_id.toLowerCase() === this.currentUserUPI) {
+                    this.showSelfScanError(result.user);
+                    return false;
+                }
+                
+                this.scannedData = {
+                    qrData: qrData,
+                    user: result.user,
+                    isRegistered: result.is_registered,
+                    message: result.message
+                };
+                
+                this.showResults();
+                return true;
+            } else {
+                // UPI not found in EasyCash - allow external transfer
+                // Final check for self-scan
+                if (scannedUpi === this.currentUserUPI) {
+                    this.showSelfScanError(parsedData);
+                    return false;
+                }
+                
+                const user = {
+                    upi_id: parsedData.upiId,
+                    username: parsedData.name || parsedData.upiId.split('@')[0],
+                    is_registered: false
+                };
+                
+                this.scannedData = {
+                    qrData: qrData,
+                    user: user,
+                    isRegistered: false,
+                    message: 'External UPI user'
+                };
+                
+                this.showResults();
+                return true;
+            }
+        } catch (error) {
+            this.hideLoading();
+            console.error('Error processing QR data:', error);
+            this.showError('Failed to process QR code: ' + error.message);
+            return false;
+        }
+    }
+
+    showSelfScanError(parsedData) {
+        // Show self-scan error modal
+        const modal = document.getElementById('selfScanModal');
+        
+        // Update the modal with current user info
+        document.getElementById('currentUserUpi').textContent = this.currentUserUPI || 'Not set';
+        
+        modal.style.display = 'flex';
+        document.body.classList.add('scanner-open');
+        
+        // Set up modal buttons
+        document.getElementById('scanDifferentBtn').onclick = () => {
+            modal.style.display = 'none';
+            document.body.classList.remove('scanner-open');
+            
+            // Re-open camera scanner
+            setTimeout(() => {
+                openCameraScanner();
+            }, 300);
+        };
+        
+        document.getElementById('closeSelfScanBtn').onclick = () => {
+            modal.style.display = 'none';
+            document.body.classList.remove('scanner-open');
+        };
+        
+        // Show toast notification
+        this.showToast('You cannot send money to yourself', 'warning');
+    }
+
+    parseUPIQR(qrData) {
+        try {
+            console.log('Parsing QR data:', qrData);
+            
+            // Clean the QR data
+            qrData = qrData.trim();
+            
+            // Case 1: Direct UPI ID (e.g., "username@upi")
+            if (qrData.includes('@') && !qrData.includes('://')) {
+                return {
+                    upiId: qrData,
+                    name: qrData.split('@')[0]
+                };
+            }
+            
+            // Case 2: UPI URL format
+            if (qrData.toLowerCase().includes('upi://') || qrData.toLowerCase().includes('upi://pay')) {
+                // Extract parameters from UPI URL
+                let pa = null; // UPI ID
+                let pn = null; // Name
+                let am = null; // Amount
+                
+                // Try to extract pa (UPI ID) parameter
+                const paMatch = qrData.match(/pa=([^&]*)/i);
+                if (paMatch) {
+                    pa = decodeURIComponent(paMatch[1]);
+                }
+                
+                // Try to extract pn (name) parameter
+                const pnMatch = qrData.match(/pn=([^&]*)/i);
+                if (pnMatch) {
+                    pn = decodeURIComponent(pnMatch[1]);
+                }
+                
+                // If we have a UPI ID, return it
+                if (pa) {
+                    return {
+                        upiId: pa,
+                        name: pn || pa.split('@')[0],
+                        amount: am
+                    };
+                }
+            }
+            
+            // Case 3: Try to extract UPI ID using regex
+            const upiPattern = /([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+)/i;
+            const match = qrData.match(upiPattern);
+            
+            if (match) {
+                return {
+                    upiId: match[1],
+                    name: match[1].split('@')[0]
+                };
+            }
+            
+            return null;
+        } catch (error) {
+            console.error('Error parsing UPI QR:', error);
+            return null;
+        }
+    }
+
+    showResults() {
+        if (!this.scannedData || !this.scannedData.user) {
+            this.showError('Invalid scan data');
+            return;
+        }
+        
+        const user = this.scannedData.user;
+        
+        // Update UI with scanned data
+        document.getElementById('resultUpiId').textContent = user.upi_id || 'Unknown';
+        document.getElementById('resultName').textContent = user.username || 'Unknown';
+        
+        // Set status
+        const resultStatus = document.getElementById('resultStatus');
+        if (this.scannedData.isRegistered) {
+            resultStatus.textContent = '✓ Registered EasyCash User';
+            resultStatus.style.color = 'var(--success-color)';
+        } else {
+            resultStatus.textContent = '⚠️ External UPI User';
+            resultStatus.style.color = 'var(--warning-color)';
+        }
+        
+        // Show QR result modal
+        document.getElementById('qrResultModal').style.display = 'flex';
+        document.body.classList.add('scanner-open');
+        
+        // Set up amount input
+        this.setupAmountInput();
+    }
+
+    setupAmountInput() {
+        const amountInput = document.getElementById('qrAmount');
+        const quickAmounts = document.querySelectorAll('.quick-amount');
+        const proceedBtn = document.getElementById('proceedToPaymentBtn');
+        
+        // Clear any existing data
+        amountInput.value = '';
+        proceedBtn.disabled = true;
+        quickAmounts.forEach(btn => btn.classList.remove('active'));
+        
+        // Quick amount buttons
+        quickAmounts.forEach(button => {
+            button.addEventListener('click', () => {
+                const amount = button.dataset.amount;
+                amountInput.value = amount;
+                
+                // Update active state
+                quickAmounts.forEach(btn => btn.classList.remove('active'));
+                button.classList.add('active');
+                
+                // Enable proceed button
+                this.updateProceedButton();
+            });
+        });
+        
+        // Amount input listener
+        amountInput.addEventListener('input', () => {
+            // Clear quick amounts active state
+            quickAmounts.forEach(btn => btn.classList.remove('active'));
+            
+            // Update proceed button
+            this.updateProceedButton();
+        });
+        
+        // Proceed button click
+        proceedBtn.addEventListener('click', () => {
+            this.processPayment();
+        });
+    }
+
+    updateProceedButton() {
+        const amountInput = document.getElementById('qrAmount');
+        const proceedBtn = document.getElementById('proceedToPaymentBtn');
+        const amount = parseFloat(amountInput.value) || 0;
+        
+        if (amount > 0 && amount <= 50000) {
+            proceedBtn.disabled = false;
+            proceedBtn.innerHTML = `<i class="fas fa-paper-plane"></i> Send ₹${amount.toFixed(2)}`;
+        } else {
+            proceedBtn.disabled = true;
+            proceedBtn.innerHTML = `<i class="fas fa-paper-plane"></i> Proceed to Payment`;
+        }
+    }
+
+    processPayment() {
+        const amountInput = document.getElementById('qrAmount');
+        const amount = parseFloat(amountInput.value) || 0;
+        
+        // Validate amount
+        if (amount <= 0 || amount > 50000) {
+            this.showToast('Please enter a valid amount (₹1 - ₹50,000)', 'error');
+            return;
+        }
+        
+        // Store the amount for later use
+        this.currentPaymentAmount = amount;
+        
+        // Show PIN modal instead of alert
+        this.showPinPrompt(amount);
+    }
+
+    showPinPrompt(amount) {
+        // Close QR result modal
+        document.getElementById('qrResultModal').style.display = 'none';
+        document.body.classList.remove('scanner-open');
+        
+        // Reset PIN attempts
+        this.pinAttempts = 3;
+        
+        // Update PIN modal description
+        const description = document.getElementById('pinModalDescription');
+        description.textContent = `Enter your 6-digit PIN to confirm payment of ₹${amount.toFixed(2)}`;
+        
+        // Show PIN modal
+        const modal = document.getElementById('pinModal');
+        modal.style.display = 'flex';
+        document.body.classList.add('scanner-open');
+        
+        // Focus on PIN input
+        setTimeout(() => {
+            document.getElementById('pinInput').focus();
+        }, 300);
+        
+        // Initialize PIN input
+        this.initPinInput();
+    }
+
+    initPinInput() {
+        const pinInput = document.getElementById('pinInput');
+        const toggleBtn = document.getElementById('togglePinBtn');
+        const pinDots = document.getElementById('pinDots').children;
+        const numpadBtns = document.querySelectorAll('.numpad-btn[data-digit]');
+        const clearBtn = document.getElementById('clearPinBtn');
+        const confirmBtn = document.getElementById('confirmPinBtn');
+        const cancelBtn = document.getElementById('cancelPinBtn');
+        const attemptsDiv = document.getElementById('pinAttempts');
+        const attemptsCount = document.getElementById('attemptsCount');
+        
+        // Reset everything
+        pinInput.value = '';
+        pinInput.type = 'password';
+        pinInput.classList.remove('error');
+        confirmBtn.disabled = true;
+        attemptsDiv.classList.remove('show');
+        
+        // Update PIN dots
+        this.updatePinDots('');
+        
+        // Toggle password visibility
+        toggleBtn.addEventListener('click', () => {
+            const isPassword = pinInput.type === 'password';
+            pinInput.type = isPassword ? 'text' : 'password';
+            toggleBtn.innerHTML = isPassword ? 
+                '<i class="fas fa-eye-slash"></i>' : 
+                '<i class="fas fa-eye"></i>';
+        });
+        
+        // Handle keyboard input
+        pinInput.addEventListener('input', (e) => {
+            const pin = e.target.value.replace(/\D/g, '').slice(0, 6);
+            pinInput.value = pin;
+            this.updatePinDots(pin);
+            confirmBtn.disabled = pin.length !== 6;
+        });
+        
+        // Handle numpad buttons
+        numpadBtns.forEach(btn => {
+            btn.addEventListener('click', () => {
+                if (pinInput.value.length >= 6) return;
+                
+                const digit = btn.dataset.digit;
+                const newPin = pinInput.value + digit;
+                pinInput.value = newPin;
+                this.updatePinDots(newPin);
+                
+                if (newPin.length === 6) {
+                    confirmBtn.disabled = false;
+                    confirmBtn.focus();
+                }
+            });
+        });
+        
+        // Clear button
+        clearBtn.addEventListener('click', () => {
+            pinInput.value = '';
+            this.updatePinDots('');
+            confirmBtn.disabled = true;
+            pinInput.focus();
+        });
+        
+        // Confirm button
+        confirmBtn.addEventListener('click', () => {
+            this.submitPayment(this.currentPaymentAmount, pinInput.value);
+        });
+        
+        // Cancel button
+        cancelBtn.addEventListener('click', () => {
+            const modal = document.getElementById('pinModal');
+            modal.style.display = 'none';
+            document.body.classList.remove('scanner-open');
+            
+            // Re-open QR result modal
+            setTimeout(() => {
+                document.getElementById('qrResultModal').style.display = 'flex';
+                document.body.classList.add('scanner-open');
+            }, 300);
+        });
+        
+        // Forgot PIN link
+        document.getElementById('forgotPinLink').addEventListener('click', (e) => {
+            e.preventDefault();
+            this.showToast('Please contact support to reset your PIN', 'info');
+        });
+        
+        // Handle Enter key
+        pinInput.addEventListener('keydown', (e) => {
+            if (e.key === 'Enter' && pinInput.value.length === 6) {
+                this.submitPayment(this.currentPaymentAmount, pinInput.value);
+            }
+        });
+        
+        // Focus on input
+        pinInput.focus();
+    }
+
+    updatePinDots(pin) {
+        const dots = document.getElementById('pinDots').children;
+        for (let i = 0; i < dots.length; i++) {
+            if (i < pin.length) {
+                dots[i].classList.add('filled');
+            } else {
+                dots[i].classList.remove('filled');
+            }
+        }
+    }
+
+    async submitPayment(amount, pin) {
+        // Validate PIN
+        if (!pin || pin.length !== 6 || !/^\d{6}$/.test(pin)) {
+            this.showToast('Please enter a valid 6-digit PIN', 'error');
+            return;
+        }
+        
+        // Decrement attempts if wrong PIN
+        const pinInput = document.getElementById('pinInput');
+        const attemptsDiv = document.getElementById('pinAttempts');
+        const attemptsCount = document.getElementById('attemptsCount');
+        const confirmBtn = document.getElementById('confirmPinBtn');
+        
+        try {
+            this.showLoading('Processing payment...');
+            
+            const formData = new FormData();
+            formData.append('upi_id', this.scannedData.user.upi_id);
+            formData.append('username', this.scannedData.user.username);
+            formData.append('qr_data', this.scannedData.qrData);
+            formData.append('amount', amount);
+            formData.append('pin', pin);
+            
+            const response = await fetch('/send-money-qr', {
+                method: 'POST',
+                body: formData
+            });
+            
+            const result = await response.json();
+            
+            this.hideLoading();
+            
+            if (result.success) {
+                // Close PIN modal
+                document.getElementById('pinModal').style.display = 'none';
+                document.body.classList.remove('scanner-open');
+                
+                this.showToast('Payment processed successfully!', 'success');
+                
+                setTimeout(() => {
+                    window.location.href = result.redirect || '/dashboard';
+                }, 1500);
+            } else {
+                // Handle incorrect PIN
+                if (result.error && result.error.toLowerCase().includes('pin')) {
+                    this.pinAttempts--;
+                    
+                    if (this.pinAttempts > 0) {
+                        // Show error and reset input
+                        pinInput.value = '';
+                        pinInput.classList.add('error');
+                        this.updatePinDots('');
+                        confirmBtn.disabled = true;
+                        
+                        attemptsCount.textContent = this.pinAttempts;
+                        attemptsDiv.classList.add('show');
+                        
+                        this.showToast(`Incorrect PIN. ${this.pinAttempts} attempts remaining`, 'error');
+                        
+                        // Focus on input
+                        setTimeout(() => {
+                            pinInput.focus();
+                        }, 100);
+                    } else {
+                        // Too many attempts
+                        document.getElementById('pinModal').style.display = 'none';
+                        document.body.classList.remove('scanner-open');
+                        
+                        this.showToast('Too many incorrect attempts. Please try again later.', 'error');
+                        
+                        // Re-open QR result modal
+                        setTimeout(() => {
+                            document.getElementById('qrResultModal').style.display = 'flex';
+                            document.body.classList.add('scanner-open');
+                        }, 500);
+                    }
+                } else {
+                    this.showToast(result.error || 'Payment failed', 'error');
+                }
+            }
+        } catch (error) {
+            this.hideLoading();
+            console.error('Error submitting payment:', error);
+            this.showToast('Payment failed. Please try again.', 'error');
+        }
+    }
+
+    // Utility methods
+    showLoading(message) {
+        const overlay = document.getElementById('loadingOverlay');
+        const text = document.getElementById('loadingText');
+        
+        if (overlay && text) {
+            text.textContent = message || 'Processing...';
+            overlay.style.display = 'flex';
+        }
+    }
+
+    hideLoading() {
+        const overlay = document.getElementById('loadingOverlay');
+        if (overlay) {
+            overlay.style.display = 'none';
+        }
+    }
+
+    showToast(message, type = 'info') {
+        const toast = document.getElementById('toastNotification');
+        if (!toast) return;
+        
+        toast.textContent = message;
+        toast.className = 'toast-notification ' + type;
+        toast.style.display = 'flex';
+        
+        // Hide after 3 seconds
+        setTimeout(() => {
+            toast.style.display = 'none';
+        }, 3000);
+    }
+
+    showError(message, type = 'error') {
+        this.showToast(message, type);
+    }
+}
+
+// File scanning functionality
+class FileQRScanner {
+    constructor() {
+        this.selectedFile = null;
+        this.enhancedScanner = new EnhancedQRScanner();
+    }
+
+    handleFileSelect(file) {
+        // Validate file type
+        const validTypes = ['image/png', 'image/jpeg', 'image/jpg', 'image/gif', 'image/bmp'];
+        if (!validTypes.includes(file.type)) {
+            this.enhancedScanner.showToast('Please select a valid image file (PNG, JPG, JPEG, GIF, BMP)', 'error');
+            return false;
+        }
+
+        // Validate file size (max 5MB)
+        if (file.size > 5 * 1024 * 1024) {
+            this.enhancedScanner.showToast('File size must be less than 5MB', 'error');
+            return false;
+        }
+
+        this.selectedFile = file;
+        return true;
+    }
+
+    async scanFile() {
+        if (!this.selectedFile) return false;
+
+        try {
+            this.enhancedScanner.showLoading('Scanning QR code from image...');
+            
+            const formData = new FormData();
+            formData.append('file', this.selectedFile);
+
+            const response = await fetch('/qr/scan/file', {
+                method: 'POST',
+                body: formData
+            });
+
+            const result = await response.json();
+            
+            this.enhancedScanner.hideLoading();
+
+            if (result.success) {
+                // Check for self-scan immediately
+                const currentUserUPI = this.enhancedScanner.currentUserUPI;
+                if (result.user && result.user.upi_id && currentUserUPI && 
+                    result.user.upi_id.toLowerCase() === currentUserUPI) {
+                    this.enhancedScanner.showSelfScanError(result.user);
+                    return false;
+                }
+                
+                // Process the scanned data
+                this.enhancedScanner.scannedData = {
+                    qrData: result.qr_data,
+                    user: result.user,
+                    isRegistered: result.is_registered,
+                    message: result.message
+                };
+                
+                this.enhancedScanner.showResults();
+                return true;
+            } else {
+                // Check if it's a pyzbar dependency error
+                if (result.error && result.error.includes('pyzbar')) {
+                    this.showPyzbarError();
+                    return false;
+                }
+                this.enhancedScanner.showToast(result.error || 'Failed to scan QR code', 'error');
+                return false;
+            }
+        } catch (error) {
+            this.enhancedScanner.hideLoading();
+            console.error('Error scanning file:', error);
+            this.enhancedScanner.showToast('Failed to scan QR code', 'error');
+            return false;
+        }
+    }
+
+    showPyzbarError() {
+        // Show error message about pyzbar
+        const modal = document.createElement('div');
+        modal.style.cssText = `
+            position: fixed;
+            top: 0;
+            left: 0;
+            right: 0;
+            bottom: 0;
+            background: rgba(0,0,0,0.8);
+            z-index: 5000;
+            display: flex;
+            justify-content: center;
+            align-items: center;
+        `;
+        
+        modal.innerHTML = `
+            <div style="
+                background: var(--dark-surface);
+                border-radius: 12px;
+                padding: 30px;
+                max-width: 500px;
+                width: 90%;
+                text-align: center;
+            ">
+                <i class="fas fa-exclamation-triangle" style="font-size: 64px; color: var(--warning-color); margin-bottom: 20px;"></i>
+                <h3 style="margin: 0 0 15px 0; color: var(--dark-text);">QR Scanning Dependency Required</h3>
+                <p style="color: var(--dark-text-secondary); margin-bottom: 25px;">
+                    The QR scanning functionality requires the <strong>pyzbar</strong> library to be installed on the server.
+                    <br><br>
+                    Please contact the system administrator to install it with:
+                    <br>
+                    <code style="background: var(--dark-bg); padding: 10px; border-radius: 6px; display: block; margin: 10px 0;">
+                        pip install pyzbar pillow
+                    </code>
+                </p>
+                <button onclick="this.closest('div').remove()" style="
+                    background: var(--primary-color);
+                    color: white;
+                    border: none;
+                    padding: 12px 24px;
+                    border-radius: 8px;
+                    font-size: 16px;
+                    cursor: pointer;
+                ">
+                    Close
+                </button>
+            </div>
+        `;
+        
+        document.body.appendChild(modal);
+    }
+}
+
+// Initialize everything
+function initQRScanFunctionality() {
+    // Create scanner instances
+    window.enhancedScanner = new EnhancedQRScanner();
+    window.fileScanner = new FileQRScanner();
+    
+    const cameraScanner = document.getElementById('cameraScanner');
+    const closeCameraBtn = document.getElementById('closeCameraBtn');
+    const galleryOverlay = document.getElementById('galleryOverlay');
+    const closeGalleryBtn = document.getElementById('closeGalleryBtn');
+    const galleryFileInput = document.getElementById('galleryFileInput');
+    const dropArea = document.getElementById('dropArea');
+    const filePreview = document.getElementById('filePreview');
+    const previewImage = document.getElementById('previewImage');
+    const scanImageBtn = document.getElementById('scanImageBtn');
+    const qrResultModal = document.getElementById('qrResultModal');
+    const closeResultBtn = document.getElementById('closeResultBtn');
+    const proceedToPaymentBtn = document.getElementById('proceedToPaymentBtn');
+    const selfScanModal = document.getElementById('selfScanModal');
+    const scanDifferentBtn = document.getElementById('scanDifferentBtn');
+    const closeSelfScanBtn = document.getElementById('closeSelfScanBtn');
+    const switchCameraBtn = document.getElementById('switchCameraBtn');
+    const flashlightBtn = document.getElementById('flashlightBtn');
+    const galleryBtn = document.getElementById('galleryBtn');
+    const captureBtn = document.getElementById('captureBtn');
+    const pinModal = document.getElementById('pinModal');
+    const cancelPinBtn = document.getElementById('cancelPinBtn');
+    
+    // Camera scanner functions
+    async function openCameraScanner() {
+        cameraScanner.style.display = 'flex';
+        document.body.classList.add('scanner-open');
+        
+        // Start camera
+        const success = await window.enhancedScanner.startCamera();
+        
+        if (!success) {
+            window.enhancedScanner.showToast('Camera access failed. Please use file upload.', 'error');
+        }
+    }
+    
+    function closeCameraScanner() {
+        cameraScanner.style.display = 'none';
+        document.body.classList.remove('scanner-open');
+        window.enhancedScanner.stopCamera();
+    }
+    
+    closeCameraBtn.addEventListener('click', closeCameraScanner);
+    
+    // Switch camera button
+    switchCameraBtn.addEventListener('click', async () => {
+        await window.enhancedScanner.switchCamera();
+    });
+    
+    // Flashlight button
+    flashlightBtn.addEventListener('click', async () => {
+        await window.enhancedScanner.toggleFlashlight();
+    });
+    
+    // Gallery button
+    galleryBtn.addEventListener('click', () => {
+        closeCameraScanner();
+        openGallery();
+    });
+    
+    // Capture button (for PythonAnywhere, we'll use file upload)
+    captureBtn.addEventListener('click', () => {
+        window.enhancedScanner.showToast('For PythonAnywhere, please use file upload option', 'info');
+    });
+    
+    // Gallery functions
+    function openGallery() {
+        closeCameraScanner();
+        galleryOverlay.style.display = 'flex';
+        document.body.classList.add('scanner-open');
+    }
+    
+    function closeGallery() {
+        galleryOverlay.style.display = 'none';
+        document.body.classList.remove('scanner-open');
+        resetGallery();
+    }
+    
+    closeGalleryBtn.addEventListener('click', closeGallery);
+    
+    // File upload handlers
+    dropArea.addEventListener('click', function() {
+        galleryFileInput.click();
+    });
+    
+    galleryFileInput.addEventListener('change', function(e) {
+        const file = e.target.files[0];
+        if (file) {
+            if (window.fileScanner.handleFileSelect(file)) {
+                const reader = new FileReader();
+                reader.onload = function(event) {
+                    previewImage.src = event.target.result;
+                    filePreview.style.display = 'block';
+                    scanImageBtn.disabled = false;
+                };
+                reader.readAsDataURL(file);
+            }
+        }
+    });
+    
+    // Drag and drop handlers
+    dropArea.addEventListener('dragover', function(e) {
+        e.preventDefault();
+        dropArea.style.borderColor = 'var(--primary-color)';
+        dropArea.style.background = 'rgba(var(--primary-rgb), 0.1)';
+    });
+    
+    dropArea.addEventListener('dragleave', function(e) {
+        e.preventDefault();
+        dropArea.style.borderColor = 'var(--border-color)';
+        dropArea.style.background = '';
+    });
+    
+    dropArea.addEventListener('drop', function(e) {
+        e.preventDefault();
+        dropArea.style.borderColor = 'var(--border-color)';
+        dropArea.style.background = '';
+        
+        const file = e.dataTransfer.files[0];
+        if (file && file.type.startsWith('image/')) {
+            if (window.fileScanner.handleFileSelect(file)) {
+                galleryFileInput.files = e.dataTransfer.files;
+                const reader = new FileReader();
+                reader.onload = function(event) {
+                    previewImage.src = event.target.result;
+                    filePreview.style.display = 'block';
+                    scanImageBtn.disabled = false;
+                };
+                reader.readAsDataURL(file);
+            }
+        } else {
+            window.enhancedScanner.showToast('Please select an image file', 'error');
+        }
+    });
+    
+    scanImageBtn.addEventListener('click', async function() {
+        scanImageBtn.disabled = true;
+        scanImageBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Scanning...';
+        
+        const success = await window.fileScanner.scanFile();
+        
+        if (success) {
+            closeGallery();
+        }
+        
+        scanImageBtn.disabled = false;
+        scanImageBtn.innerHTML = '<i class="fas fa-search"></i> Scan QR Code';
+    });
+    
+    // Reset gallery
+    function resetGallery() {
+        galleryFileInput.value = '';
+        previewImage.src = '';
+        filePreview.style.display = 'none';
+        scanImageBtn.disabled = true;
+        window.fileScanner.selectedFile = null;
+    }
+    
+    // QR result modal functions
+    closeResultBtn.addEventListener('click', function() {
+        qrResultModal.style.display = 'none';
+        document.body.classList.remove('scanner-open');
+        window.enhancedScanner.scannedData = null;
+    });
+    
+    // Self scan modal functions
+    scanDifferentBtn.addEventListener('click', function() {
+        selfScanModal.style.display = 'none';
+        document.body.classList.remove('scanner-open');
+        
+        // Re-open camera scanner
+        setTimeout(() => {
+            openCameraScanner();
+        }, 300);
+    });
+    
+    closeSelfScanBtn.addEventListener('click', function() {
+        selfScanModal.style.display = 'none';
+        document.body.classList.remove('scanner-open');
+    });
+    
+    // Close modals on ESC key
+    document.addEventListener('keydown', function(e) {
+        if (e.key === 'Escape') {
+            if (cameraScanner.style.display === 'flex') {
+                closeCameraScanner();
+            } else if (galleryOverlay.style.display === 'flex') {
+                closeGallery();
+            } else if (qrResultModal.style.display === 'flex') {
+                qrResultModal.style.display = 'none';
+                document.body.classList.remove('scanner-open');
+            } else if (pinModal.style.display === 'flex') {
+                pinModal.style.display = 'none';
+                document.body.classList.remove('scanner-open');
+                
+                // Re-open QR result modal
+                setTimeout(() => {
+                    qrResultModal.style.display = 'flex';
+                    document.body.classList.add('scanner-open');
+                }, 300);
+            } else if (selfScanModal.style.display === 'flex') {
+                selfScanModal.style.display = 'none';
+                document.body.classList.remove('scanner-open');
+            }
+        }
+    });
+    
+    // Close camera scanner when clicking outside of guide area
+    cameraScanner.addEventListener('click', function(e) {
+        if (e.target === cameraScanner) {
+            closeCameraScanner();
+        }
+    });
+    
+    return { openCamera: openCameraScanner, openGallery };
+}
+
+window.EasyCashQR = initQRScanFunctionality();
+// Used by the camera fallback's inline onclick
+window.openGallery = window.EasyCashQR.openGallery;
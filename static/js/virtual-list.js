@@ -0,0 +1,155 @@
+// static/js/virtual-list.js
+// Windowed list for long histories. Only the rows near the viewport are in
+// the DOM, and further pages are fetched from a cursor API as the page
+// scrolls, so both server work and DOM size stay bounded.
+//
+//   new VirtualList(container, {
+//       fetchPage: cursor => Promise<{ items, nextCursor }>,
+//       renderRow: item => Element,
+//       keyOf: item => unique key
+//   })
+class VirtualList {
+    constructor(container, options) {
+        this.container = container;
+        this.fetchPage = options.fetchPage;
+        this.renderRow = options.renderRow;
+        this.keyOf = options.keyOf || (item => item.id);
+        this.onChange = options.onChange || (() => {});
+        this.onError = options.onError || (error => console.error('List page failed:', error));
+        // Starting guess; grows to the tallest row actually rendered
+        this.rowHeight = options.rowHeight || 100;
+        this.gap = options.gap || 0;
+        this.overscan = options.overscan || 6;
+
+        this.container.style.position = 'relative';
+        this.rows = new Map();
+        this.scheduled = false;
+        this.generation = 0;
+
+        const schedule = () => this.schedule();
+        window.addEventListener('scroll', schedule, { passive: true });
+        window.addEventListener('resize', schedule);
+
+        this.reset();
+    }
+
+    // Drop everything and load from the first page, e.g. after a filter change
+    reset(fetchPage) {
+        if (fetchPage) this.fetchPage = fetchPage;
+        this.generation++;
+        this.items = [];
+        this.keys = new Set();
+        this.cursor = null;
+        this.done = false;
+        this.loading = null;
+        this.rows.forEach(row => row.remove());
+        this.rows.clear();
+        this.layout();
+        return this.loadMore();
+    }
+
+    loadMore() {
+        if (this.done) return Promise.resolve();
+        if (this.loading) return this.loading;
+
+        const generation = this.generation;
+        this.loading = this.fetchPage(this.cursor).then(page => {
+            if (generation !== this.generation) return;
+            this.append(page.items);
+            this.cursor = page.nextCursor;
+            this.done = !page.nextCursor;
+        }).catch(error => {
+            if (generation !== this.generation) return;
+            // Stop paging; scrolling will not hammer a failing API
+            this.done = true;
+            this.onError(error);
+        }).finally(() => {
+            if (generation !== this.generation) return;
+            this.loading = null;
+            this.layout();
+            this.onChange(this);
+        });
+        return this.loading;
+    }
+
+    append(items) {
+        items.forEach(item => {
+            const key = this.keyOf(item);
+            if (!this.keys.has(key)) {
+                this.keys.add(key);
+                this.items.push(item);
+            }
+        });
+    }
+
+    // Put newer rows at the top without losing the reader's place
+    prepend(items) {
+        const fresh = items.filter(item => !this.keys.has(this.keyOf(item)));
+        if (fresh.length === 0) return;
+
+        fresh.forEach(item => this.keys.add(this.keyOf(item)));
+        this.items = fresh.concat(this.items);
+        this.rows.forEach(row => row.remove());
+        this.rows.clear();
+
+        if (this.container.getBoundingClientRect().top < 0) {
+            window.scrollBy(0, fresh.length * this.rowHeight);
+        }
+        this.layout();
+        this.onChange(this);
+    }
+
+    schedule() {
+        if (this.scheduled) return;
+        this.scheduled = true;
+        requestAnimationFrame(() => {
+            this.scheduled = false;
+            this.render();
+        });
+    }
+
+    layout() {
+        this.container.style.height = `${this.items.length * this.rowHeight}px`;
+        this.render();
+    }
+
+    render() {
+        const top = -this.container.getBoundingClientRect().top;
+        const first = Math.max(0, Math.floor(top / this.rowHeight) - this.overscan);
+        const last = Math.min(this.items.length,
+            Math.ceil((top + window.innerHeight) / this.rowHeight) + this.overscan);
+
+        this.rows.forEach((row, index) => {
+            if (index < first || index >= last) {
+                row.remove();
+                this.rows.delete(index);
+            }
+        });
+
+        let tallest = 0;
+        for (let index = first; index < last; index++) {
+            let row = this.rows.get(index);
+            if (!row) {
+                row = this.renderRow(this.items[index]);
+                Object.assign(row.style, { position: 'absolute', left: '0', right: '0', margin: '0' });
+                this.container.appendChild(row);
+                this.rows.set(index, row);
+            }
+            row.style.top = `${index * this.rowHeight}px`;
+            tallest = Math.max(tallest, row.offsetHeight);
+        }
+
+        if (tallest + this.gap > this.rowHeight) {
+            this.rowHeight = tallest + this.gap;
+            this.layout();
+            return;
+        }
+
+        // Near the end of what is loaded: fetch the next page
+        if (!this.done && !this.loading && last + this.overscan >= this.items.length) {
+            this.loadMore();
+        }
+    }
+}
+
+window.VirtualList = VirtualList;
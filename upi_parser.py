@@ -0,0 +1,135 @@
+"""
+UPI Payload Parser for EasyCash UPI Wallet
+Single-pass parsing of scanned QR text into a structured UPI payload
+"""
+import re
+from dataclasses import dataclass, field
+from urllib.parse import unquote
+
+# Patterns are compiled once at import time and shared by every caller
+PHONE_RE = re.compile(r'^[6-9]\d{9}$')
+PHONE_VPA_RE = re.compile(r'^(?:\+91)?([6-9]\d{9})@easycash$', re.IGNORECASE)
+VPA_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+$')
+PHONE_VPA_SEARCH_RE = re.compile(r'(?:\+91)?[6-9]\d{9}@easycash', re.IGNORECASE)
+PHONE_SEARCH_RE = re.compile(r'(?:\+91)?([6-9]\d{9})')
+
+# Payload kinds, in the order they are tried
+KIND_PHONE_VPA = 'phone_vpa'
+KIND_VPA = 'vpa'
+KIND_UPI_URL = 'upi_url'
+KIND_UPI_PREFIX = 'upi_prefix'
+KIND_TEXT_VPA = 'text_vpa'
+KIND_TEXT_PHONE = 'text_phone'
+
+
+@dataclass
+class UPIPayload:
+    """Structured result of parsing scanned QR text"""
+    kind: str
+    pa: str = None
+    phone: str = None
+    params: dict = field(default_factory=dict)
+
+    @property
+    def name(self):
+        return self.params.get('pn')
+
+    @property
+    def amount(self):
+        try:
+            return float(self.params['am'])
+        except (KeyError, ValueError):
+            return None
+
+    def as_params(self):
+        """Flat parameter dict in the shape parse_upi_qr has always returned"""
+        result = dict(self.params)
+        if self.pa is not None:
+            result['pa'] = self.pa
+        if self.phone is not None:
+            result['phone'] = self.phone
+        return result
+
+
+def phone_from_vpa(vpa):
+    """Return the 10-digit phone of a {phone}@easycash UPI ID, or None"""
+    if not vpa:
+        return None
+    match = PHONE_VPA_RE.match(vpa)
+    return match.group(1) if match else None
+
+
+def is_valid_phone(phone):
+    """Check a 10-digit Indian mobile number"""
+    return bool(phone) and PHONE_RE.match(phone) is not None
+
+
+def is_valid_vpa(vpa):
+    """Check a UPI ID (phone-based or legacy handle@provider)"""
+    return bool(vpa) and (PHONE_VPA_RE.match(vpa) is not None or VPA_RE.match(vpa) is not None)
+
+
+def _parse_query(query, params):
+    """Split key=value pairs into params, decoding values"""
+    for pair in query.split('&'):
+        key, sep, value = pair.partition('=')
+        if sep:
+            params[key] = unquote(value)
+
+
+def parse_upi_payload(qr_data):
+    """
+    Parse scanned QR text into a UPIPayload
+    Handles upi://pay URLs, UPI: prefixes, bare UPI IDs and text with a phone
+    Returns None when nothing usable is found
+    """
+    if not qr_data:
+        return None
+
+    text = qr_data.strip()
+    if not text:
+        return None
+
+    match = PHONE_VPA_RE.match(text)
+    if match:
+        return UPIPayload(KIND_PHONE_VPA, pa=text, phone=match.group(1))
+
+    if VPA_RE.match(text):
+        return UPIPayload(KIND_VPA, pa=text)
+
+    if text.startswith('upi://pay'):
+        params = {}
+        _, sep, query = text.partition('?')
+        if sep:
+            _parse_query(query, params)
+        if not params:
+            return None
+        pa = params.pop('pa', None)
+        phone = params.pop('phone', None)
+        return UPIPayload(KIND_UPI_URL, pa=pa, phone=phone_from_vpa(pa) or phone, params=params)
+
+    if text.startswith('UPI:'):
+        upi_part, sep, query = text[4:].partition('?')
+        pa = unquote(upi_part)
+        phone = phone_from_vpa(pa)
+        params = {}
+        if sep:
+            # Query values win over the prefix, as they always have
+            _parse_query(query, params)
+            pa = params.pop('pa', pa)
+            phone = params.pop('phone', phone)
+        return UPIPayload(KIND_UPI_PREFIX, pa=pa, phone=phone, params=params)
+
+    if '@easycash' in text.lower():
+        match = PHONE_VPA_SEARCH_RE.search(text)
+        if not match:
+            return None
+        pa = match.group(0)
+        return UPIPayload(KIND_TEXT_VPA, pa=pa, phone=phone_from_vpa(pa))
+
+    match = PHONE_SEARCH_RE.search(text)
+    if match:
+        phone = match.group(1)
+        return UPIPayload(KIND_TEXT_PHONE, pa=f"{phone}@easycash", phone=phone)
+
+    return None